@@ -1,9 +1,121 @@
 import streamlit as st
-from PIL import Image, ImageOps
-import io
+from PIL import Image
 import time
+import os
+from collections.abc import Callable
+from typing import get_args, get_origin
+from services.admission import AdmissionRejected
+from services.image_codec import MIME_TYPES
+from services.image_utils import ImageProcessor
 from services.pipeline import VirtualTryOnPipeline
-from config import APP_CONFIG
+from services.job_queue import FAILED, FINISHED_STATUSES, RUNNING, JobQueue, spool_upload
+from services.metrics import registry as metrics
+from services.progress import ProgressTracker
+from services.result_encoder import ResultEncoder, file_extension
+from services.upload_cache import UploadCache
+from config import QUEUE_CONFIG, RESULT_ENCODING_CONFIG
+
+# Progress bar position and status message shown when each pipeline stage starts
+STAGE_PROGRESS = {
+    "preprocess": (10, "🔄 Preprocessing images..."),
+    "cache": (20, "🔎 Checking for a previous result..."),
+    "encode": (30, "📦 Encoding images..."),
+    "model": (40, "🤖 Sending images to AI model..."),
+    "decode_result": (90, "🎨 Processing AI-generated result..."),
+    "fallback": (90, "🩹 AI model unavailable, creating a preview blend..."),
+}
+
+@st.cache_resource
+def get_pipeline() -> VirtualTryOnPipeline:
+    # One pipeline (and Gemini client) per server process, shared across reruns
+    return VirtualTryOnPipeline()
+
+@st.cache_resource
+def get_result_encoder() -> ResultEncoder:
+    return ResultEncoder()
+
+@st.cache_resource
+def get_job_queue() -> JobQueue:
+    return JobQueue()
+
+def get_upload_cache() -> UploadCache:
+    # Per browser session: decoded uploads survive reruns but are not shared between users
+    if "upload_cache" not in st.session_state:
+        st.session_state.upload_cache = UploadCache()
+    return st.session_state.upload_cache
+
+def render_via_queue(user_upload, clothing_upload, progress_bar, status_text, timer_text):
+    """Hand the job to worker.py and poll until it finishes"""
+    queue = get_job_queue()
+    user_path = spool_upload(user_upload.getvalue(), os.path.splitext(user_upload.name)[1])
+    clothing_path = spool_upload(clothing_upload.getvalue(), os.path.splitext(clothing_upload.name)[1])
+    job_id = queue.enqueue(user_path, clothing_path)
+
+    start_time = time.time()
+    timeout = QUEUE_CONFIG["wait_timeout_seconds"]
+    while True:
+        job = queue.get(job_id)
+        if job["status"] in FINISHED_STATUSES:
+            break
+        if time.time() - start_time > timeout:
+            raise TimeoutError(f"Job {job_id} did not finish within {timeout:.0f}s; is worker.py running?")
+        if job["status"] == RUNNING:
+            progress_bar.progress(50)
+            status_text.text("🤖 Rendering on a try-on worker...")
+        else:
+            progress_bar.progress(10)
+            status_text.text(f"⏳ Queued (job {job_id})...")
+        timer_text.text(f"⏱️ Elapsed time: {time.time() - start_time:.1f}s")
+        time.sleep(QUEUE_CONFIG["poll_interval_seconds"])
+
+    if job["status"] == FAILED:
+        raise RuntimeError(job["error"])
+
+    result_image = Image.open(job["result_path"])
+    result_image.load()
+    return result_image, job["timings"]
+
+def deferred_downloads_supported() -> bool:
+    """Whether this Streamlit accepts a callable for download_button data (generated on click)"""
+    try:
+        from streamlit.elements.widgets.button import DownloadButtonDataType
+    except ImportError:
+        return False
+    return any(get_origin(arg) is Callable for arg in get_args(DownloadButtonDataType))
+
+def show_result(result_image: Image.Image) -> None:
+    """Display the result and offer downloads, all served from one encode per format"""
+    encoder = get_result_encoder()
+    display_format = RESULT_ENCODING_CONFIG["display_format"]
+    download_formats = RESULT_ENCODING_CONFIG["download_formats"]
+
+    # Queue every format up front: the downloads encode in the background while the display one does
+    result_hash = ImageProcessor.compute_image_hash(result_image)
+    encoder.prefetch(result_image, [display_format] + download_formats, result_hash)
+
+    display = encoder.encode(result_image, display_format, result_hash)
+    st.image(display.data, caption="Virtual Try-On Result", use_container_width=True)
+
+    # Where Streamlit supports it, a download's bytes are fetched only when its button is
+    # clicked, so the page never waits on a download encode. Older releases need the bytes
+    # now; the prefetch above has them encoding alongside the display format.
+    deferred = deferred_downloads_supported()
+    for column, format in zip(st.columns(len(download_formats)), download_formats):
+        with column:
+            if deferred:
+                data = lambda format=format: encoder.encode(result_image, format, result_hash).data
+                options = {"on_click": "ignore"}
+            else:
+                data = encoder.encode(result_image, format, result_hash).data
+                options = {}
+            st.download_button(
+                label=f"💾 Download {format}",
+                data=data,
+                file_name=f"virtual_tryon_result{file_extension(format)}",
+                mime=MIME_TYPES[format],
+                key=f"download_{format}",
+                **options
+            )
 
 def main():
     st.set_page_config(
@@ -15,6 +127,16 @@ def main():
     st.title("🌟 Virtual Try-On Application")
     st.markdown("Upload your photo and clothing item to see how it looks!")
 
+    with st.sidebar.expander("📊 Metrics"):
+        st.json(metrics.snapshot(), expanded=False)
+        st.download_button(
+            label="Download Prometheus metrics",
+            data=metrics.export_prometheus(),
+            file_name="tryon_metrics.prom",
+            mime="text/plain"
+        )
+
+    upload_cache = get_upload_cache()
     col1, col2 = st.columns(2)
 
     with col1:
@@ -26,9 +148,12 @@ def main():
         )
 
         if user_image:
-            user_img = Image.open(user_image)
-            user_img = ImageOps.exif_transpose(user_img)
-            st.image(user_img, caption="Your Photo", use_container_width=True)
+            try:
+                user_upload = upload_cache.get(user_image)
+                st.image(user_upload.preview, caption="Your Photo", use_container_width=True)
+            except ValueError as e:
+                st.error(str(e))
+                user_image = None
 
     with col2:
         st.header("👕 Upload Clothing Item")
@@ -39,9 +164,12 @@ def main():
         )
 
         if clothing_image:
-            clothing_img = Image.open(clothing_image)
-            clothing_img = ImageOps.exif_transpose(clothing_img)
-            st.image(clothing_img, caption="Clothing Item", use_container_width=True)
+            try:
+                clothing_upload = upload_cache.get(clothing_image)
+                st.image(clothing_upload.preview, caption="Clothing Item", use_container_width=True)
+            except ValueError as e:
+                st.error(str(e))
+                clothing_image = None
 
     if st.button("✨ Generate Try-On", type="primary"):
         if user_image and clothing_image:
@@ -60,31 +188,37 @@ def main():
                 # Start timer
                 start_time = time.time()
 
-                # Update progress: Image preprocessing
-                progress_bar.progress(20)
-                status_text.text("🔄 Preprocessing images...")
-                timer_text.text(f"⏱️ Elapsed time: {time.time() - start_time:.1f}s")
-
-                pipeline = VirtualTryOnPipeline()
-
-                # Update progress: Sending to AI
-                progress_bar.progress(40)
-                status_text.text("🤖 Sending images to AI model...")
-                timer_text.text(f"⏱️ Elapsed time: {time.time() - start_time:.1f}s")
-
-                # Generate the try-on
-                result_image = pipeline.generate_tryon(
-                    user_image=user_img,
-                    clothing_image=clothing_img
-                )
-
-                # Update progress: Processing result
-                progress_bar.progress(80)
-                status_text.text("🎨 Processing AI-generated result...")
-                timer_text.text(f"⏱️ Elapsed time: {time.time() - start_time:.1f}s")
-
-                # Small delay to show final progress
-                time.sleep(0.5)
+                stage_timings = {}
+
+                def on_progress(event):
+                    if event["status"] == "finished":
+                        stage_timings[event["stage"]] = event["duration"]
+                    elif event["stage"] in STAGE_PROGRESS:
+                        percent, message = STAGE_PROGRESS[event["stage"]]
+                        progress_bar.progress(percent)
+                        status_text.text(message)
+                    timer_text.text(f"⏱️ Elapsed time: {time.time() - start_time:.1f}s")
+
+                if QUEUE_CONFIG["enabled"]:
+                    result_image, stage_timings = render_via_queue(
+                        user_image, clothing_image, progress_bar, status_text, timer_text
+                    )
+                else:
+                    pipeline = get_pipeline()
+
+                    # Preprocessed inputs are cached on the uploads, so repeat clicks skip this
+                    with ProgressTracker(on_progress).stage("preprocess"):
+                        user_processed, user_hash = user_upload.prepared("user")
+                        clothing_processed, clothing_hash = clothing_upload.prepared("clothing")
+
+                    # Generate the try-on, reporting real stage progress
+                    result_image = pipeline.generate_tryon_prepared(
+                        user_processed,
+                        clothing_processed,
+                        user_hash=user_hash,
+                        clothing_hash=clothing_hash,
+                        progress_callback=on_progress
+                    )
 
                 # Complete progress
                 progress_bar.progress(100)
@@ -95,18 +229,16 @@ def main():
                 timer_text.text(f"⏱️ Total time: {total_time:.1f}s")
 
                 st.success(f"Try-on generated successfully in {total_time:.1f} seconds!")
-                st.image(result_image, caption="Virtual Try-On Result", use_container_width=True)
-
-                # Download button
-                buf = io.BytesIO()
-                result_image.save(buf, format='PNG')
-                st.download_button(
-                    label="💾 Download Result",
-                    data=buf.getvalue(),
-                    file_name="virtual_tryon_result.png",
-                    mime="image/png"
-                )
+                st.caption(" · ".join(
+                    f"{stage}: {duration:.2f}s" for stage, duration in stage_timings.items()
+                ))
+                show_result(result_image)
 
+            except AdmissionRejected as e:
+                progress_bar.progress(0)
+                status_text.text("⏳ Server busy")
+                timer_text.text("")
+                st.warning(f"Too many try-ons in progress, please try again in {e.retry_after:.0f} seconds.")
             except Exception as e:
                 # Calculate time even on error
                 error_time = time.time() - start_time
@@ -0,0 +1,92 @@
+from PIL import Image
+import asyncio
+import io
+import random
+import threading
+import time
+import numpy as np
+from types import SimpleNamespace
+from typing import Optional, Tuple
+
+
+class FakeGeminiError(Exception):
+    """Transient upstream failure carrying an HTTP status like the SDK's API errors"""
+
+    def __init__(self, code: int = 503):
+        super().__init__(f"fake upstream error {code}")
+        self.code = code
+
+
+def make_test_image(size: Tuple[int, int], seed: int = 0) -> Image.Image:
+    """Deterministic photo-like test image: smooth gradients plus sensor noise"""
+    width, height = size
+    rng = np.random.default_rng(seed)
+    x = np.linspace(0, 255, width, dtype=np.float32)
+    y = np.linspace(0, 255, height, dtype=np.float32)[:, None]
+
+    array = np.empty((height, width, 3), dtype=np.float32)
+    array[..., 0] = x
+    array[..., 1] = y
+    array[..., 2] = (x + y) / 2
+    array += rng.normal(0, 8, (height, width, 1)).astype(np.float32)
+    return Image.fromarray(np.clip(array, 0, 255).astype(np.uint8))
+
+
+def encode_png(image: Image.Image) -> bytes:
+    buf = io.BytesIO()
+    image.save(buf, format='PNG')
+    return buf.getvalue()
+
+
+class FakeGeminiModel:
+    """
+    Local stand-in for genai.GenerativeModel. Each call sleeps for latency
+    plus uniform jitter, fails with a retryable 503 at error_rate, and
+    otherwise returns a PNG of response_size shaped like an SDK response.
+    Randomness is seeded so runs are repeatable.
+    """
+
+    def __init__(
+        self,
+        latency: float = 0.05,
+        jitter: float = 0.0,
+        error_rate: float = 0.0,
+        response_size: Tuple[int, int] = (1024, 1024),
+        seed: int = 0
+    ):
+        self.latency = latency
+        self.jitter = jitter
+        self.error_rate = error_rate
+        self.response_payload = encode_png(make_test_image(response_size, seed))
+        self.calls = 0
+        self.errors = 0
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+
+    def _next_call(self) -> Tuple[float, bool]:
+        with self._lock:
+            self.calls += 1
+            delay = self.latency + self._random.uniform(0, self.jitter)
+            failed = self._random.random() < self.error_rate
+            if failed:
+                self.errors += 1
+        return delay, failed
+
+    def _response(self):
+        part = SimpleNamespace(inline_data=SimpleNamespace(data=self.response_payload), text=None)
+        candidate = SimpleNamespace(content=SimpleNamespace(parts=[part]))
+        return SimpleNamespace(candidates=[candidate], text="")
+
+    def generate_content(self, content, request_options: Optional[dict] = None, **kwargs):
+        delay, failed = self._next_call()
+        time.sleep(delay)
+        if failed:
+            raise FakeGeminiError(503)
+        return self._response()
+
+    async def generate_content_async(self, content, request_options: Optional[dict] = None, **kwargs):
+        delay, failed = self._next_call()
+        await asyncio.sleep(delay)
+        if failed:
+            raise FakeGeminiError(503)
+        return self._response()
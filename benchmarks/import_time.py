@@ -0,0 +1,114 @@
+"""
+Cold-start import check.
+
+    python -m benchmarks.import_time                        # services.pipeline and worker
+    python -m benchmarks.import_time --modules services.pipeline --max-ms 250 --top 15
+
+Each module is imported in a fresh interpreter under `python -X importtime`.
+The check fails if a module pulls in one of HEAVY_MODULES at import time
+(they must load on first use) or, with --max-ms, if the median cumulative
+import time exceeds the budget.
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+from typing import Dict, List, Optional, Tuple
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+DEFAULT_MODULES = ("services.pipeline", "worker")
+
+# Dependencies that must only be imported when the code path needing them runs
+HEAVY_MODULES = ("google.generativeai", "cv2", "streamlit")
+
+# A plain import statement: importlib.import_module bypasses -X importtime for the target
+_PROBE = (
+    "import {module}\n"
+    "import json, sys\n"
+    "print(json.dumps([name for name in {heavy!r} if name in sys.modules]))\n"
+)
+
+
+def parse_importtime(stderr: str) -> Dict[str, Tuple[int, int]]:
+    """Map each module in -X importtime output to (self, cumulative) microseconds"""
+    timings = {}
+    for line in stderr.splitlines():
+        if not line.startswith("import time:"):
+            continue
+        fields = line[len("import time:"):].split("|")
+        if len(fields) != 3 or not fields[0].strip().isdigit():
+            continue  # the column header
+        name = fields[2].strip()
+        # Keep the first (outermost) entry if a module shows up twice
+        timings.setdefault(name, (int(fields[0]), int(fields[1])))
+    return timings
+
+
+def measure_import(module: str, runs: int = 5) -> dict:
+    """Median cumulative import time of module over runs fresh interpreters"""
+    env = dict(os.environ, PYTHONDONTWRITEBYTECODE="1")
+    cumulative = []
+    timings = {}
+    loaded = []
+    for _ in range(runs):
+        process = subprocess.run(
+            [sys.executable, "-X", "importtime", "-W", "ignore", "-c",
+             _PROBE.format(module=module, heavy=HEAVY_MODULES)],
+            cwd=REPO_ROOT,
+            env=env,
+            capture_output=True,
+            text=True,
+            check=True
+        )
+        timings = parse_importtime(process.stderr)
+        cumulative.append(timings[module][1])
+        loaded = json.loads(process.stdout.strip().splitlines()[-1])
+
+    cumulative.sort()
+    top = sorted(timings.items(), key=lambda item: item[1][0], reverse=True)
+    return {
+        "module": module,
+        "runs": runs,
+        "cumulative_ms": cumulative[len(cumulative) // 2] / 1000,
+        "heavy_loaded": loaded,
+        "top_self_ms": [(name, self_us / 1000) for name, (self_us, _) in top[:20]],
+    }
+
+
+def check(result: dict, max_ms: Optional[float] = None) -> List[str]:
+    problems = [
+        f"{result['module']} imports {name} eagerly" for name in result["heavy_loaded"]
+    ]
+    if max_ms is not None and result["cumulative_ms"] > max_ms:
+        problems.append(f"{result['module']} takes {result['cumulative_ms']:.1f}ms to import (budget {max_ms:.0f}ms)")
+    return problems
+
+
+def parse_args(argv: Optional[List[str]] = None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Measure cold-start import time")
+    parser.add_argument("--modules", nargs="+", default=list(DEFAULT_MODULES))
+    parser.add_argument("--runs", type=int, default=5, help="Fresh interpreters per module")
+    parser.add_argument("--max-ms", type=float, help="Fail if a module's median import time exceeds this")
+    parser.add_argument("--top", type=int, default=10, help="Slowest modules to list by self time")
+    return parser.parse_args(argv)
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    args = parse_args(argv)
+    problems = []
+    for module in args.modules:
+        result = measure_import(module, args.runs)
+        print(f"{module}: {result['cumulative_ms']:.1f}ms (median of {args.runs})")
+        for name, self_ms in result["top_self_ms"][:args.top]:
+            print(f"  {self_ms:7.1f}ms  {name}")
+        problems.extend(check(result, args.max_ms))
+
+    for problem in problems:
+        print(f"FAIL: {problem}")
+    return 1 if problems else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
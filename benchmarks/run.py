@@ -0,0 +1,288 @@
+"""
+Offline benchmark suite for the try-on pipeline.
+
+    python -m benchmarks.run                                  # run everything, write results.json
+    python -m benchmarks.run --benchmarks preprocess --sizes 256px 12MP
+    python -m benchmarks.run --baseline benchmarks/baseline.json   # exit 1 on regression
+    python -m benchmarks.run --save-baseline                  # refresh the stored baseline
+
+Gemini is replaced by FakeGeminiModel, so no API key or network is needed.
+"""
+import argparse
+import json
+import os
+import platform
+import sys
+import time
+import warnings
+import numpy as np
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from datetime import datetime, timezone
+from multiprocessing import get_context
+from typing import Callable, List, Optional, Tuple
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# The SDK's deprecation notice would otherwise repeat in every isolated worker
+warnings.filterwarnings("ignore", category=FutureWarning, module="services.gemini_client")
+
+BENCHMARK_DIR = os.path.dirname(os.path.abspath(__file__))
+DEFAULT_OUTPUT = os.path.join(BENCHMARK_DIR, "results.json")
+DEFAULT_BASELINE = os.path.join(BENCHMARK_DIR, "baseline.json")
+
+SIZES = {
+    "256px": (256, 256),
+    "VGA": (640, 480),
+    "1080p": (1920, 1080),
+    "5MP": (2592, 1944),
+    "12MP": (4000, 3000),
+}
+
+BENCHMARKS = ("preprocess", "fallback", "decode", "pipeline")
+
+DEFAULT_OPTIONS = {
+    "iterations": 10,
+    "warmup": 1,
+    "concurrency": 4,
+    "latency": 0.05,
+    "jitter": 0.02,
+    "error_rate": 0.0,
+    "response_size": 1024,
+    "cpu_pool": False,
+    "hedge": False,
+}
+
+
+def peak_rss_mb() -> Optional[float]:
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss is bytes on macOS and kilobytes elsewhere
+    divisor = 1024 * 1024 if sys.platform == "darwin" else 1024
+    return round(peak / divisor, 1)
+
+
+def measure(fn: Callable[[], object], iterations: int, warmup: int = 1, concurrency: int = 1) -> dict:
+    """Time iterations calls of fn, optionally from several threads at once"""
+    for _ in range(warmup):
+        fn()
+
+    def timed_call(_):
+        start = time.perf_counter()
+        fn()
+        return time.perf_counter() - start
+
+    wall_start = time.perf_counter()
+    if concurrency > 1:
+        with ThreadPoolExecutor(max_workers=concurrency) as executor:
+            latencies = list(executor.map(timed_call, range(iterations)))
+    else:
+        latencies = [timed_call(i) for i in range(iterations)]
+    wall = time.perf_counter() - wall_start
+
+    p50, p95, p99 = np.percentile(latencies, [50, 95, 99])
+    return {
+        "iterations": iterations,
+        "concurrency": concurrency,
+        "throughput": iterations / wall,
+        "mean": float(np.mean(latencies)),
+        "p50": float(p50),
+        "p95": float(p95),
+        "p99": float(p99),
+    }
+
+
+def _build_case(name: str, size: Tuple[int, int], options: dict) -> Tuple[Callable[[], object], int]:
+    """Set up one benchmark outside the timed region; returns (fn, concurrency)"""
+    from benchmarks.fake_gemini import FakeGeminiModel, encode_png, make_test_image
+    from services.image_utils import ImageProcessor
+
+    user_image = make_test_image(size, seed=1)
+    clothing_image = make_test_image(size, seed=2)
+
+    cpu_pool = None
+    if options["cpu_pool"]:
+        from services.cpu_pool import CPUPool
+        cpu_pool = CPUPool()
+
+    if name == "preprocess":
+        preprocessor = cpu_pool or ImageProcessor
+        return lambda: preprocessor.prepare_for_tryon(user_image, clothing_image), 1
+
+    if name == "decode":
+        from services.image_codec import decode_image_payload
+        payload = encode_png(user_image)
+        return lambda: decode_image_payload(payload), 1
+
+    from services.gemini_client import GeminiClient
+    from services.hedging import HedgingPolicy
+    from services.image_codec import ImageEncoder
+    from services.pipeline import VirtualTryOnPipeline
+    from services.rate_limit import RateLimiter
+
+    model = FakeGeminiModel(
+        latency=options["latency"],
+        jitter=options["jitter"],
+        error_rate=options["error_rate"],
+        response_size=(options["response_size"], options["response_size"])
+    )
+    # Encoder cache and request coalescing off, so every iteration does the full work
+    client = GeminiClient(
+        model=model,
+        rate_limiter=RateLimiter(),
+        encoder=ImageEncoder(cache_entries=0),
+        hedging=HedgingPolicy() if options["hedge"] else None
+    )
+    client.coalesce_requests = False
+    pipeline = VirtualTryOnPipeline(cache=None, gemini_client=client, cpu_pool=cpu_pool)
+
+    if name == "fallback":
+        return lambda: pipeline._create_fallback_image(user_image, clothing_image), 1
+
+    return lambda: pipeline.generate_tryon(user_image, clothing_image), options["concurrency"]
+
+
+def run_case(name: str, size_name: str, options: dict) -> dict:
+    fn, concurrency = _build_case(name, SIZES[size_name], options)
+    result = measure(fn, options["iterations"], options["warmup"], concurrency)
+    result.update({"name": name, "size": size_name, "peak_rss_mb": peak_rss_mb()})
+    return result
+
+
+def run_suite(
+    benchmarks: List[str],
+    sizes: List[str],
+    options: dict,
+    isolate: bool = True
+) -> List[dict]:
+    """
+    Run every benchmark at every size. With isolate, each case gets a fresh
+    process so peak RSS belongs to that case alone rather than the whole run.
+    """
+    results = []
+    for name in benchmarks:
+        for size_name in sizes:
+            if isolate:
+                with ProcessPoolExecutor(max_workers=1, mp_context=get_context("spawn")) as executor:
+                    result = executor.submit(run_case, name, size_name, options).result()
+            else:
+                result = run_case(name, size_name, options)
+            print(format_result(result), flush=True)
+            results.append(result)
+    return results
+
+
+def format_result(result: dict) -> str:
+    rss = result["peak_rss_mb"]
+    return (
+        f"{result['name']:<11} {result['size']:<6} "
+        f"p50 {result['p50'] * 1000:8.1f}ms  p95 {result['p95'] * 1000:8.1f}ms  "
+        f"p99 {result['p99'] * 1000:8.1f}ms  {result['throughput']:7.1f}/s  "
+        f"rss {'n/a' if rss is None else f'{rss:.0f}MB'}"
+    )
+
+
+def compare(results: List[dict], baseline: dict, tolerance: float) -> List[str]:
+    """Regressions against a baseline: p50/p95 slower or throughput lower by more than tolerance"""
+    previous = {(r["name"], r["size"]): r for r in baseline.get("results", [])}
+    regressions = []
+
+    for result in results:
+        base = previous.get((result["name"], result["size"]))
+        if base is None:
+            continue
+        label = f"{result['name']} {result['size']}"
+        for metric in ("p50", "p95"):
+            if result[metric] > base[metric] * (1 + tolerance):
+                regressions.append(
+                    f"{label}: {metric} {result[metric] * 1000:.1f}ms vs baseline {base[metric] * 1000:.1f}ms"
+                )
+        if result["throughput"] < base["throughput"] * (1 - tolerance):
+            regressions.append(
+                f"{label}: throughput {result['throughput']:.1f}/s vs baseline {base['throughput']:.1f}/s"
+            )
+
+    return regressions
+
+
+def write_json(path: str, data: dict) -> None:
+    with open(path, "w") as f:
+        json.dump(data, f, indent=2)
+        f.write("\n")
+
+
+def parse_args(argv: Optional[List[str]] = None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Offline try-on pipeline benchmarks")
+    parser.add_argument("--benchmarks", nargs="+", choices=BENCHMARKS, default=list(BENCHMARKS))
+    parser.add_argument("--sizes", nargs="+", choices=list(SIZES), default=list(SIZES))
+    parser.add_argument("--iterations", type=int, default=DEFAULT_OPTIONS["iterations"])
+    parser.add_argument("--warmup", type=int, default=DEFAULT_OPTIONS["warmup"])
+    parser.add_argument("--concurrency", type=int, default=DEFAULT_OPTIONS["concurrency"],
+                        help="Threads driving the end-to-end pipeline benchmark")
+    parser.add_argument("--latency", type=float, default=DEFAULT_OPTIONS["latency"],
+                        help="Fake Gemini latency in seconds")
+    parser.add_argument("--jitter", type=float, default=DEFAULT_OPTIONS["jitter"],
+                        help="Extra uniform random latency in seconds")
+    parser.add_argument("--error-rate", type=float, default=DEFAULT_OPTIONS["error_rate"],
+                        help="Fraction of fake Gemini calls failing with a retryable 503")
+    parser.add_argument("--response-size", type=int, default=DEFAULT_OPTIONS["response_size"],
+                        help="Edge length of the fake Gemini response image")
+    parser.add_argument("--cpu-pool", action="store_true",
+                        help="Run preprocessing and fallback rendering on a CPUPool")
+    parser.add_argument("--hedge", action="store_true",
+                        help="Hedge slow fake Gemini calls with the HEDGING_CONFIG policy")
+    parser.add_argument("--output", default=DEFAULT_OUTPUT)
+    parser.add_argument("--baseline", help="Baseline JSON to compare against")
+    parser.add_argument("--tolerance", type=float, default=0.25,
+                        help="Allowed relative slowdown before a result counts as a regression")
+    parser.add_argument("--save-baseline", action="store_true",
+                        help=f"Also write the results to {DEFAULT_BASELINE}")
+    parser.add_argument("--no-isolate", dest="isolate", action="store_false",
+                        help="Run all cases in this process (faster, but peak RSS is cumulative)")
+    return parser.parse_args(argv)
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    args = parse_args(argv)
+    options = {key: getattr(args, key) for key in DEFAULT_OPTIONS}
+
+    results = run_suite(args.benchmarks, args.sizes, options, isolate=args.isolate)
+
+    report = {
+        "meta": {
+            "timestamp": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "cpu_count": os.cpu_count(),
+            "options": options,
+        },
+        "results": results,
+    }
+    write_json(args.output, report)
+    print(f"Results written to {args.output}")
+
+    if args.save_baseline:
+        write_json(DEFAULT_BASELINE, report)
+        print(f"Baseline written to {DEFAULT_BASELINE}")
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+        regressions = compare(results, baseline, args.tolerance)
+        if regressions:
+            print(f"{len(regressions)} regression(s) against {args.baseline}:")
+            for regression in regressions:
+                print(f"  {regression}")
+            return 1
+        print(f"No regressions against {args.baseline}")
+
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
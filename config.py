@@ -1,32 +1,176 @@
 import os
+import sys
 from dotenv import load_dotenv
 
 load_dotenv()
 
-try:
-    import streamlit as st
-    GEMINI_API_KEY = st.secrets["GEMINI_API_KEY"]
-except:
+GEMINI_API_KEY = None
+# Only consult st.secrets when running under Streamlit; importing it costs ~200ms
+if "streamlit" in sys.modules:
+    try:
+        GEMINI_API_KEY = sys.modules["streamlit"].secrets["GEMINI_API_KEY"]
+    except Exception:
+        pass
+if not GEMINI_API_KEY:
     GEMINI_API_KEY = os.getenv("GEMINI_API_KEY")
 
 MODEL_CONFIG = {
     "model_name": "gemini-2.5-flash-image-preview",
     "temperature": 0.7,
     "max_output_tokens": 1024,
+    # Transport settings: per-attempt timeout, overall deadline and retry backoff
+    "request_timeout_seconds": 60,
+    "deadline_seconds": 120,
+    "max_retries": 3,
+    "backoff_base_seconds": 0.5,
+    "backoff_max_seconds": 8.0,
+    # Client-side quota: token bucket rate, burst size and concurrent request cap
+    "requests_per_second": 2.0,
+    "burst": 4,
+    "max_in_flight": 4,
+    # Share one upstream call between identical concurrent try-on requests
+    "coalesce_requests": True,
+}
+
+HEDGING_CONFIG = {
+    # Send a duplicate Gemini request when the first is slower than `percentile`
+    # of recent latency; `budget` caps hedges as a fraction of requests
+    "enabled": False,
+    "percentile": 95,
+    "budget": 0.05,
+    "burst": 5,  # unspent hedge budget that may be saved up, in hedges
+    "min_samples": 20,  # observed latencies needed before hedging starts
+    "min_delay_seconds": 1.0,
+    "window": 500,  # latencies kept in the rolling histogram
+    "max_workers": 32  # threads running hedged calls in the sync client
+}
+
+ADMISSION_CONFIG = {
+    # Bound try-ons waiting on the model; beyond this they are shed instead of queueing
+    "enabled": True,
+    "max_in_flight": 8,
+    "max_queue": 16,
+    "queue_timeout_seconds": 5.0,  # longest wait for a slot before being shed
+    "overload_policy": "fallback",  # "fallback" renders locally, "reject" raises AdmissionRejected
+    "retry_after_seconds": 2.0,  # minimum retry-after hint on rejection
+    "request_deadline_seconds": 90,  # per request, covering queueing, retries and the model call
+    # Circuit breaker: consecutive retryable upstream failures before calls short-circuit
+    "breaker_failure_threshold": 5,  # None to disable
+    "breaker_reset_seconds": 30
+}
+
+ANALYSIS_CONFIG = {
+    # Compatibility analysis: a text model answering in JSON, run alongside the try-on
+    "model_name": "gemini-2.5-flash",
+    "temperature": 0.2,
+    "max_output_tokens": 1024,
+    "cache_entries": 256,  # analyses kept per pipeline, keyed by the image pair
+    "max_workers": 4  # threads running analyses next to try-ons
 }
 
 IMAGE_CONFIG = {
     "max_image_size": (1024, 1024),
     "supported_formats": ["JPEG", "PNG", "JPG"],
     "output_format": "PNG",
-    "quality": 95
+    "quality": 95,
+    # "numpy" runs the fused NumPy/OpenCV preprocessing path, "pil" the ImageEnhance chain
+    "preprocess_engine": "pil",
+    # Encoding of images uploaded to Gemini ("quality" above applies to lossy formats)
+    "wire_format": "JPEG",  # "JPEG", "WEBP" or "PNG"
+    "wire_subsampling": "4:2:0",  # JPEG chroma subsampling, None for the encoder default
+    "wire_max_bytes": 1024 * 1024,  # per-image budget; quality is lowered to fit, None to disable
+    # Fallback person box: "projection" (downscaled foreground projections, cached) or "contour"
+    "bounds_engine": "projection",
+    "bounds_max_side": 256,  # long side of the reduced image the projection engine works on
+    "bounds_trim": 0.01  # fraction of foreground mass trimmed from each end of a projection
+}
+
+FRAME_CONFIG = {
+    # Decoded pixels live in pooled NumPy buffers reused across requests
+    "pool_max_bytes": 64 * 1024 * 1024,  # released buffers kept for reuse, per process
+    "stripe_rows": 256  # rows per pass when decoding, converting or hashing
+}
+
+PREVIEW_CONFIG = {
+    # Low-resolution preview tier: smaller inputs, lighter encoding, no enhance pass
+    "max_image_size": (384, 384),
+    "wire_quality": 75,
+    "wire_max_bytes": 128 * 1024,
+    "max_entries": 32  # previews kept for upgrade(); each holds its inputs at max_image_size
+}
+
+RESULT_ENCODING_CONFIG = {
+    # Results are encoded once per format off the script thread and the bytes reused
+    "display_format": "JPEG",  # what st.image is served; ~8ms vs ~125ms for PNG at 1.5MP
+    "download_formats": ["PNG", "WEBP", "JPEG"],
+    "png_compress_level": 1,  # level 6 is ~4x slower for ~10% smaller files
+    "quality": 90,  # JPEG/WebP
+    "webp_method": 0,
+    "max_entries": 32,
+    "max_workers": 2
+}
+
+TILING_CONFIG = {
+    # ImageProcessor operations on images of at least min_pixels run in horizontal
+    # stripes whose working memory stays under max_memory_mb
+    "enabled": True,
+    "min_pixels": 20_000_000,
+    "max_memory_mb": 128
+}
+
+CACHE_CONFIG = {
+    "backend": "memory",  # "memory", "disk" or None to disable
+    "max_entries": 128,
+    "max_bytes": 256 * 1024 * 1024,
+    "ttl_seconds": 24 * 60 * 60,
+    "disk_path": ".cache/tryon"
+}
+
+CATALOG_CONFIG = {
+    # Preprocessed garments addressable by SKU (see services/catalog.py)
+    "path": ".cache/catalog",
+    # Studio shots exceed APP_CONFIG's upload limit; 0 disables the check
+    "max_file_size_mb": 100
+}
+
+BATCH_CONFIG = {
+    "max_workers": 4
+}
+
+CPU_POOL_CONFIG = {
+    # Run preprocessing and fallback rendering in worker processes (pixels via shared memory)
+    "enabled": False,
+    "max_workers": None,  # defaults to os.cpu_count()
+    "start_method": "spawn"
+}
+
+QUEUE_CONFIG = {
+    # When enabled, the Streamlit app enqueues jobs for worker.py instead of rendering in-process
+    "enabled": False,
+    "path": ".cache/jobs.db",
+    "upload_dir": ".cache/uploads",
+    "results_dir": ".cache/results",
+    "workers": 4,
+    "poll_interval_seconds": 0.5,
+    "stale_after_seconds": 600,  # running jobs older than this are requeued (crashed worker)
+    "requeue_interval_seconds": 60,  # how often a running worker looks for stale jobs
+    "wait_timeout_seconds": 300  # the app gives up on a job not finished by then (no worker running?)
+}
+
+METRICS_CONFIG = {
+    "enabled": True,
+    "latency_buckets": [0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60],
+    "bytes_buckets": [16 * 1024, 64 * 1024, 256 * 1024, 512 * 1024, 1024 * 1024, 4 * 1024 * 1024]
 }
 
 APP_CONFIG = {
     "title": "Virtual Try-On App",
     "page_icon": "👗",
     "layout": "wide",
-    "max_file_size_mb": 10
+    "max_file_size_mb": 10,
+    # Decoded uploads kept per session across reruns, and the size they are previewed at
+    "upload_cache_entries": 4,
+    "preview_size": (512, 512)
 }
 
 PROMPTS = {
@@ -47,5 +191,17 @@ PROMPTS = {
     - Detect person's pose and body shape
     - Identify clothing regions
     - Extract key features for realistic overlay
+    """,
+
+    "compatibility": """
+    Analyze the compatibility between this person (first image) and clothing item (second image):
+    1. Body type and clothing fit
+    2. Color coordination
+    3. Style matching
+    4. Occasion appropriateness
+    5. Overall compatibility score (1-10)
+
+    Give a one-paragraph analysis, one sentence for each of fit, color, style and occasion,
+    and up to five short, concrete recommendations.
     """
 }
\ No newline at end of file
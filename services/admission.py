@@ -0,0 +1,234 @@
+import asyncio
+import threading
+import time
+from contextlib import asynccontextmanager, contextmanager
+from typing import Optional, Tuple
+from config import ADMISSION_CONFIG
+
+
+class AdmissionRejected(Exception):
+    """The request was turned away; retry_after is a hint in seconds"""
+
+    def __init__(self, message: str, retry_after: float):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+
+class CircuitOpenError(AdmissionRejected):
+    """Upstream has failed repeatedly and calls are being short-circuited"""
+
+
+class AdmissionController:
+    """
+    Bounds how many try-ons wait on the model at once. Up to max_in_flight
+    run; up to max_queue more wait at most queue_timeout (or until their
+    deadline) for a slot. Anything beyond that, or a request whose deadline
+    would pass before a slot is expected to free up, is rejected at once
+    with a retry-after estimate instead of piling onto a slow upstream.
+    """
+
+    def __init__(
+        self,
+        max_in_flight: Optional[int] = None,
+        max_queue: Optional[int] = None,
+        queue_timeout: Optional[float] = None,
+        retry_after: Optional[float] = None,
+        poll_interval: float = 0.01
+    ):
+        self.max_in_flight = max_in_flight or ADMISSION_CONFIG["max_in_flight"]
+        self.max_queue = max_queue if max_queue is not None else ADMISSION_CONFIG["max_queue"]
+        self.queue_timeout = queue_timeout if queue_timeout is not None else ADMISSION_CONFIG["queue_timeout_seconds"]
+        self.retry_after = retry_after if retry_after is not None else ADMISSION_CONFIG["retry_after_seconds"]
+        self.poll_interval = poll_interval
+
+        self.in_flight = 0
+        self.waiting = 0
+        self.rejected = 0
+        self._hold_time = None  # moving average of how long a slot is held
+        self._condition = threading.Condition()
+
+    def _estimated_wait(self) -> float:
+        """Expected wait for a slot by a request joining the back of the queue"""
+        if self._hold_time is None:
+            return self.retry_after
+        return self._hold_time * (self.waiting + 1) / self.max_in_flight
+
+    def _reject(self, reason: str) -> AdmissionRejected:
+        self.rejected += 1
+        retry_after = max(self.retry_after, self._estimated_wait())
+        return AdmissionRejected(f"Server busy ({reason}), retry in {retry_after:.1f}s", retry_after)
+
+    def _enter(self, deadline_at: Optional[float]) -> Optional[float]:
+        """Take a slot or a queue place (call with the lock held); returns when to give up waiting, or None if admitted"""
+        if self.in_flight < self.max_in_flight:
+            self.in_flight += 1
+            return None
+        if self.waiting >= self.max_queue:
+            raise self._reject("queue full")
+
+        now = time.monotonic()
+        wait_until = now + self.queue_timeout
+        if deadline_at is not None:
+            if self._hold_time is not None and now + self._estimated_wait() > deadline_at:
+                raise self._reject("deadline too close")
+            wait_until = min(wait_until, deadline_at)
+        self.waiting += 1
+        return wait_until
+
+    def _release(self, held: float) -> None:
+        with self._condition:
+            self.in_flight -= 1
+            self._hold_time = held if self._hold_time is None else 0.8 * self._hold_time + 0.2 * held
+            self._condition.notify()
+
+    @contextmanager
+    def acquire(self, deadline_at: Optional[float] = None):
+        """Hold a slot for the block; raises AdmissionRejected when over capacity"""
+        with self._condition:
+            wait_until = self._enter(deadline_at)
+            if wait_until is not None:
+                try:
+                    while self.in_flight >= self.max_in_flight:
+                        remaining = wait_until - time.monotonic()
+                        if remaining <= 0:
+                            raise self._reject("timed out in queue")
+                        self._condition.wait(remaining)
+                    self.in_flight += 1
+                finally:
+                    self.waiting -= 1
+
+        started_at = time.monotonic()
+        try:
+            yield
+        finally:
+            self._release(time.monotonic() - started_at)
+
+    @asynccontextmanager
+    async def acquire_async(self, deadline_at: Optional[float] = None):
+        # Poll rather than block the event loop; slots are shared with sync callers
+        with self._condition:
+            wait_until = self._enter(deadline_at)
+
+        if wait_until is not None:
+            try:
+                while True:
+                    with self._condition:
+                        if self.in_flight < self.max_in_flight:
+                            self.in_flight += 1
+                            break
+                        if time.monotonic() >= wait_until:
+                            raise self._reject("timed out in queue")
+                    await asyncio.sleep(self.poll_interval)
+            finally:
+                with self._condition:
+                    self.waiting -= 1
+
+        started_at = time.monotonic()
+        try:
+            yield
+        finally:
+            self._release(time.monotonic() - started_at)
+
+    def stats(self) -> dict:
+        with self._condition:
+            return {
+                "in_flight": self.in_flight,
+                "waiting": self.waiting,
+                "rejected": self.rejected,
+                "hold_time": self._hold_time,
+            }
+
+
+class CircuitBreaker:
+    """
+    Opens after failure_threshold consecutive upstream failures so further
+    calls fail fast. After reset_timeout a single probe call is let through:
+    success closes the breaker, failure opens it for another reset_timeout.
+    """
+
+    CLOSED = "closed"
+    OPEN = "open"
+    HALF_OPEN = "half_open"
+
+    def __init__(self, failure_threshold: Optional[int] = None, reset_timeout: Optional[float] = None):
+        self.failure_threshold = failure_threshold or ADMISSION_CONFIG["breaker_failure_threshold"]
+        self.reset_timeout = reset_timeout if reset_timeout is not None else ADMISSION_CONFIG["breaker_reset_seconds"]
+        self.failures = 0
+        self._opened_at = None
+        self._probing = False
+        self._lock = threading.Lock()
+
+    def _state(self) -> str:
+        if self._opened_at is None:
+            return self.CLOSED
+        if time.monotonic() - self._opened_at < self.reset_timeout:
+            return self.OPEN
+        return self.HALF_OPEN
+
+    @property
+    def state(self) -> str:
+        with self._lock:
+            return self._state()
+
+    def _allow(self) -> Tuple[bool, bool]:
+        """(allowed, is the half-open probe)"""
+        with self._lock:
+            state = self._state()
+            if state == self.CLOSED:
+                return True, False
+            if state == self.HALF_OPEN and not self._probing:
+                self._probing = True
+                return True, True
+            return False, False
+
+    def allow(self) -> bool:
+        """Whether a call may go upstream now; in half-open only one probe at a time"""
+        return self._allow()[0]
+
+    def retry_after(self) -> float:
+        with self._lock:
+            if self._opened_at is None:
+                return 0.0
+            return max(0.0, self._opened_at + self.reset_timeout - time.monotonic())
+
+    def record_success(self) -> None:
+        with self._lock:
+            self.failures = 0
+            self._opened_at = None
+            self._probing = False
+
+    def record_failure(self) -> None:
+        with self._lock:
+            self.failures += 1
+            if self._probing or self.failures >= self.failure_threshold:
+                self._opened_at = time.monotonic()
+            self._probing = False
+
+    def abandon_probe(self) -> None:
+        """Let another call probe; for a probe that ended without an outcome (shed or cancelled)"""
+        with self._lock:
+            self._probing = False
+
+    def check(self) -> bool:
+        """Raise CircuitOpenError unless a call is allowed; returns whether the call is the half-open probe"""
+        allowed, probe = self._allow()
+        if not allowed:
+            retry_after = self.retry_after()
+            raise CircuitOpenError(
+                f"Gemini circuit open after {self.failures} consecutive failures, retry in {retry_after:.1f}s",
+                retry_after
+            )
+        return probe
+
+
+def create_admission_controller() -> Optional[AdmissionController]:
+    """AdmissionController from ADMISSION_CONFIG, or None when admission control is disabled"""
+    if not ADMISSION_CONFIG.get("enabled"):
+        return None
+    return AdmissionController()
+
+
+def create_circuit_breaker() -> Optional[CircuitBreaker]:
+    if not ADMISSION_CONFIG.get("breaker_failure_threshold"):
+        return None
+    return CircuitBreaker()
@@ -0,0 +1,145 @@
+from PIL import Image
+import hashlib
+import threading
+import numpy as np
+from collections import OrderedDict
+from typing import Optional, Tuple
+from config import IMAGE_CONFIG
+
+Bounds = Tuple[int, int, int, int]
+
+# Minimum per-channel difference from the estimated background colour to count as foreground
+FOREGROUND_THRESHOLD = 30
+
+# Foreground blobs smaller than this fraction of the largest are treated as clutter
+MIN_COMPONENT_FRACTION = 0.1
+
+_OPEN_KERNEL = np.ones((3, 3), dtype=np.uint8)
+
+
+def reduce_image(image: Image.Image, max_side: int) -> np.ndarray:
+    """
+    Small RGB array whose long side fits max_side: an integer box reduce in
+    PIL (no full-resolution NumPy copy), then pyrDown levels for the rest.
+    """
+    import cv2
+    if image.mode not in ('RGB', 'RGBA', 'L'):
+        image = image.convert('RGB')
+    factor = max(image.size) // (2 * max_side)
+    if factor > 1:
+        image = image.reduce(factor)
+    if image.mode != 'RGB':
+        image = image.convert('RGB')
+
+    array = np.asarray(image)
+    while max(array.shape[:2]) > max_side:
+        array = cv2.pyrDown(array)
+    return array
+
+
+def foreground_mask(array: np.ndarray) -> np.ndarray:
+    """Pixels that differ from the median border colour, with speckles and clutter removed"""
+    import cv2
+    border = np.concatenate([array[0], array[-1], array[:, 0], array[:, -1]])
+    background = np.median(border, axis=0).astype(np.int16)
+
+    difference = np.abs(array.astype(np.int16) - background).max(axis=2)
+    mask = (difference > FOREGROUND_THRESHOLD).astype(np.uint8)
+    mask = cv2.morphologyEx(mask, cv2.MORPH_OPEN, _OPEN_KERNEL)
+
+    # Keep blobs comparable to the largest one (a person may split into a few),
+    # dropping background clutter that survived the opening
+    count, labels, stats, _ = cv2.connectedComponentsWithStats(mask, connectivity=8)
+    if count <= 2:
+        return mask
+    areas = stats[1:, cv2.CC_STAT_AREA]
+    keep = np.zeros(count, dtype=np.uint8)
+    keep[1:] = areas >= MIN_COMPONENT_FRACTION * areas.max()
+    return keep[labels]
+
+
+def _span(projection: np.ndarray, trim: float) -> Tuple[int, int]:
+    """Smallest index range holding all but trim of the projection's mass at each end"""
+    cumulative = np.cumsum(projection, dtype=np.float64)
+    total = cumulative[-1]
+    start = int(np.searchsorted(cumulative, total * trim, side="right"))
+    end = int(np.searchsorted(cumulative, total * (1 - trim), side="left")) + 1
+    return start, max(end, start + 1)
+
+
+def bounds_from_reduced(reduced: np.ndarray, size: Tuple[int, int], trim: float) -> Bounds:
+    """
+    Sum the foreground mask per row and column, trim the sparse tails (stray
+    background clutter) and scale the surviving span back up to size.
+    """
+    width, height = size
+    mask = foreground_mask(reduced)
+    rows = np.count_nonzero(mask, axis=1)
+    if not rows.any():
+        return (0, 0, width, height)
+    columns = np.count_nonzero(mask, axis=0)
+
+    top, bottom = _span(rows, trim)
+    left, right = _span(columns, trim)
+
+    scale_y = height / reduced.shape[0]
+    scale_x = width / reduced.shape[1]
+    x0 = min(int(left * scale_x), width - 1)
+    y0 = min(int(top * scale_y), height - 1)
+    x1 = max(min(int(np.ceil(right * scale_x)), width), x0 + 1)
+    y1 = max(min(int(np.ceil(bottom * scale_y)), height), y0 + 1)
+    return (x0, y0, x1, y1)
+
+
+class BoundsCache:
+    """
+    Per-image LRU cache of projection bounds. Entries are keyed by the caller's
+    content hash when given, else by a digest of the reduced image,
+    which the box is a pure function of, so no full-resolution hash is needed.
+    """
+
+    def __init__(self, max_entries: int = 256):
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def bounds(self, image: Image.Image, image_hash: Optional[str] = None) -> Bounds:
+        max_side = IMAGE_CONFIG.get("bounds_max_side", 256)
+        trim = IMAGE_CONFIG.get("bounds_trim", 0.01)
+
+        reduced = None
+        if image_hash is None:
+            reduced = reduce_image(image, max_side)
+            digest = hashlib.sha256(reduced.tobytes())
+            digest.update(f"{reduced.shape}:{image.size}".encode())
+            key = digest.hexdigest()
+        else:
+            key = f"{image_hash}:{image.size}"
+        key = f"{key}:{max_side}:{trim}"
+
+        with self._lock:
+            cached = self._entries.get(key)
+            if cached is not None:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return cached
+            self.misses += 1
+
+        if reduced is None:
+            reduced = reduce_image(image, max_side)
+        result = bounds_from_reduced(reduced, image.size, trim)
+
+        with self._lock:
+            self._entries[key] = result
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+        return result
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+
+bounds_cache = BoundsCache()
@@ -0,0 +1,279 @@
+from PIL import Image
+import hashlib
+import json
+import os
+import threading
+import time
+from collections import OrderedDict
+from typing import Optional
+from .metrics import registry as metrics
+from config import CACHE_CONFIG, MODEL_CONFIG
+
+# Only settings that change the generated image take part in the key;
+# transport knobs such as timeouts or retries must not invalidate the cache
+MODEL_KEY_FIELDS = ("model_name", "temperature", "max_output_tokens")
+
+
+def make_cache_key(
+    user_hash: str,
+    clothing_hash: str,
+    prompt: str,
+    model_config: Optional[dict] = None
+) -> str:
+    """Build a content-addressed key for a try-on request"""
+    if model_config is None:
+        model_config = MODEL_CONFIG
+
+    hasher = hashlib.sha256()
+    hasher.update(user_hash.encode())
+    hasher.update(clothing_hash.encode())
+    hasher.update(prompt.encode())
+    model_fields = {name: model_config.get(name) for name in MODEL_KEY_FIELDS}
+    hasher.update(json.dumps(model_fields, sort_keys=True, default=str).encode())
+    return hasher.hexdigest()
+
+
+def _image_nbytes(image: Image.Image) -> int:
+    return image.width * image.height * len(image.getbands())
+
+
+class ResultCache:
+    """Base class for try-on result caches. Subclasses implement _load/_store."""
+
+    def __init__(self):
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._lock = threading.Lock()
+
+    def get(self, key: str) -> Optional[Image.Image]:
+        image = self._load(key)
+        with self._lock:
+            if image is None:
+                self.misses += 1
+            else:
+                self.hits += 1
+        metrics.inc("tryon_cache_lookups_total", labels={"result": "miss" if image is None else "hit"})
+        return image
+
+    def set(self, key: str, image: Image.Image) -> None:
+        self._store(key, image)
+
+    def stats(self) -> dict:
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "entries": len(self),
+        }
+
+    def clear(self) -> None:
+        raise NotImplementedError
+
+    def __len__(self) -> int:
+        raise NotImplementedError
+
+    def _load(self, key: str) -> Optional[Image.Image]:
+        raise NotImplementedError
+
+    def _store(self, key: str, image: Image.Image) -> None:
+        raise NotImplementedError
+
+
+class MemoryResultCache(ResultCache):
+    """In-process LRU cache bounded by entry count, decoded bytes and TTL"""
+
+    def __init__(
+        self,
+        max_entries: int = 128,
+        max_bytes: int = 256 * 1024 * 1024,
+        ttl_seconds: Optional[float] = None
+    ):
+        super().__init__()
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.ttl_seconds = ttl_seconds
+        self.current_bytes = 0
+        self._entries = OrderedDict()
+
+    def _load(self, key: str) -> Optional[Image.Image]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+
+            image, nbytes, expires_at = entry
+            if expires_at is not None and expires_at <= time.monotonic():
+                self._evict(key)
+                return None
+
+            self._entries.move_to_end(key)
+
+        # Hand out a copy so callers can't mutate the cached result
+        return image.copy()
+
+    def _store(self, key: str, image: Image.Image) -> None:
+        nbytes = _image_nbytes(image)
+        if nbytes > self.max_bytes:
+            return
+
+        expires_at = None
+        if self.ttl_seconds is not None:
+            expires_at = time.monotonic() + self.ttl_seconds
+
+        with self._lock:
+            if key in self._entries:
+                self._evict(key, count=False)
+
+            self._entries[key] = (image.copy(), nbytes, expires_at)
+            self.current_bytes += nbytes
+
+            while self._entries and (
+                len(self._entries) > self.max_entries
+                or self.current_bytes > self.max_bytes
+            ):
+                oldest_key = next(iter(self._entries))
+                self._evict(oldest_key)
+
+    def _evict(self, key: str, count: bool = True) -> None:
+        _, nbytes, _ = self._entries.pop(key)
+        self.current_bytes -= nbytes
+        if count:
+            self.evictions += 1
+
+    def stats(self) -> dict:
+        stats = super().stats()
+        stats["bytes"] = self.current_bytes
+        return stats
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+            self.current_bytes = 0
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+
+class DiskResultCache(ResultCache):
+    """On-disk PNG cache that survives process restarts"""
+
+    def __init__(
+        self,
+        path: str,
+        max_bytes: int = 1024 * 1024 * 1024,
+        ttl_seconds: Optional[float] = None
+    ):
+        super().__init__()
+        self.path = path
+        self.max_bytes = max_bytes
+        self.ttl_seconds = ttl_seconds
+        os.makedirs(self.path, exist_ok=True)
+
+    def _file_path(self, key: str) -> str:
+        return os.path.join(self.path, f"{key}.png")
+
+    def _load(self, key: str) -> Optional[Image.Image]:
+        file_path = self._file_path(key)
+        try:
+            mtime = os.path.getmtime(file_path)
+        except OSError:
+            return None
+
+        if self.ttl_seconds is not None and mtime + self.ttl_seconds <= time.time():
+            self._remove(file_path)
+            return None
+
+        try:
+            with Image.open(file_path) as image:
+                image.load()
+                result = image.copy()
+        except (OSError, ValueError):
+            self._remove(file_path)
+            return None
+
+        # Refresh the access time so LRU pruning keeps recently used entries
+        os.utime(file_path, None)
+        return result
+
+    def _store(self, key: str, image: Image.Image) -> None:
+        file_path = self._file_path(key)
+        tmp_path = f"{file_path}.{os.getpid()}.{threading.get_ident()}.tmp"
+
+        image.save(tmp_path, format='PNG')
+        os.replace(tmp_path, file_path)
+
+        self._prune()
+
+    def _remove(self, file_path: str) -> None:
+        try:
+            os.remove(file_path)
+        except OSError:
+            pass
+        else:
+            with self._lock:
+                self.evictions += 1
+
+    def _entries(self) -> list:
+        entries = []
+        for name in os.listdir(self.path):
+            if not name.endswith('.png'):
+                continue
+            file_path = os.path.join(self.path, name)
+            try:
+                stat = os.stat(file_path)
+            except OSError:
+                continue
+            entries.append((stat.st_mtime, stat.st_size, file_path))
+        return entries
+
+    def _prune(self) -> None:
+        entries = sorted(self._entries())
+        total_bytes = sum(size for _, size, _ in entries)
+        now = time.time()
+
+        for mtime, size, file_path in entries:
+            expired = self.ttl_seconds is not None and mtime + self.ttl_seconds <= now
+            if not expired and total_bytes <= self.max_bytes:
+                break
+            self._remove(file_path)
+            total_bytes -= size
+
+    def stats(self) -> dict:
+        stats = super().stats()
+        stats["bytes"] = sum(size for _, size, _ in self._entries())
+        return stats
+
+    def clear(self) -> None:
+        for _, _, file_path in self._entries():
+            try:
+                os.remove(file_path)
+            except OSError:
+                pass
+
+    def __len__(self) -> int:
+        return len(self._entries())
+
+
+def create_cache(config: Optional[dict] = None) -> Optional[ResultCache]:
+    if config is None:
+        config = CACHE_CONFIG
+
+    backend = config.get("backend")
+    if not backend:
+        return None
+
+    if backend == "memory":
+        return MemoryResultCache(
+            max_entries=config.get("max_entries", 128),
+            max_bytes=config.get("max_bytes", 256 * 1024 * 1024),
+            ttl_seconds=config.get("ttl_seconds")
+        )
+    if backend == "disk":
+        return DiskResultCache(
+            path=config.get("disk_path", ".cache/tryon"),
+            max_bytes=config.get("max_bytes", 1024 * 1024 * 1024),
+            ttl_seconds=config.get("ttl_seconds")
+        )
+
+    raise ValueError(f"Unknown cache backend: {backend}")
@@ -0,0 +1,190 @@
+"""
+Garment catalog store.
+
+    python -m services.catalog add SKU-123 shirt.png
+    python -m services.catalog list
+    python -m services.catalog remove SKU-123
+"""
+from PIL import Image
+import argparse
+import json
+import os
+import re
+import shutil
+import sys
+import tempfile
+import threading
+import time
+import numpy as np
+from typing import List, Optional, Union, BinaryIO
+
+from .image_codec import EncodedImage, ImageEncoder
+from .image_utils import ImageProcessor
+from config import CATALOG_CONFIG
+
+_SKU_PATTERN = re.compile(r"^[A-Za-z0-9][A-Za-z0-9._-]{0,127}$")
+
+
+class Garment:
+    """
+    One ingested catalog garment. Pixel arrays are memory-mapped from disk,
+    so processes serving the same catalog share the page cache; the PIL
+    image and encoded upload are loaded on first use.
+    """
+
+    def __init__(self, sku: str, directory: str, meta: dict):
+        self.sku = sku
+        self.directory = directory
+        self.image_hash = meta["hash"]
+        self.size = tuple(meta["size"])
+        self.wire_format = meta["wire_format"]
+        self.wire_quality = meta.get("wire_quality")
+        self.array = np.load(os.path.join(directory, "pixels.npy"), mmap_mode="r")
+        self.mask = np.load(os.path.join(directory, "mask.npy"), mmap_mode="r")
+        self._image = None
+        self._encoded = None
+
+    @property
+    def image(self) -> Image.Image:
+        """The preprocessed garment, as prepare_clothing_image would return it"""
+        if self._image is None:
+            self._image = Image.fromarray(np.ascontiguousarray(self.array))
+        return self._image
+
+    @property
+    def encoded(self) -> EncodedImage:
+        """Wire-encoded upload of the preprocessed garment"""
+        if self._encoded is None:
+            with open(os.path.join(self.directory, "wire.bin"), "rb") as f:
+                data = f.read()
+            self._encoded = EncodedImage(data, self.wire_format, self.wire_quality, self.image_hash)
+        return self._encoded
+
+
+class GarmentCatalog:
+    """
+    On-disk store of preprocessed garments, one directory per SKU holding
+    the prepared RGB pixels and foreground mask as .npy (memory-mappable),
+    the wire-encoded upload bytes and a meta.json with the content hash.
+    """
+
+    def __init__(self, path: Optional[str] = None, encoder: Optional[ImageEncoder] = None):
+        self.path = path or CATALOG_CONFIG["path"]
+        self.encoder = encoder or ImageEncoder(cache_entries=0)
+        self._garments = {}
+        self._lock = threading.Lock()
+
+    def _directory(self, sku: str) -> str:
+        if not _SKU_PATTERN.match(sku):
+            raise ValueError(f"Invalid SKU: {sku!r}")
+        return os.path.join(self.path, sku)
+
+    def ingest(self, sku: str, source: Union[str, bytes, BinaryIO, Image.Image]) -> Garment:
+        """Preprocess a catalog image once and store every variant the pipeline needs"""
+        directory = self._directory(sku)
+        image = source
+        if not isinstance(source, Image.Image):
+            image = ImageProcessor.load_image(source, max_file_size_mb=CATALOG_CONFIG.get("max_file_size_mb", 0))
+
+        prepared = ImageProcessor.prepare_clothing_image(image)
+        image_hash = ImageProcessor.compute_image_hash(prepared)
+        mask = np.asarray(ImageProcessor.create_mask(prepared))
+        encoded = self.encoder.encode(prepared, image_hash)
+
+        os.makedirs(self.path, exist_ok=True)
+        staging = tempfile.mkdtemp(prefix=f".{sku}.", dir=self.path)
+        try:
+            np.save(os.path.join(staging, "pixels.npy"), np.asarray(prepared))
+            np.save(os.path.join(staging, "mask.npy"), mask)
+            with open(os.path.join(staging, "wire.bin"), "wb") as f:
+                f.write(encoded.data)
+            with open(os.path.join(staging, "meta.json"), "w") as f:
+                json.dump({
+                    "sku": sku,
+                    "hash": image_hash,
+                    "size": list(prepared.size),
+                    "wire_format": encoded.format,
+                    "wire_quality": encoded.quality,
+                    "ingested_at": time.time(),
+                }, f)
+
+            with self._lock:
+                # Move the old version aside first so readers never see a half-written SKU
+                if os.path.exists(directory):
+                    retired = tempfile.mkdtemp(prefix=f".{sku}.old.", dir=self.path)
+                    os.replace(directory, os.path.join(retired, sku))
+                    shutil.rmtree(retired, ignore_errors=True)
+                os.replace(staging, directory)
+                self._garments.pop(sku, None)
+        except Exception:
+            shutil.rmtree(staging, ignore_errors=True)
+            raise
+
+        return self.get(sku)
+
+    def get(self, sku: str) -> Garment:
+        """Ingested garment by SKU; raises KeyError for unknown SKUs"""
+        with self._lock:
+            garment = self._garments.get(sku)
+            if garment is not None:
+                return garment
+
+            directory = self._directory(sku)
+            try:
+                with open(os.path.join(directory, "meta.json")) as f:
+                    meta = json.load(f)
+            except FileNotFoundError:
+                raise KeyError(f"Unknown garment: {sku}") from None
+
+            garment = Garment(sku, directory, meta)
+            self._garments[sku] = garment
+            return garment
+
+    def remove(self, sku: str) -> None:
+        directory = self._directory(sku)
+        with self._lock:
+            self._garments.pop(sku, None)
+            shutil.rmtree(directory, ignore_errors=True)
+
+    def skus(self) -> List[str]:
+        if not os.path.isdir(self.path):
+            return []
+        return sorted(
+            name for name in os.listdir(self.path)
+            if not name.startswith(".") and os.path.exists(os.path.join(self.path, name, "meta.json"))
+        )
+
+    def __contains__(self, sku: str) -> bool:
+        try:
+            return os.path.exists(os.path.join(self._directory(sku), "meta.json"))
+        except ValueError:
+            return False
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Manage the preprocessed garment catalog")
+    parser.add_argument("--path", default=CATALOG_CONFIG["path"], help="Catalog directory")
+    commands = parser.add_subparsers(dest="command", required=True)
+    add = commands.add_parser("add", help="Ingest a garment image under a SKU")
+    add.add_argument("sku")
+    add.add_argument("image")
+    commands.add_parser("list", help="List ingested SKUs")
+    remove = commands.add_parser("remove", help="Remove a SKU")
+    remove.add_argument("sku")
+    args = parser.parse_args(argv)
+
+    catalog = GarmentCatalog(args.path)
+    if args.command == "add":
+        garment = catalog.ingest(args.sku, args.image)
+        print(f"{garment.sku}: {garment.size[0]}x{garment.size[1]}, "
+              f"{len(garment.encoded)} bytes {garment.wire_format}, hash {garment.image_hash[:12]}")
+    elif args.command == "list":
+        for sku in catalog.skus():
+            print(sku)
+    else:
+        catalog.remove(args.sku)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,95 @@
+import threading
+from collections import OrderedDict
+from typing import Optional
+from config import ANALYSIS_CONFIG
+
+# JSON schema the model's answer is constrained to (Gemini response_schema)
+COMPATIBILITY_SCHEMA = {
+    "type": "object",
+    "properties": {
+        "analysis": {"type": "string"},
+        "fit": {"type": "string"},
+        "color": {"type": "string"},
+        "style": {"type": "string"},
+        "occasion": {"type": "string"},
+        "compatibility_score": {"type": "number"},
+        "recommendations": {"type": "array", "items": {"type": "string"}},
+    },
+    "required": ["analysis", "compatibility_score", "recommendations"],
+}
+
+ASPECTS = ("fit", "color", "style", "occasion")
+
+
+def parse_compatibility(data: dict) -> dict:
+    """
+    Validate a schema-constrained answer: the score is clamped to 1-10 and
+    missing aspects are empty strings. Raises ValueError if required fields
+    are missing or of the wrong type.
+    """
+    if not isinstance(data, dict):
+        raise ValueError("Compatibility analysis is not a JSON object")
+
+    score = data.get("compatibility_score")
+    if isinstance(score, bool) or not isinstance(score, (int, float)):
+        raise ValueError("Compatibility analysis has no numeric compatibility_score")
+    recommendations = data.get("recommendations")
+    if not isinstance(recommendations, list):
+        raise ValueError("Compatibility analysis has no recommendations list")
+
+    result = {
+        "analysis": str(data.get("analysis") or ""),
+        "compatibility_score": min(10.0, max(1.0, float(score))),
+        "recommendations": [str(item) for item in recommendations if item],
+        "error": None,
+    }
+    for aspect in ASPECTS:
+        result[aspect] = str(data.get(aspect) or "")
+    return result
+
+
+def compatibility_error(error: Exception) -> dict:
+    """Neutral result returned (and not cached) when the analysis fails"""
+    return {
+        "analysis": f"Error analyzing compatibility: {str(error)}",
+        "compatibility_score": 5.0,
+        "recommendations": ["Unable to analyze compatibility"],
+        "error": str(error),
+    }
+
+
+class CompatibilityCache:
+    """LRU of analyses keyed by image-pair hash; callers get their own copy"""
+
+    def __init__(self, max_entries: Optional[int] = None):
+        self.max_entries = max_entries or ANALYSIS_CONFIG["cache_entries"]
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: str) -> Optional[dict]:
+        with self._lock:
+            result = self._entries.get(key)
+            if result is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+        return _copy(result)
+
+    def set(self, key: str, result: dict) -> None:
+        with self._lock:
+            self._entries[key] = _copy(result)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+
+def _copy(result: dict) -> dict:
+    result = dict(result)
+    result["recommendations"] = list(result["recommendations"])
+    return result
@@ -0,0 +1,154 @@
+from PIL import Image
+import numpy as np
+from typing import Optional, Sequence, Tuple
+
+Box = Tuple[int, int, int, int]
+
+# Rows blended per pass; bounds the 16-bit scratch buffers regardless of image size
+STRIPE_ROWS = 256
+
+
+def rgb_view(image: Image.Image) -> np.ndarray:
+    """Read-only uint8 view of an RGB image's pixels (converting other modes first)"""
+    if image.mode != 'RGB':
+        image = image.convert('RGB')
+    return np.asarray(image)
+
+
+def color_key_mask(
+    array: np.ndarray,
+    color: Sequence[int] = (255, 255, 255),
+    tolerance: int = 20
+) -> np.ndarray:
+    """
+    255 where a pixel is farther than tolerance from color in any channel,
+    0 on the keyed background: a single inRange with the invert done in place.
+    """
+    import cv2
+    color = np.asarray(color, dtype=np.int16)
+    lower = np.clip(color - tolerance, 0, 255).astype(np.uint8)
+    upper = np.clip(color + tolerance, 0, 255).astype(np.uint8)
+
+    mask = cv2.inRange(array, lower, upper)
+    cv2.bitwise_not(mask, dst=mask)
+    return mask
+
+
+def resize_array(array: np.ndarray, size: Tuple[int, int]) -> np.ndarray:
+    if (array.shape[1], array.shape[0]) == size:
+        return array
+    import cv2
+    shrinking = size[0] < array.shape[1] and size[1] < array.shape[0]
+    interpolation = cv2.INTER_AREA if shrinking else cv2.INTER_LINEAR
+    return cv2.resize(array, size, interpolation=interpolation)
+
+
+def blend_into(
+    dst: np.ndarray,
+    overlay: np.ndarray,
+    alpha: float,
+    mask: Optional[np.ndarray] = None
+) -> np.ndarray:
+    """
+    dst = dst * (1 - w) + overlay * w in place, where w is alpha, scaled by
+    mask / 255 when a mask is given. Uses 8-bit fixed-point weights and 16-bit
+    accumulators, processed in stripes of STRIPE_ROWS rows.
+    """
+    weight = int(round(min(max(alpha, 0.0), 1.0) * 256))
+    rows = min(dst.shape[0], STRIPE_ROWS)
+    accumulator = np.empty((rows,) + dst.shape[1:], dtype=np.uint16)
+    scratch = np.empty_like(accumulator)
+
+    for y in range(0, dst.shape[0], STRIPE_ROWS):
+        base = dst[y:y + STRIPE_ROWS]
+        top = overlay[y:y + STRIPE_ROWS]
+        acc = accumulator[:len(base)]
+        tmp = scratch[:len(base)]
+
+        if mask is None:
+            np.multiply(base, 256 - weight, out=acc, dtype=np.uint16)
+            np.multiply(top, weight, out=tmp, dtype=np.uint16)
+        else:
+            pixel_weight = mask[y:y + STRIPE_ROWS].astype(np.uint16)
+            pixel_weight *= weight
+            pixel_weight += 127
+            pixel_weight //= 255
+            pixel_weight = pixel_weight[..., None]
+            np.multiply(top, pixel_weight, out=tmp, dtype=np.uint16)
+            np.subtract(256, pixel_weight, out=pixel_weight)
+            np.multiply(base, pixel_weight, out=acc, dtype=np.uint16)
+
+        acc += tmp
+        acc += 128
+        acc >>= 8
+        np.copyto(base, acc, casting='unsafe')
+
+    return dst
+
+
+def clip_box(box: Optional[Box], size: Tuple[int, int]) -> Box:
+    width, height = size
+    if box is None:
+        return (0, 0, width, height)
+    x0, y0, x1, y1 = box
+    x0, x1 = max(0, min(x0, width)), max(0, min(x1, width))
+    y0, y1 = max(0, min(y0, height)), max(0, min(y1, height))
+    return (x0, y0, x1, y1)
+
+
+def _fit_stripe(image: Image.Image, size: Tuple[int, int], top: int, bottom: int) -> Image.Image:
+    """Rows top..bottom of image resized to size, without resizing the rest"""
+    scale = image.height / size[1]
+    return image.resize(
+        (size[0], bottom - top),
+        Image.Resampling.BILINEAR,
+        box=(0, top * scale, image.width, bottom * scale)
+    )
+
+
+def composite_roi(
+    base_image: Image.Image,
+    overlay_image: Image.Image,
+    box: Optional[Box] = None,
+    alpha: float = 1.0,
+    mask: Optional[Image.Image] = None,
+    max_rows: Optional[int] = None
+) -> Image.Image:
+    """
+    Blend overlay_image, fitted to box, onto a copy of base_image. Only the
+    box is resized, converted and blended; pixels outside it are copied
+    through untouched. mask (L, any size) is fitted to the box with the
+    overlay and scales alpha per pixel. With max_rows the box is processed
+    in stripes of at most that many rows, each resizing just its own slice.
+    """
+    if base_image.mode != 'RGB':
+        base_image = base_image.convert('RGB')
+    x0, y0, x1, y1 = clip_box(box, base_image.size)
+    result = base_image.copy()
+    if x1 <= x0 or y1 <= y0:
+        return result
+
+    size = (x1 - x0, y1 - y0)
+    if max_rows is None or max_rows >= size[1]:
+        roi = np.array(base_image.crop((x0, y0, x1, y1)))
+        overlay = resize_array(rgb_view(overlay_image), size)
+        mask_roi = None
+        if mask is not None:
+            mask_roi = resize_array(np.asarray(mask.convert('L')), size)
+
+        blend_into(roi, overlay, alpha, mask_roi)
+        result.paste(Image.fromarray(roi), (x0, y0))
+        return result
+
+    for top in range(0, size[1], max_rows):
+        bottom = min(top + max_rows, size[1])
+        roi = np.array(base_image.crop((x0, y0 + top, x1, y0 + bottom)))
+        # Modes are converted per stripe, after resizing, to avoid a full-size copy
+        overlay = rgb_view(_fit_stripe(overlay_image, size, top, bottom))
+        mask_roi = None
+        if mask is not None:
+            mask_roi = np.asarray(_fit_stripe(mask, size, top, bottom).convert('L'))
+
+        blend_into(roi, overlay, alpha, mask_roi)
+        result.paste(Image.fromarray(roi), (x0, y0 + top))
+    return result
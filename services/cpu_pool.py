@@ -0,0 +1,197 @@
+from PIL import Image
+import os
+import threading
+import numpy as np
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import get_context, shared_memory
+from typing import Optional, Tuple
+from .image_utils import ImageProcessor
+from .frame import Frame, read_pixels
+from .preprocess import apply_orientation, get_orientation, get_preprocessor, thumbnail_size
+from config import CPU_POOL_CONFIG, IMAGE_CONFIG
+
+# (shared memory block name, array shape) of an RGB uint8 image
+SharedSpec = Tuple[str, Tuple[int, ...]]
+
+
+def _share(shape: Tuple[int, ...]):
+    """Allocate a shared block for a uint8 array"""
+    shm = shared_memory.SharedMemory(create=True, size=max(1, int(np.prod(shape))))
+    return shm, (shm.name, shape)
+
+
+def _attach(spec: SharedSpec):
+    name, shape = spec
+    shm = shared_memory.SharedMemory(name=name)
+    return shm, np.ndarray(shape, dtype=np.uint8, buffer=shm.buf)
+
+
+def _release(shm: shared_memory.SharedMemory, unlink: bool = False) -> None:
+    try:
+        shm.close()
+    except BufferError:
+        # A traceback still holds a view; the mapping is freed with it
+        pass
+    if unlink:
+        shm.unlink()
+
+
+def _share_image(image: Image.Image):
+    """Decode image's RGB pixels straight into a new shared block"""
+    shm, spec = _share((image.height, image.width, 3))
+    read_pixels(image, np.ndarray(spec[1], dtype=np.uint8, buffer=shm.buf))
+    return shm, spec
+
+
+# What each prepare kind runs on the PIL engine; the fused engine enhances "user" only
+_PREPARE_STEPS = {
+    "user": ImageProcessor.prepare_user_image,
+    "user_fit": ImageProcessor.fit_user_image,
+    "clothing": ImageProcessor.prepare_clothing_image,
+}
+
+
+def _prepare_task(
+    kind: str,
+    source_spec: SharedSpec,
+    orientation: int,
+    output_spec: SharedSpec,
+    engine: Optional[str]
+) -> None:
+    """Worker side: preprocess the shared source pixels into the shared output block"""
+    source_shm, source = _attach(source_spec)
+    output_shm, output = _attach(output_spec)
+    try:
+        if ImageProcessor._use_fused_engine(engine):
+            preprocessor = get_preprocessor()
+            with Frame(source, orientation, preprocessor.pool).fit() as result:
+                if kind == "user":
+                    preprocessor.enhance(result.buffer, output)
+                else:
+                    np.copyto(output, result.buffer)
+        else:
+            image = Image.fromarray(np.ascontiguousarray(apply_orientation(source, orientation)))
+            result = _PREPARE_STEPS[kind](image, engine)
+            read_pixels(result, output)
+        # Drop views into the shared buffers before closing them
+        del source, output, result
+    finally:
+        _release(source_shm)
+        _release(output_shm)
+
+
+def _fallback_task(
+    user_spec: SharedSpec,
+    clothing_spec: SharedSpec,
+    output_spec: SharedSpec,
+    user_hash: Optional[str]
+) -> None:
+    """Worker side: render the fallback blend into the shared output block"""
+    user_shm, user = _attach(user_spec)
+    clothing_shm, clothing = _attach(clothing_spec)
+    output_shm, output = _attach(output_spec)
+    try:
+        result = ImageProcessor.create_fallback_image(Image.fromarray(user), Image.fromarray(clothing), user_hash)
+        read_pixels(result, output)
+        del user, clothing, output, result
+    finally:
+        _release(user_shm)
+        _release(clothing_shm)
+        _release(output_shm)
+
+
+class CPUPool:
+    """
+    Process pool for the CPU-bound stages: preprocessing and the fallback
+    render. Pixels travel through shared memory blocks owned by the calling
+    process rather than as pickled PIL images; only block names, shapes and
+    flags are pickled. Mirrors ImageProcessor's method signatures.
+    """
+
+    def __init__(self, max_workers: Optional[int] = None, start_method: Optional[str] = None):
+        self.max_workers = max_workers or CPU_POOL_CONFIG.get("max_workers") or os.cpu_count()
+        # spawn by default: forking a process that already runs threads is unsafe
+        context = get_context(start_method or CPU_POOL_CONFIG.get("start_method", "spawn"))
+        self.executor = ProcessPoolExecutor(max_workers=self.max_workers, mp_context=context)
+
+    def _submit_prepare(self, kind: str, image: Image.Image, engine: Optional[str]):
+        orientation = get_orientation(image)
+
+        transposed = orientation in (5, 6, 7, 8)
+        oriented_size = image.size[::-1] if transposed else image.size
+        target_width, target_height = thumbnail_size(oriented_size, IMAGE_CONFIG["max_image_size"])
+
+        source_shm, source_spec = _share_image(image)
+        output_shm, output_spec = _share((target_height, target_width, 3))
+        future = self.executor.submit(_prepare_task, kind, source_spec, orientation, output_spec, engine)
+        return future, source_shm, output_shm, output_spec
+
+    def _collect(self, future, output_shm, output_spec, *inputs) -> Image.Image:
+        try:
+            future.result()
+            # fromarray copies RGB pixels, so the block can be unlinked right after
+            return Image.fromarray(np.ndarray(output_spec[1], dtype=np.uint8, buffer=output_shm.buf))
+        finally:
+            for shm in inputs:
+                _release(shm, unlink=True)
+            _release(output_shm, unlink=True)
+
+    def prepare_user_image(self, user_image: Image.Image, engine: Optional[str] = None) -> Image.Image:
+        future, source_shm, output_shm, output_spec = self._submit_prepare("user", user_image, engine)
+        return self._collect(future, output_shm, output_spec, source_shm)
+
+    def fit_user_image(self, user_image: Image.Image, engine: Optional[str] = None) -> Image.Image:
+        future, source_shm, output_shm, output_spec = self._submit_prepare("user_fit", user_image, engine)
+        return self._collect(future, output_shm, output_spec, source_shm)
+
+    def prepare_clothing_image(self, clothing_image: Image.Image, engine: Optional[str] = None) -> Image.Image:
+        future, source_shm, output_shm, output_spec = self._submit_prepare("clothing", clothing_image, engine)
+        return self._collect(future, output_shm, output_spec, source_shm)
+
+    def prepare_for_tryon(
+        self,
+        user_image: Image.Image,
+        clothing_image: Image.Image,
+        engine: Optional[str] = None
+    ) -> Tuple[Image.Image, Image.Image]:
+        # Both images are submitted before waiting so they run on two cores
+        user_job = self._submit_prepare("user", user_image, engine)
+        clothing_job = self._submit_prepare("clothing", clothing_image, engine)
+
+        user_future, user_source, user_output, user_spec = user_job
+        clothing_future, clothing_source, clothing_output, clothing_spec = clothing_job
+        try:
+            user_processed = self._collect(user_future, user_output, user_spec, user_source)
+        finally:
+            clothing_processed = self._collect(clothing_future, clothing_output, clothing_spec, clothing_source)
+        return user_processed, clothing_processed
+
+    def create_fallback_image(
+        self,
+        user_image: Image.Image,
+        clothing_image: Image.Image,
+        user_hash: Optional[str] = None
+    ) -> Image.Image:
+        user_shm, user_spec = _share_image(user_image)
+        clothing_shm, clothing_spec = _share_image(clothing_image)
+        output_shm, output_spec = _share(user_spec[1])
+        future = self.executor.submit(_fallback_task, user_spec, clothing_spec, output_spec, user_hash)
+        return self._collect(future, output_shm, output_spec, user_shm, clothing_shm)
+
+    def shutdown(self) -> None:
+        self.executor.shutdown(wait=True, cancel_futures=True)
+
+
+_default_pool = None
+_default_pool_lock = threading.Lock()
+
+
+def get_cpu_pool() -> Optional[CPUPool]:
+    """Process-wide CPUPool, or None when CPU_POOL_CONFIG is disabled"""
+    global _default_pool
+    if not CPU_POOL_CONFIG.get("enabled"):
+        return None
+    with _default_pool_lock:
+        if _default_pool is None:
+            _default_pool = CPUPool()
+    return _default_pool
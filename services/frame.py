@@ -0,0 +1,256 @@
+from PIL import Image
+import hashlib
+import math
+import threading
+import numpy as np
+from typing import Optional, Tuple
+from config import FRAME_CONFIG, IMAGE_CONFIG
+
+EXIF_ORIENTATION_TAG = 0x0112
+
+
+def thumbnail_size(size: Tuple[int, int], max_size: Tuple[int, int]) -> Tuple[int, int]:
+    """Target size of PIL's Image.thumbnail, so both engines agree on output dimensions"""
+    width, height = size
+    x, y = max_size
+    if x >= width and y >= height:
+        return width, height
+
+    def round_aspect(number, key):
+        return max(min(math.floor(number), math.ceil(number), key=key), 1)
+
+    aspect = width / height
+    if x / y >= aspect:
+        x = round_aspect(y * aspect, key=lambda n: abs(aspect - n / y))
+    else:
+        y = round_aspect(x / aspect, key=lambda n: 0 if n == 0 else abs(aspect - x / n))
+    return x, y
+
+
+def get_orientation(image: Image.Image) -> int:
+    try:
+        return image.getexif().get(EXIF_ORIENTATION_TAG, 1)
+    except (AttributeError, KeyError, TypeError, ValueError):
+        return 1
+
+
+def apply_orientation(array: np.ndarray, orientation: int) -> np.ndarray:
+    """Apply an EXIF orientation as a NumPy view (no pixel copy)"""
+    if orientation == 2:
+        return array[:, ::-1]
+    if orientation == 3:
+        return array[::-1, ::-1]
+    if orientation == 4:
+        return array[::-1]
+    if orientation == 5:
+        return array.swapaxes(0, 1)
+    if orientation == 6:
+        return np.rot90(array, k=-1)
+    if orientation == 7:
+        return array[::-1, ::-1].swapaxes(0, 1)
+    if orientation == 8:
+        return np.rot90(array, k=1)
+    return array
+
+
+def stored_size(size: Tuple[int, int], orientation: int) -> Tuple[int, int]:
+    """Swap a displayed (width, height) into the stored layout for transposing orientations"""
+    return size[::-1] if orientation in (5, 6, 7, 8) else size
+
+
+def read_pixels(image: Image.Image, out: np.ndarray, rows: Optional[int] = None) -> np.ndarray:
+    """
+    Copy image's pixels as RGB into out (H, W, 3), a stripe of rows at a
+    time. np.asarray(image) would hold two full-size copies at its peak and
+    a convert('RGB') a third; here other modes are converted per stripe,
+    so the only full-size buffer is out itself.
+    """
+    rows = rows or FRAME_CONFIG["stripe_rows"]
+    width, height = image.size
+    for top in range(0, height, rows):
+        bottom = min(height, top + rows)
+        stripe = image.crop((0, top, width, bottom))
+        if stripe.mode != 'RGB':
+            stripe = stripe.convert('RGB')
+        out[top:bottom] = np.asarray(stripe)
+    return out
+
+
+class BufferPool:
+    """
+    Reusable uint8 pixel buffers. acquire() hands out a released buffer of
+    the same shape, or allocates one; release() makes it available again.
+    Released buffers beyond max_bytes are dropped, oldest first.
+    """
+
+    def __init__(self, max_bytes: Optional[int] = None):
+        self.max_bytes = max_bytes if max_bytes is not None else FRAME_CONFIG["pool_max_bytes"]
+        self.allocations = 0
+        self.reuses = 0
+        self.free_bytes = 0
+        self._free = []
+        self._lock = threading.Lock()
+
+    def acquire(self, shape: Tuple[int, ...]) -> np.ndarray:
+        shape = tuple(shape)
+        with self._lock:
+            for index, buffer in enumerate(self._free):
+                if buffer.shape == shape:
+                    del self._free[index]
+                    self.free_bytes -= buffer.nbytes
+                    self.reuses += 1
+                    return buffer
+            self.allocations += 1
+        return np.empty(shape, dtype=np.uint8)
+
+    def release(self, buffer: np.ndarray) -> None:
+        if buffer.nbytes > self.max_bytes:
+            return
+        with self._lock:
+            self._free.append(buffer)
+            self.free_bytes += buffer.nbytes
+            while self.free_bytes > self.max_bytes:
+                self.free_bytes -= self._free.pop(0).nbytes
+
+    def clear(self) -> None:
+        with self._lock:
+            self._free.clear()
+            self.free_bytes = 0
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "allocations": self.allocations,
+                "reuses": self.reuses,
+                "free_buffers": len(self._free),
+                "free_bytes": self.free_bytes,
+            }
+
+
+_default_pool = None
+_default_pool_lock = threading.Lock()
+
+
+def get_buffer_pool() -> BufferPool:
+    global _default_pool
+    with _default_pool_lock:
+        if _default_pool is None:
+            _default_pool = BufferPool()
+    return _default_pool
+
+
+class Frame:
+    """
+    Decoded RGB pixels plus the transforms still pending on them. Pixels
+    are decoded once, with any mode conversion folded into the decode; the
+    EXIF orientation is carried as state and applied once, after any
+    downscale, so each transform runs at most once per image.
+
+    Buffers come from a BufferPool. Each transform returns a new frame and
+    releases the one it replaced, and release() (or leaving a with block)
+    returns the last one. PIL cannot map RGB pixels it does not own, so
+    to_image() makes the one copy into PIL's storage and the buffer goes
+    straight back to the pool.
+    """
+
+    def __init__(
+        self,
+        buffer: np.ndarray,
+        orientation: int = 1,
+        pool: Optional[BufferPool] = None,
+        owned: bool = False
+    ):
+        self.buffer = buffer
+        self.orientation = orientation
+        self.pool = pool or get_buffer_pool()
+        # Only buffers taken from the pool go back to it
+        self.owned = owned
+
+    @classmethod
+    def from_image(
+        cls,
+        image: Image.Image,
+        max_size: Optional[Tuple[int, int]] = None,
+        pool: Optional[BufferPool] = None
+    ) -> "Frame":
+        """
+        Decode image into a pooled RGB buffer. With max_size, an image at
+        least twice too large is first box-reduced by PIL by a whole factor,
+        so the full resolution never reaches NumPy; fit() finishes the
+        resize.
+        """
+        pool = pool or get_buffer_pool()
+        orientation = get_orientation(image)
+
+        if max_size is not None and image.mode in ('RGB', 'RGBA', 'L'):
+            target = stored_size(thumbnail_size(stored_size(image.size, orientation), max_size), orientation)
+            factor = min(image.width // target[0], image.height // target[1])
+            if factor >= 2:
+                image = image.reduce(factor)
+
+        buffer = pool.acquire((image.height, image.width, 3))
+        read_pixels(image, buffer)
+        return cls(buffer, orientation, pool, owned=True)
+
+    @property
+    def size(self) -> Tuple[int, int]:
+        """(width, height) once the pending orientation is applied"""
+        height, width = self.buffer.shape[:2]
+        return stored_size((width, height), self.orientation)
+
+    def _derive(self, buffer: np.ndarray, orientation: int) -> "Frame":
+        frame = Frame(buffer, orientation, self.pool, owned=True)
+        self.release()
+        return frame
+
+    def fit(self, max_size: Optional[Tuple[int, int]] = None) -> "Frame":
+        """Area-downscale to fit max_size, then apply the pending orientation; no-op steps are skipped"""
+        if max_size is None:
+            max_size = IMAGE_CONFIG["max_image_size"]
+
+        frame = self
+        height, width = self.buffer.shape[:2]
+        target = stored_size(thumbnail_size(self.size, max_size), self.orientation)
+        if target != (width, height):
+            import cv2
+            resized = self.pool.acquire((target[1], target[0]) + self.buffer.shape[2:])
+            cv2.resize(self.buffer, target, dst=resized, interpolation=cv2.INTER_AREA)
+            frame = self._derive(resized, self.orientation)
+        return frame.oriented()
+
+    def oriented(self) -> "Frame":
+        if self.orientation == 1:
+            return self
+        view = apply_orientation(self.buffer, self.orientation)
+        buffer = self.pool.acquire(view.shape)
+        np.copyto(buffer, view)
+        return self._derive(buffer, 1)
+
+    def to_image(self) -> Image.Image:
+        """RGB image of the oriented pixels; releases the frame"""
+        frame = self.oriented()
+        image = Image.fromarray(frame.buffer)
+        frame.release()
+        return image
+
+    def hash(self) -> str:
+        """ImageProcessor.compute_image_hash of the oriented image, a stripe at a time"""
+        view = apply_orientation(self.buffer, self.orientation)
+        width, height = self.size
+        rows = FRAME_CONFIG["stripe_rows"]
+        hasher = hashlib.sha256()
+        hasher.update(f"RGB:{width}x{height}:".encode())
+        for top in range(0, height, rows):
+            hasher.update(np.ascontiguousarray(view[top:top + rows, :, :3]).data)
+        return hasher.hexdigest()
+
+    def release(self) -> None:
+        if self.owned:
+            self.pool.release(self.buffer)
+            self.owned = False
+
+    def __enter__(self) -> "Frame":
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.release()
@@ -1,51 +1,341 @@
-import google.generativeai as genai
 from PIL import Image, ImageOps
-import io
-import base64
+import asyncio
+import hashlib
+import json
+import random
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
 from typing import Optional, Union
-from config import GEMINI_API_KEY, MODEL_CONFIG
+from .cache import make_cache_key
+from .hedging import HedgingPolicy, create_hedging_policy
+from .image_utils import ImageProcessor
+from .image_codec import EncodedImage, ImageEncoder, decode_image_payload
+from .metrics import registry as metrics
+from .preprocess import get_orientation
+from .progress import ProgressRelay, ProgressTracker, track_stage
+from .rate_limit import AsyncSingleFlight, RateLimiter, RateLimitExceeded, SingleFlight
+from config import GEMINI_API_KEY, HEDGING_CONFIG, MODEL_CONFIG
 
-class GeminiClient:
-    def __init__(self):
-        if not GEMINI_API_KEY:
-            raise ValueError("GEMINI_API_KEY not found in environment variables")
+RETRYABLE_STATUS_CODES = {408, 429, 500, 502, 503, 504}
 
-        genai.configure(api_key=GEMINI_API_KEY)
-        self.model = genai.GenerativeModel(MODEL_CONFIG["model_name"])
+UploadImage = Union[Image.Image, EncodedImage]
 
-    def generate_virtual_tryon_image(
+_DEFAULT = object()
+
+
+class GeminiError(Exception):
+    """Base class for errors raised by the Gemini clients"""
+    retryable = False
+
+
+class GeminiRetryableError(GeminiError):
+    """Transient upstream failure (rate limited, overloaded, unavailable)"""
+    retryable = True
+
+
+class GeminiTimeoutError(GeminiRetryableError):
+    """The request did not complete within its deadline"""
+
+
+class GeminiResponseError(GeminiError):
+    """The model answered, but not with anything usable (e.g. no image)"""
+
+
+class GeminiQuotaError(GeminiError):
+    """The client-side rate limiter had no slot in time; nothing was sent upstream"""
+
+
+def classify_error(error: Exception) -> GeminiError:
+    if isinstance(error, GeminiError):
+        return error
+
+    message = str(error)
+    # Checked before TimeoutError: a local quota wait says nothing about upstream health
+    if isinstance(error, RateLimitExceeded):
+        return GeminiQuotaError(f"Client rate limit reached: {message}")
+    if isinstance(error, (TimeoutError, asyncio.TimeoutError)):
+        return GeminiTimeoutError(f"Request timed out: {message}")
+
+    # google.api_core exceptions carry the HTTP status in `code`
+    code = getattr(error, "code", None)
+    if isinstance(code, int) and code in RETRYABLE_STATUS_CODES:
+        if code in (408, 504):
+            return GeminiTimeoutError(message)
+        return GeminiRetryableError(message)
+
+    if isinstance(error, ConnectionError):
+        return GeminiRetryableError(message)
+
+    return GeminiError(message)
+
+
+_model_lock = threading.Lock()
+_configured = False
+_shared_models = {}
+_shared_rate_limiter = None
+_single_flight = SingleFlight()
+
+
+def _genai():
+    """The Gemini SDK, imported on first use: it dominates cold-start time"""
+    import google.generativeai as genai
+    return genai
+
+
+def get_shared_model(model_name: Optional[str] = None):
+    """Return a process-wide GenerativeModel so the underlying transport is reused"""
+    global _configured
+    genai = _genai()
+
+    if model_name is None:
+        model_name = MODEL_CONFIG["model_name"]
+
+    with _model_lock:
+        if not _configured:
+            genai.configure(api_key=GEMINI_API_KEY)
+            _configured = True
+
+        model = _shared_models.get(model_name)
+        if model is None:
+            model = genai.GenerativeModel(model_name)
+            _shared_models[model_name] = model
+
+    return model
+
+
+def get_shared_rate_limiter() -> RateLimiter:
+    """Process-wide limiter so every client draws from the same quota"""
+    global _shared_rate_limiter
+
+    with _model_lock:
+        if _shared_rate_limiter is None:
+            _shared_rate_limiter = RateLimiter(
+                requests_per_second=MODEL_CONFIG.get("requests_per_second"),
+                burst=MODEL_CONFIG.get("burst", 1),
+                max_in_flight=MODEL_CONFIG.get("max_in_flight")
+            )
+
+    return _shared_rate_limiter
+
+
+class _GeminiClientBase:
+    def __init__(
+        self,
+        model=None,
+        rate_limiter: Optional[RateLimiter] = None,
+        encoder: Optional[ImageEncoder] = None,
+        hedging: Optional[HedgingPolicy] = _DEFAULT
+    ):
+        if model is None:
+            if not GEMINI_API_KEY:
+                raise ValueError("GEMINI_API_KEY not found in environment variables")
+            model = get_shared_model()
+
+        self.model = model
+        self.rate_limiter = rate_limiter or get_shared_rate_limiter()
+        self.encoder = encoder or ImageEncoder()
+        self.coalesce_requests = MODEL_CONFIG.get("coalesce_requests", False)
+        self.request_timeout = MODEL_CONFIG.get("request_timeout_seconds")
+        self.deadline = MODEL_CONFIG.get("deadline_seconds")
+        self.max_retries = MODEL_CONFIG.get("max_retries", 0)
+        self.backoff_base = MODEL_CONFIG.get("backoff_base_seconds", 0.5)
+        self.backoff_max = MODEL_CONFIG.get("backoff_max_seconds", 8.0)
+        # Pass hedging=None to disable hedged requests regardless of HEDGING_CONFIG
+        self.hedging = create_hedging_policy() if hedging is _DEFAULT else hedging
+
+    def _normalize(self, image: UploadImage) -> UploadImage:
+        if isinstance(image, EncodedImage):
+            return image
+
+        if get_orientation(image) != 1:
+            image = ImageOps.exif_transpose(image)
+        if image.mode != 'RGB':
+            image = image.convert('RGB')
+        return image
+
+    def _content_hash(self, image: UploadImage) -> str:
+        if isinstance(image, EncodedImage):
+            return image.content_hash or hashlib.sha256(image.data).hexdigest()
+        return ImageProcessor.compute_image_hash(image)
+
+    def _encode_part(self, image: UploadImage, image_hash: Optional[str] = None) -> dict:
+        """Encode an image as an inline blob; pre-encoded images pass straight through"""
+        if not isinstance(image, EncodedImage):
+            image = self.encoder.encode(self._normalize(image), image_hash)
+        metrics.observe_bytes("gemini_upload_bytes", len(image))
+        return image.to_part()
+
+    def _build_tryon_content(
         self,
         prompt: str,
-        user_image: Image.Image,
-        clothing_image: Image.Image
-    ) -> Image.Image:
-        try:
-            user_image = ImageOps.exif_transpose(user_image)
-            clothing_image = ImageOps.exif_transpose(clothing_image)
+        user_image: UploadImage,
+        clothing_image: UploadImage,
+        user_hash: Optional[str] = None,
+        clothing_hash: Optional[str] = None
+    ) -> list:
+        return [
+            prompt,
+            self._encode_part(user_image, user_hash),
+            self._encode_part(clothing_image, clothing_hash)
+        ]
+
+    def _extract_image(self, response) -> Image.Image:
+        for part in response.candidates[0].content.parts:
+            if part.inline_data is not None:
+                metrics.observe_bytes("gemini_response_bytes", len(part.inline_data.data))
+                try:
+                    return decode_image_payload(part.inline_data.data)
+                except (ValueError, OSError) as e:
+                    raise GeminiResponseError(f"Could not decode image data: {str(e)}") from e
+
+        raise GeminiResponseError("No image data found in response")
+
+    def _attempt_timeout(self, deadline_at: Optional[float]) -> Optional[float]:
+        """Per-attempt timeout, clipped to whatever is left of the overall deadline"""
+        timeout = self.request_timeout
+        if deadline_at is not None:
+            remaining = deadline_at - time.monotonic()
+            if remaining <= 0:
+                raise GeminiTimeoutError("Request deadline exceeded")
+            timeout = remaining if timeout is None else min(timeout, remaining)
+        return timeout
+
+    def _retry_delay(self, attempt: int, deadline_at: Optional[float]) -> Optional[float]:
+        """Full-jitter exponential backoff; None when no further attempt fits"""
+        if attempt >= self.max_retries:
+            return None
+
+        delay = random.uniform(0, min(self.backoff_max, self.backoff_base * (2 ** attempt)))
+        if deadline_at is not None and time.monotonic() + delay >= deadline_at:
+            return None
+        return delay
+
+    def _remaining(self, deadline_at: Optional[float]) -> Optional[float]:
+        if deadline_at is None:
+            return None
+        return max(0.0, deadline_at - time.monotonic())
+
+    def _deadline_at(self, request_deadline_at: Optional[float] = None) -> Optional[float]:
+        """The client's own deadline, tightened to the caller's when one is given"""
+        deadline_at = None if self.deadline is None else time.monotonic() + self.deadline
+        if request_deadline_at is not None:
+            deadline_at = request_deadline_at if deadline_at is None else min(deadline_at, request_deadline_at)
+        return deadline_at
+
+    def _request_options(self, timeout: Optional[float]) -> Optional[dict]:
+        if timeout is None:
+            return None
+        return {"timeout": timeout}
+
+    def _record_latency(self, started_at: float) -> None:
+        if self.hedging is not None:
+            self.hedging.record(time.monotonic() - started_at)
+
+
+class GeminiClient(_GeminiClientBase):
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._hedge_executor = None
+        self._hedge_executor_lock = threading.Lock()
+
+    def _call_model(self, content: list, deadline_at: Optional[float], kwargs: dict):
+        with self.rate_limiter.acquire(timeout=self._remaining(deadline_at)):
+            timeout = self._attempt_timeout(deadline_at)
+            started_at = time.monotonic()
+            response = self.model.generate_content(
+                content,
+                request_options=self._request_options(timeout),
+                **kwargs
+            )
+        self._record_latency(started_at)
+        return response
+
+    def _executor(self) -> ThreadPoolExecutor:
+        with self._hedge_executor_lock:
+            if self._hedge_executor is None:
+                self._hedge_executor = ThreadPoolExecutor(
+                    max_workers=HEDGING_CONFIG.get("max_workers", 32),
+                    thread_name_prefix="gemini-hedge"
+                )
+            return self._hedge_executor
+
+    def _hedged_call(self, content: list, deadline_at: Optional[float], kwargs: dict):
+        """
+        Run the call on a worker thread; if it is still pending after the
+        policy's delay, send a duplicate and return whichever succeeds first.
+        A blocking SDK call cannot be cancelled, so the loser runs to
+        completion (holding its rate limiter slot) and its response is dropped.
+        """
+        executor = self._executor()
+        delay = self.hedging.start_request()
+        primary = executor.submit(self._call_model, content, deadline_at, kwargs)
+        pending = {primary}
 
-            if user_image.mode != 'RGB':
-                user_image = user_image.convert('RGB')
-            if clothing_image.mode != 'RGB':
-                clothing_image = clothing_image.convert('RGB')
+        if delay is not None:
+            done, _ = wait(pending, timeout=delay)
+            if not done and self.hedging.try_hedge():
+                metrics.inc("gemini_hedges_total")
+                pending.add(executor.submit(self._call_model, content, deadline_at, kwargs))
 
-            content = [prompt, user_image, clothing_image]
+        first_error = None
+        while pending:
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                error = future.exception()
+                if error is None:
+                    if future is not primary:
+                        metrics.inc("gemini_hedge_wins_total")
+                    return future.result()
+                first_error = first_error or error
+        raise first_error
 
-            response = self.model.generate_content(content)
+    def _generate_with_retry(self, content: list, deadline_at: Optional[float] = None, **kwargs):
+        deadline_at = self._deadline_at(deadline_at)
+        attempt = 0
 
-            for i, part in enumerate(response.candidates[0].content.parts):
-                if part.inline_data is not None:
-                    try:
-                        image_data = base64.b64decode(part.inline_data.data)
-                        generated_image = Image.open(io.BytesIO(image_data))
-                        return generated_image
-                    except:
-                        generated_image = Image.open(io.BytesIO(part.inline_data.data))
-                        return generated_image
+        while True:
+            try:
+                if self.hedging is not None:
+                    return self._hedged_call(content, deadline_at, kwargs)
+                return self._call_model(content, deadline_at, kwargs)
+            except Exception as e:
+                error = classify_error(e)
+                delay = self._retry_delay(attempt, deadline_at) if error.retryable else None
+                if delay is None:
+                    metrics.inc("gemini_errors_total", labels={"type": type(error).__name__})
+                    raise error from e
+                metrics.inc("gemini_retries_total")
 
-            raise Exception("No image data found in response")
+            time.sleep(delay)
+            attempt += 1
 
+    def generate_virtual_tryon_image(
+        self,
+        prompt: str,
+        user_image: UploadImage,
+        clothing_image: UploadImage,
+        user_hash: Optional[str] = None,
+        clothing_hash: Optional[str] = None,
+        progress: Optional[ProgressTracker] = None,
+        deadline_at: Optional[float] = None
+    ) -> Image.Image:
+        try:
+            with track_stage(progress, "encode"):
+                content = self._build_tryon_content(
+                    prompt, user_image, clothing_image, user_hash, clothing_hash
+                )
+
+            with track_stage(progress, "model"):
+                response = self._generate_with_retry(content, deadline_at)
+
+            with track_stage(progress, "decode_result"):
+                return self._extract_image(response)
+
+        except GeminiError as e:
+            raise type(e)(f"Error generating virtual try-on image: {str(e)}") from e
         except Exception as e:
-            raise Exception(f"Error generating virtual try-on image: {str(e)}")
+            raise GeminiError(f"Error generating virtual try-on image: {str(e)}") from e
 
     def generate_image_response(
         self,
@@ -58,17 +348,17 @@ class GeminiClient:
 
             if isinstance(image, str):
                 image = Image.open(image)
-            content.append(image)
+            content.append(self._encode_part(image))
 
             if additional_images:
                 for img in additional_images:
                     if isinstance(img, str):
                         img = Image.open(img)
-                    content.append(img)
+                    content.append(self._encode_part(img))
 
-            response = self.model.generate_content(
+            response = self._generate_with_retry(
                 content,
-                generation_config=genai.types.GenerationConfig(
+                generation_config=_genai().types.GenerationConfig(
                     temperature=MODEL_CONFIG["temperature"],
                     max_output_tokens=MODEL_CONFIG["max_output_tokens"]
                 )
@@ -76,16 +366,229 @@ class GeminiClient:
 
             return response.text
 
+        except GeminiError as e:
+            raise type(e)(f"Error generating response from Gemini: {str(e)}") from e
         except Exception as e:
-            raise Exception(f"Error generating response from Gemini: {str(e)}")
+            raise GeminiError(f"Error generating response from Gemini: {str(e)}") from e
+
+    def generate_structured_response(
+        self,
+        prompt: str,
+        images: list,
+        schema: dict,
+        image_hashes: Optional[list] = None,
+        settings: Optional[dict] = None,
+        deadline_at: Optional[float] = None
+    ) -> dict:
+        """
+        Ask for a JSON answer constrained to schema and return it parsed.
+        Images may be pre-encoded; image_hashes let the encoder cache reuse
+        uploads already encoded for another call.
+        """
+        settings = settings or MODEL_CONFIG
+        hashes = image_hashes or [None] * len(images)
+        try:
+            content = [prompt] + [
+                self._encode_part(self._normalize(image), image_hash)
+                for image, image_hash in zip(images, hashes)
+            ]
+
+            response = self._generate_with_retry(
+                content,
+                deadline_at,
+                generation_config=_genai().types.GenerationConfig(
+                    temperature=settings["temperature"],
+                    max_output_tokens=settings["max_output_tokens"],
+                    response_mime_type="application/json",
+                    response_schema=schema
+                )
+            )
+
+            try:
+                return json.loads(response.text)
+            except ValueError as e:
+                raise GeminiResponseError(f"Response is not valid JSON: {str(e)}") from e
+
+        except GeminiError as e:
+            raise type(e)(f"Error generating structured response from Gemini: {str(e)}") from e
+        except Exception as e:
+            raise GeminiError(f"Error generating structured response from Gemini: {str(e)}") from e
 
     def analyze_image(self, image: Union[Image.Image, str], prompt: str) -> str:
         return self.generate_image_response(prompt, image)
 
     def process_virtual_tryon(
         self,
-        user_image: Image.Image,
-        clothing_image: Image.Image,
-        prompt: str
+        user_image: UploadImage,
+        clothing_image: UploadImage,
+        prompt: str,
+        progress: Optional[ProgressTracker] = None,
+        deadline_at: Optional[float] = None
     ) -> Image.Image:
-        return self.generate_virtual_tryon_image(prompt, user_image, clothing_image)
\ No newline at end of file
+        user_image = self._normalize(user_image)
+        clothing_image = self._normalize(clothing_image)
+
+        if not self.coalesce_requests:
+            return self.generate_virtual_tryon_image(
+                prompt, user_image, clothing_image, progress=progress, deadline_at=deadline_at
+            )
+
+        # Hash once: the same digests key the single-flight and the encoder cache
+        user_hash = self._content_hash(user_image)
+        clothing_hash = self._content_hash(clothing_image)
+
+        # Identical concurrent requests share one upstream call. Followers see
+        # the leader's stages and give up at their own deadline.
+        relay = ProgressRelay(progress)
+        try:
+            result, shared = _single_flight.do(
+                make_cache_key(user_hash, clothing_hash, prompt),
+                lambda: self.generate_virtual_tryon_image(
+                    prompt, user_image, clothing_image, user_hash, clothing_hash, relay, deadline_at
+                ),
+                timeout=self._remaining(self._deadline_at(deadline_at)),
+                state=relay,
+                join=lambda leader: leader.follow(progress)
+            )
+        except TimeoutError as e:
+            raise GeminiTimeoutError(f"Error generating virtual try-on image: {str(e)}") from e
+        return result.copy() if shared else result
+
+
+class AsyncGeminiClient(_GeminiClientBase):
+    """asyncio variant of GeminiClient sharing the same model and retry policy"""
+
+    def __init__(
+        self,
+        model=None,
+        rate_limiter: Optional[RateLimiter] = None,
+        encoder: Optional[ImageEncoder] = None,
+        hedging: Optional[HedgingPolicy] = _DEFAULT
+    ):
+        super().__init__(model=model, rate_limiter=rate_limiter, encoder=encoder, hedging=hedging)
+        self._single_flight = AsyncSingleFlight()
+
+    async def _call_model(self, content: list, deadline_at: Optional[float], kwargs: dict):
+        async with self.rate_limiter.acquire_async(timeout=self._remaining(deadline_at)):
+            timeout = self._attempt_timeout(deadline_at)
+            started_at = time.monotonic()
+            response = await asyncio.wait_for(
+                self.model.generate_content_async(
+                    content,
+                    request_options=self._request_options(timeout),
+                    **kwargs
+                ),
+                timeout
+            )
+        self._record_latency(started_at)
+        return response
+
+    async def _hedged_call(self, content: list, deadline_at: Optional[float], kwargs: dict):
+        """Async counterpart of GeminiClient._hedged_call; the losing call is cancelled"""
+        delay = self.hedging.start_request()
+        primary = asyncio.ensure_future(self._call_model(content, deadline_at, kwargs))
+        pending = {primary}
+
+        try:
+            if delay is not None:
+                done, _ = await asyncio.wait(pending, timeout=delay)
+                if not done and self.hedging.try_hedge():
+                    metrics.inc("gemini_hedges_total")
+                    pending.add(asyncio.ensure_future(self._call_model(content, deadline_at, kwargs)))
+
+            first_error = None
+            while pending:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    error = task.exception()
+                    if error is None:
+                        if task is not primary:
+                            metrics.inc("gemini_hedge_wins_total")
+                        return task.result()
+                    first_error = first_error or error
+            raise first_error
+        finally:
+            for task in pending:
+                task.cancel()
+
+    async def _generate_with_retry(self, content: list, deadline_at: Optional[float] = None, **kwargs):
+        deadline_at = self._deadline_at(deadline_at)
+        attempt = 0
+
+        while True:
+            try:
+                if self.hedging is not None:
+                    return await self._hedged_call(content, deadline_at, kwargs)
+                return await self._call_model(content, deadline_at, kwargs)
+            except Exception as e:
+                error = classify_error(e)
+                delay = self._retry_delay(attempt, deadline_at) if error.retryable else None
+                if delay is None:
+                    metrics.inc("gemini_errors_total", labels={"type": type(error).__name__})
+                    raise error from e
+                metrics.inc("gemini_retries_total")
+
+            await asyncio.sleep(delay)
+            attempt += 1
+
+    async def generate_virtual_tryon_image(
+        self,
+        prompt: str,
+        user_image: UploadImage,
+        clothing_image: UploadImage,
+        user_hash: Optional[str] = None,
+        clothing_hash: Optional[str] = None,
+        progress: Optional[ProgressTracker] = None,
+        deadline_at: Optional[float] = None
+    ) -> Image.Image:
+        try:
+            with track_stage(progress, "encode"):
+                content = self._build_tryon_content(
+                    prompt, user_image, clothing_image, user_hash, clothing_hash
+                )
+
+            with track_stage(progress, "model"):
+                response = await self._generate_with_retry(content, deadline_at)
+
+            with track_stage(progress, "decode_result"):
+                return self._extract_image(response)
+
+        except GeminiError as e:
+            raise type(e)(f"Error generating virtual try-on image: {str(e)}") from e
+        except Exception as e:
+            raise GeminiError(f"Error generating virtual try-on image: {str(e)}") from e
+
+    async def process_virtual_tryon(
+        self,
+        user_image: UploadImage,
+        clothing_image: UploadImage,
+        prompt: str,
+        progress: Optional[ProgressTracker] = None,
+        deadline_at: Optional[float] = None
+    ) -> Image.Image:
+        user_image = self._normalize(user_image)
+        clothing_image = self._normalize(clothing_image)
+
+        if not self.coalesce_requests:
+            return await self.generate_virtual_tryon_image(
+                prompt, user_image, clothing_image, progress=progress, deadline_at=deadline_at
+            )
+
+        # Hash once: the same digests key the single-flight and the encoder cache
+        user_hash = self._content_hash(user_image)
+        clothing_hash = self._content_hash(clothing_image)
+
+        relay = ProgressRelay(progress)
+        try:
+            result, shared = await self._single_flight.do(
+                make_cache_key(user_hash, clothing_hash, prompt),
+                lambda: self.generate_virtual_tryon_image(
+                    prompt, user_image, clothing_image, user_hash, clothing_hash, relay, deadline_at
+                ),
+                timeout=self._remaining(self._deadline_at(deadline_at)),
+                state=relay,
+                join=lambda leader: leader.follow(progress)
+            )
+        except TimeoutError as e:
+            raise GeminiTimeoutError(f"Error generating virtual try-on image: {str(e)}") from e
+        return result.copy() if shared else result
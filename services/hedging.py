@@ -0,0 +1,120 @@
+import math
+import threading
+from bisect import bisect_left
+from collections import deque
+from typing import Optional
+from config import HEDGING_CONFIG
+
+
+class RollingHistogram:
+    """
+    Latency histogram over the last `window` observations. Buckets grow
+    geometrically by `growth`, so percentiles are accurate to that ratio;
+    the oldest sample is evicted as each new one arrives.
+    """
+
+    def __init__(
+        self,
+        window: int = 500,
+        min_value: float = 0.01,
+        max_value: float = 600.0,
+        growth: float = 1.1
+    ):
+        count = int(math.ceil(math.log(max_value / min_value, growth))) + 1
+        self.bounds = [min_value * growth ** i for i in range(count)]
+        self.counts = [0] * (count + 1)
+        self._samples = deque(maxlen=window)
+
+    def __len__(self) -> int:
+        return len(self._samples)
+
+    def observe(self, value: float) -> None:
+        index = bisect_left(self.bounds, value)
+        if len(self._samples) == self._samples.maxlen:
+            self.counts[self._samples[0]] -= 1
+        self._samples.append(index)
+        self.counts[index] += 1
+
+    def percentile(self, percent: float) -> Optional[float]:
+        """Upper bound of the bucket holding the given percentile, or None when empty"""
+        if not self._samples:
+            return None
+        rank = max(1, int(math.ceil(percent / 100 * len(self._samples))))
+        seen = 0
+        for index, count in enumerate(self.counts):
+            seen += count
+            if seen >= rank:
+                return self.bounds[min(index, len(self.bounds) - 1)]
+        return self.bounds[-1]
+
+
+class HedgingPolicy:
+    """
+    Decides when to send a duplicate (hedged) Gemini request. A request that
+    has not answered by the given percentile of recent latency is hedged,
+    provided the budget allows: every request earns `budget` tokens and
+    every hedge spends one, so hedges never exceed that fraction of all
+    requests so far. Up to `burst` unspent tokens are saved for clusters of
+    slow calls.
+    """
+
+    def __init__(
+        self,
+        percentile: Optional[float] = None,
+        budget: Optional[float] = None,
+        min_samples: Optional[int] = None,
+        min_delay: Optional[float] = None,
+        window: Optional[int] = None,
+        burst: Optional[float] = None
+    ):
+        self.percentile = percentile if percentile is not None else HEDGING_CONFIG["percentile"]
+        self.budget = budget if budget is not None else HEDGING_CONFIG["budget"]
+        self.min_samples = min_samples if min_samples is not None else HEDGING_CONFIG["min_samples"]
+        self.min_delay = min_delay if min_delay is not None else HEDGING_CONFIG["min_delay_seconds"]
+        self.burst = max(1.0, burst if burst is not None else HEDGING_CONFIG.get("burst", 1.0))
+        self.latencies = RollingHistogram(window or HEDGING_CONFIG["window"])
+
+        self.requests = 0
+        self.hedges = 0
+        self._tokens = 0.0
+        self._lock = threading.Lock()
+
+    def record(self, latency: float) -> None:
+        """Latency of a successful model call"""
+        with self._lock:
+            self.latencies.observe(latency)
+
+    def start_request(self) -> Optional[float]:
+        """Count a request toward the budget; returns seconds to wait before hedging, or None"""
+        with self._lock:
+            self.requests += 1
+            self._tokens = min(self.burst, self._tokens + self.budget)
+            if not self.latencies or len(self.latencies) < self.min_samples:
+                return None
+            return max(self.min_delay, self.latencies.percentile(self.percentile))
+
+    def try_hedge(self) -> bool:
+        """Spend budget on a hedge; False when the budget is exhausted"""
+        with self._lock:
+            # Tolerance for the float sum of budget increments
+            if self._tokens < 1.0 - 1e-9:
+                return False
+            self._tokens -= 1.0
+            self.hedges += 1
+            return True
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "requests": self.requests,
+                "hedges": self.hedges,
+                "samples": len(self.latencies),
+                "delay": self.latencies.percentile(self.percentile),
+            }
+
+
+def create_hedging_policy() -> Optional[HedgingPolicy]:
+    """HedgingPolicy from HEDGING_CONFIG, or None when hedging is disabled"""
+    if not HEDGING_CONFIG.get("enabled"):
+        return None
+    return HedgingPolicy()
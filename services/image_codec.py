@@ -0,0 +1,298 @@
+from PIL import Image
+import binascii
+import io
+import threading
+import numpy as np
+from collections import OrderedDict
+from typing import Optional, Union
+from .image_utils import ImageProcessor
+from config import FRAME_CONFIG, IMAGE_CONFIG
+
+MIME_TYPES = {
+    "JPEG": "image/jpeg",
+    "WEBP": "image/webp",
+    "PNG": "image/png",
+}
+
+LOSSY_FORMATS = ("JPEG", "WEBP")
+
+# Leading bytes of each format, raw and as they appear once base64-encoded
+_MAGIC_BYTES = (
+    (b"\x89PNG\r\n\x1a\n", "PNG"),
+    (b"\xff\xd8\xff", "JPEG"),
+    (b"GIF8", "GIF"),
+)
+_BASE64_PREFIXES = (b"iVBORw0KGgo", b"/9j/", b"R0lGOD", b"UklGR")
+# Base64 characters decoded per pass; a whole number of 4-character quads
+_BASE64_CHUNK = 64 * 1024
+
+
+class EncodedImage:
+    """Encoded image bytes ready to be sent to the model as an inline blob"""
+
+    def __init__(
+        self,
+        data: bytes,
+        format: str,
+        quality: Optional[int] = None,
+        content_hash: Optional[str] = None
+    ):
+        self.data = data
+        self.format = format
+        self.quality = quality
+        # Pixel hash of the source image, when known, so it need not be recomputed
+        self.content_hash = content_hash
+
+    @property
+    def mime_type(self) -> str:
+        return MIME_TYPES[self.format]
+
+    def __len__(self) -> int:
+        return len(self.data)
+
+    def to_part(self) -> dict:
+        return {"mime_type": self.mime_type, "data": self.data}
+
+
+class ImageEncoder:
+    """
+    Encodes images for upload with an explicit format, quality and chroma
+    subsampling. With max_bytes set, lossy formats binary-search the highest
+    quality that fits the budget. Results are cached by content hash so a
+    shared image is only encoded once.
+    """
+
+    def __init__(
+        self,
+        format: Optional[str] = None,
+        quality: Optional[int] = None,
+        subsampling: Optional[str] = None,
+        max_bytes: Optional[int] = None,
+        min_quality: int = 40,
+        cache_entries: int = 64
+    ):
+        self.format = (format or IMAGE_CONFIG.get("wire_format", "JPEG")).upper()
+        if self.format == "JPG":
+            self.format = "JPEG"
+        if self.format not in MIME_TYPES:
+            raise ValueError(f"Unsupported wire format: {self.format}")
+
+        self.quality = quality if quality is not None else IMAGE_CONFIG["quality"]
+        self.subsampling = subsampling if subsampling is not None else IMAGE_CONFIG.get("wire_subsampling")
+        self.max_bytes = max_bytes if max_bytes is not None else IMAGE_CONFIG.get("wire_max_bytes")
+        self.min_quality = min(min_quality, self.quality)
+        self.cache_entries = cache_entries
+
+        self.encodes = 0
+        self.cache_hits = 0
+        self.bytes_encoded = 0
+        self._cache = OrderedDict()
+        self._lock = threading.Lock()
+
+    def encode(self, image: Image.Image, image_hash: Optional[str] = None) -> EncodedImage:
+        if self.cache_entries <= 0:
+            encoded = self._encode(image)
+            encoded.content_hash = image_hash
+            return encoded
+
+        if image_hash is None:
+            image_hash = ImageProcessor.compute_image_hash(image)
+
+        with self._lock:
+            encoded = self._cache.get(image_hash)
+            if encoded is not None:
+                self._cache.move_to_end(image_hash)
+                self.cache_hits += 1
+                return encoded
+
+        encoded = self._encode(image)
+        encoded.content_hash = image_hash
+
+        with self._lock:
+            self._cache[image_hash] = encoded
+            while len(self._cache) > self.cache_entries:
+                self._cache.popitem(last=False)
+
+        return encoded
+
+    def _encode(self, image: Image.Image) -> EncodedImage:
+        if image.mode not in ('RGB', 'L') and self.format == "JPEG":
+            image = image.convert('RGB')
+
+        if self.format not in LOSSY_FORMATS:
+            data = self._save(image, None)
+            return self._record(EncodedImage(data, self.format))
+
+        data = self._save(image, self.quality)
+        if self.max_bytes is None or len(data) <= self.max_bytes:
+            return self._record(EncodedImage(data, self.format, self.quality))
+
+        # Highest quality that fits the byte budget; fall back to min_quality
+        best_data, best_quality = None, self.min_quality
+        low, high = self.min_quality, self.quality - 1
+        while low <= high:
+            quality = (low + high) // 2
+            candidate = self._save(image, quality)
+            if len(candidate) <= self.max_bytes:
+                best_data, best_quality = candidate, quality
+                low = quality + 1
+            else:
+                high = quality - 1
+
+        if best_data is None:
+            best_data = self._save(image, self.min_quality)
+
+        return self._record(EncodedImage(best_data, self.format, best_quality))
+
+    def _save(self, image: Image.Image, quality: Optional[int]) -> bytes:
+        options = {}
+        if self.format == "JPEG":
+            options["quality"] = quality
+            options["optimize"] = True
+            if self.subsampling is not None:
+                options["subsampling"] = self.subsampling
+        elif self.format == "WEBP":
+            options["quality"] = quality
+            options["method"] = 4
+        else:
+            options["compress_level"] = 6
+
+        buf = io.BytesIO()
+        image.save(buf, format=self.format, **options)
+        return buf.getvalue()
+
+    def _record(self, encoded: EncodedImage) -> EncodedImage:
+        with self._lock:
+            self.encodes += 1
+            self.bytes_encoded += len(encoded)
+        return encoded
+
+    def stats(self) -> dict:
+        return {
+            "encodes": self.encodes,
+            "cache_hits": self.cache_hits,
+            "bytes_encoded": self.bytes_encoded,
+        }
+
+
+def sniff_image_format(data: Union[bytes, memoryview]) -> Optional[str]:
+    """Identify an encoded image from its magic bytes without copying the payload"""
+    header = bytes(memoryview(data)[:12])
+    for magic, format in _MAGIC_BYTES:
+        if header.startswith(magic):
+            return format
+    if header[:4] == b"RIFF" and header[8:12] == b"WEBP":
+        return "WEBP"
+    return None
+
+
+class _BufferReader(io.RawIOBase):
+    """Seekable read-only file over a buffer, without the copy io.BytesIO makes of non-bytes"""
+
+    def __init__(self, buffer: Union[bytes, bytearray, memoryview]):
+        self._view = memoryview(buffer).cast("B")
+        self._pos = 0
+
+    def readable(self) -> bool:
+        return True
+
+    def seekable(self) -> bool:
+        return True
+
+    def read(self, size: int = -1) -> bytes:
+        end = len(self._view) if size is None or size < 0 else self._pos + size
+        data = bytes(self._view[self._pos:end])
+        self._pos += len(data)
+        return data
+
+    def readinto(self, buffer) -> int:
+        count = max(0, min(len(buffer), len(self._view) - self._pos))
+        buffer[:count] = self._view[self._pos:self._pos + count]
+        self._pos += count
+        return count
+
+    def seek(self, offset: int, whence: int = io.SEEK_SET) -> int:
+        if whence == io.SEEK_CUR:
+            offset += self._pos
+        elif whence == io.SEEK_END:
+            offset += len(self._view)
+        if offset < 0:
+            raise ValueError("Negative seek position")
+        self._pos = offset
+        return self._pos
+
+    def tell(self) -> int:
+        return self._pos
+
+
+def _decode_base64(view: memoryview) -> Union[bytes, bytearray]:
+    """
+    Decode base64 a chunk at a time into one buffer sized up front. Payloads
+    with line breaks, whose chunks do not end on whole quads, are decoded in
+    a single call instead.
+    """
+    tail = bytes(view[-2:])
+    padding = len(tail) - len(tail.rstrip(b"="))
+    out = bytearray(len(view) // 4 * 3 - padding)
+    written = 0
+    try:
+        for start in range(0, len(view), _BASE64_CHUNK):
+            chunk = binascii.a2b_base64(view[start:start + _BASE64_CHUNK])
+            out[written:written + len(chunk)] = chunk
+            written += len(chunk)
+    except binascii.Error:
+        return binascii.a2b_base64(view)
+    del out[written:]
+    return out
+
+
+def _to_array(image: Image.Image) -> np.ndarray:
+    """Writable array of image's pixels, filled a stripe of rows at a time"""
+    rows = FRAME_CONFIG["stripe_rows"]
+    width, height = image.size
+    out = None
+    for top in range(0, height, rows):
+        stripe = np.asarray(image.crop((0, top, width, min(height, top + rows))))
+        if out is None:
+            out = np.empty((height,) + stripe.shape[1:], dtype=stripe.dtype)
+        out[top:top + len(stripe)] = stripe
+    return out
+
+
+def decode_image_payload(
+    data: Union[bytes, bytearray, memoryview, str],
+    as_array: bool = False
+) -> Union[Image.Image, np.ndarray]:
+    """
+    Decode a model response payload. The format is detected up front from the
+    magic bytes, base64 is decoded only when the payload is actually base64,
+    and the payload is parsed in place rather than copied. The returned image
+    is fully loaded with no reference to the payload; multi-frame images keep
+    it, since later frames are decoded on seek(). as_array=True returns a
+    writable array instead.
+    """
+    if isinstance(data, str):
+        data = data.encode("ascii")
+
+    view = memoryview(data)
+    if sniff_image_format(view) is None:
+        if not bytes(view[:11]).startswith(_BASE64_PREFIXES):
+            raise ValueError("Unrecognized image payload")
+        try:
+            data = _decode_base64(view)
+        except binascii.Error as e:
+            raise ValueError(f"Invalid base64 image payload: {str(e)}") from e
+        if sniff_image_format(data) is None:
+            raise ValueError("Unrecognized image payload")
+
+    image = Image.open(_BufferReader(data))
+    if getattr(image, "n_frames", 1) > 1:
+        image.load()
+    else:
+        # Leaving the context detaches the loaded image from the payload
+        with image:
+            image.load()
+
+    if as_array:
+        return _to_array(image)
+    return image
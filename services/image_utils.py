@@ -1,19 +1,96 @@
-from PIL import Image, ImageEnhance, ImageFilter, ImageOps
+from PIL import Image, ImageEnhance, ImageOps
 import numpy as np
-import cv2
-from typing import Tuple, Optional
-from config import IMAGE_CONFIG
+import hashlib
+import io
+import os
+from typing import BinaryIO, Tuple, Optional, Union
+from .bounds import bounds_cache
+from .compositing import clip_box, color_key_mask, composite_roi, rgb_view
+from .preprocess import get_orientation, get_preprocessor, thumbnail_size
+from .tiling import (
+    COMPOSITE_BYTES_PER_PIXEL,
+    ENHANCE_BYTES_PER_PIXEL,
+    MASK_BYTES_PER_PIXEL,
+    map_stripes,
+    should_tile,
+    stripe_rows,
+)
+from config import APP_CONFIG, FRAME_CONFIG, IMAGE_CONFIG, PREVIEW_CONFIG
+
+# OpenCV is imported inside the functions that need it (here and in the
+# bounds, compositing and preprocess modules) so importing services stays cheap
 
 class ImageProcessor:
     @staticmethod
     def fix_image_orientation(image: Image.Image) -> Image.Image:
-        """Fix image orientation based on EXIF data"""
+        """Fix image orientation based on EXIF data; upright images are returned as-is, not copied"""
         try:
-            image = ImageOps.exif_transpose(image)
+            if get_orientation(image) != 1:
+                image = ImageOps.exif_transpose(image)
         except (AttributeError, KeyError, TypeError):
             pass
         return image
 
+    @staticmethod
+    def load_image(
+        source: Union[str, bytes, BinaryIO],
+        max_size: Tuple[int, int] = None,
+        max_file_size_mb: Optional[float] = None
+    ) -> Image.Image:
+        """
+        Decode an upload near its target size: JPEGs use DCT-domain scaling via
+        draft(), EXIF orientation is applied to the reduced image, and oversized
+        files are rejected before any pixels are decoded.
+        """
+        if max_size is None:
+            max_size = IMAGE_CONFIG["max_image_size"]
+        if max_file_size_mb is None:
+            max_file_size_mb = APP_CONFIG["max_file_size_mb"]
+
+        if isinstance(source, (bytes, bytearray, memoryview)):
+            source = io.BytesIO(source)
+
+        file_size = ImageProcessor._source_size(source)
+        if max_file_size_mb and file_size is not None and file_size > max_file_size_mb * 1024 * 1024:
+            raise ValueError(
+                f"Image is {file_size / (1024 * 1024):.1f}MB, "
+                f"larger than the {max_file_size_mb}MB limit"
+            )
+
+        image = Image.open(source)
+
+        # Rotated orientations swap width and height, so size the draft for the
+        # stored (pre-rotation) layout
+        width, height = image.size
+        if get_orientation(image) in (5, 6, 7, 8):
+            target = thumbnail_size((height, width), max_size)[::-1]
+        else:
+            target = thumbnail_size((width, height), max_size)
+
+        image.draft(None, target)
+        image = ImageProcessor.fix_image_orientation(image)
+        image.thumbnail(max_size, Image.Resampling.LANCZOS)
+        return image
+
+    @staticmethod
+    def _source_size(source: Union[str, BinaryIO]) -> Optional[int]:
+        if isinstance(source, str):
+            return os.path.getsize(source)
+
+        # Streamlit's UploadedFile exposes the byte count directly
+        size = getattr(source, "size", None)
+        if isinstance(size, int):
+            return size
+
+        try:
+            position = source.tell()
+            source.seek(0, os.SEEK_END)
+            size = source.tell()
+            source.seek(position)
+            return size
+        except (AttributeError, OSError):
+            return None
+
     @staticmethod
     def resize_image(image: Image.Image, max_size: Tuple[int, int] = None) -> Image.Image:
         if max_size is None:
@@ -22,6 +99,17 @@ class ImageProcessor:
         image.thumbnail(max_size, Image.Resampling.LANCZOS)
         return image
 
+    @staticmethod
+    def fit_image(image: Image.Image, max_size: Tuple[int, int] = None) -> Image.Image:
+        """resize_image without mutating image: the same object if it already fits"""
+        if max_size is None:
+            max_size = IMAGE_CONFIG["max_image_size"]
+
+        size = thumbnail_size(image.size, max_size)
+        if size == image.size:
+            return image
+        return image.resize(size, Image.Resampling.LANCZOS, reducing_gap=2.0)
+
     @staticmethod
     def normalize_image(image: Image.Image) -> Image.Image:
         image = ImageProcessor.fix_image_orientation(image)
@@ -31,6 +119,15 @@ class ImageProcessor:
 
     @staticmethod
     def enhance_image_quality(image: Image.Image) -> Image.Image:
+        if should_tile(image):
+            # One row of context per side covers the 3x3 sharpening kernel
+            return map_stripes(
+                image, ImageProcessor._enhance_stripe, ENHANCE_BYTES_PER_PIXEL, overlap=1
+            )
+        return ImageProcessor._enhance_stripe(image)
+
+    @staticmethod
+    def _enhance_stripe(image: Image.Image) -> Image.Image:
         enhancer = ImageEnhance.Sharpness(image)
         image = enhancer.enhance(1.2)
 
@@ -41,15 +138,13 @@ class ImageProcessor:
 
     @staticmethod
     def create_mask(image: Image.Image, background_color: Tuple[int, int, int] = (255, 255, 255)) -> Image.Image:
-        img_array = np.array(image)
-
-        lower_bound = np.array([c - 20 for c in background_color])
-        upper_bound = np.array([c + 20 for c in background_color])
-
-        mask = cv2.inRange(img_array, lower_bound, upper_bound)
-        mask = cv2.bitwise_not(mask)
+        def key_stripe(stripe: Image.Image) -> Image.Image:
+            # L-mode fromarray wraps the mask buffer instead of copying it
+            return Image.fromarray(color_key_mask(rgb_view(stripe), background_color))
 
-        return Image.fromarray(mask)
+        if should_tile(image):
+            return map_stripes(image, key_stripe, MASK_BYTES_PER_PIXEL)
+        return key_stripe(image)
 
     @staticmethod
     def blend_images(
@@ -57,21 +152,45 @@ class ImageProcessor:
         overlay_image: Image.Image,
         mask: Optional[Image.Image] = None,
         position: Tuple[int, int] = (0, 0),
-        alpha: float = 0.8
+        alpha: float = 0.8,
+        box: Optional[Tuple[int, int, int, int]] = None
     ) -> Image.Image:
-        if base_image.size != overlay_image.size:
-            overlay_image = overlay_image.resize(base_image.size, Image.Resampling.LANCZOS)
-
-        if mask:
-            mask = mask.resize(base_image.size, Image.Resampling.LANCZOS)
-            result = Image.composite(overlay_image, base_image, mask)
-        else:
-            result = Image.blend(base_image, overlay_image, alpha)
-
-        return result
+        """
+        Blend overlay_image over base_image. The overlay is fitted to box
+        (default: the whole frame) and only that region is composited; with a
+        mask, overlay pixels are weighted by the mask instead of alpha.
+        """
+        if mask is not None:
+            alpha = 1.0
+        max_rows = None
+        if should_tile(base_image):
+            x0, _, x1, _ = clip_box(box, base_image.size)
+            max_rows = stripe_rows(max(1, x1 - x0), COMPOSITE_BYTES_PER_PIXEL)
+        return composite_roi(base_image, overlay_image, box, alpha, mask, max_rows)
 
     @staticmethod
-    def detect_person_bounds(image: Image.Image) -> Tuple[int, int, int, int]:
+    def detect_person_bounds(
+        image: Image.Image,
+        engine: Optional[str] = None,
+        image_hash: Optional[str] = None
+    ) -> Tuple[int, int, int, int]:
+        """
+        engine "projection" (default) finds the box from foreground projections on a
+        downscaled copy and caches it per image; "contour" takes the largest
+        full-resolution Canny contour. Images large enough to tile always use
+        the projection engine.
+        """
+        if engine is None:
+            engine = IMAGE_CONFIG.get("bounds_engine", "projection")
+        if should_tile(image):
+            # The contour engine needs several full-resolution buffers
+            engine = "projection"
+        if engine == "projection":
+            return bounds_cache.bounds(image, image_hash)
+        if engine != "contour":
+            raise ValueError(f"Unknown bounds engine: {engine}")
+
+        import cv2
         img_array = np.array(image)
         gray = cv2.cvtColor(img_array, cv2.COLOR_RGB2GRAY)
 
@@ -86,16 +205,109 @@ class ImageProcessor:
 
         return (0, 0, image.width, image.height)
 
+    @staticmethod
+    def create_fallback_image(
+        user_image: Image.Image,
+        clothing_image: Image.Image,
+        user_hash: Optional[str] = None
+    ) -> Image.Image:
+        """
+        Local preview blend of the garment over the detected person, used when
+        the model fails. user_hash, the content hash of user_image, keys the
+        bounds cache so a repeat render skips the reduction.
+        """
+        try:
+            bounds = ImageProcessor.detect_person_bounds(user_image, image_hash=user_hash)
+
+            # The garment is fitted to the person box and blended there only
+            result = ImageProcessor.blend_images(
+                user_image,
+                clothing_image,
+                alpha=0.3,
+                box=bounds
+            )
+
+            return result
+
+        except Exception as e:
+            print(f"Error creating fallback image: {str(e)}")
+            return user_image
+
+    @staticmethod
+    def compute_image_hash(image: Image.Image) -> str:
+        """Content hash of the decoded pixels, independent of file encoding"""
+        hasher = hashlib.sha256()
+        hasher.update(f"{image.mode}:{image.width}x{image.height}:".encode())
+        # Stripe by stripe: tobytes() of the whole image peaks at twice its size
+        rows = FRAME_CONFIG["stripe_rows"]
+        for top in range(0, image.height, rows):
+            hasher.update(image.crop((0, top, image.width, min(image.height, top + rows))).tobytes())
+        return hasher.hexdigest()
+
     @staticmethod
     def prepare_for_tryon(
         user_image: Image.Image,
-        clothing_image: Image.Image
+        clothing_image: Image.Image,
+        engine: Optional[str] = None
     ) -> Tuple[Image.Image, Image.Image]:
+        user_processed = ImageProcessor.prepare_user_image(user_image, engine)
+        clothing_processed = ImageProcessor.prepare_clothing_image(clothing_image, engine)
+
+        return user_processed, clothing_processed
+
+    @staticmethod
+    def prepare_user_image(user_image: Image.Image, engine: Optional[str] = None) -> Image.Image:
+        if ImageProcessor._use_fused_engine(engine):
+            return get_preprocessor().prepare_user_image(user_image)
+
         user_processed = ImageProcessor.normalize_image(user_image)
-        user_processed = ImageProcessor.resize_image(user_processed)
+        user_processed = ImageProcessor.fit_image(user_processed)
         user_processed = ImageProcessor.enhance_image_quality(user_processed)
+        return user_processed
+
+    @staticmethod
+    def fit_user_image(user_image: Image.Image, engine: Optional[str] = None) -> Image.Image:
+        """
+        prepare_user_image up to the enhance pass: oriented RGB fitted to
+        IMAGE_CONFIG["max_image_size"]. prepare_user_image of the result
+        matches prepare_user_image of user_image.
+        """
+        if ImageProcessor._use_fused_engine(engine):
+            return get_preprocessor().fit(user_image)
+
+        return ImageProcessor.fit_image(ImageProcessor.normalize_image(user_image))
+
+    @staticmethod
+    def prepare_clothing_image(clothing_image: Image.Image, engine: Optional[str] = None) -> Image.Image:
+        if ImageProcessor._use_fused_engine(engine):
+            return get_preprocessor().prepare_clothing_image(clothing_image)
 
         clothing_processed = ImageProcessor.normalize_image(clothing_image)
-        clothing_processed = ImageProcessor.resize_image(clothing_processed)
+        clothing_processed = ImageProcessor.fit_image(clothing_processed)
+        return clothing_processed
 
-        return user_processed, clothing_processed
\ No newline at end of file
+    @staticmethod
+    def prepare_preview_image(
+        image: Image.Image,
+        max_size: Optional[Tuple[int, int]] = None,
+        engine: Optional[str] = None
+    ) -> Image.Image:
+        """
+        Oriented RGB image scaled to the preview size, without the enhance
+        pass. image is never modified, and is returned itself if it is
+        already upright, RGB and within max_size.
+        """
+        if max_size is None:
+            max_size = PREVIEW_CONFIG["max_image_size"]
+        if ImageProcessor._use_fused_engine(engine):
+            return get_preprocessor().fit(image, max_size)
+
+        return ImageProcessor.fit_image(ImageProcessor.normalize_image(image), max_size)
+
+    @staticmethod
+    def _use_fused_engine(engine: Optional[str]) -> bool:
+        if engine is None:
+            engine = IMAGE_CONFIG.get("preprocess_engine", "pil")
+        if engine not in ("pil", "numpy"):
+            raise ValueError(f"Unknown preprocess engine: {engine}")
+        return engine == "numpy"
\ No newline at end of file
@@ -0,0 +1,235 @@
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+from typing import Optional
+from config import QUEUE_CONFIG
+
+QUEUED = "queued"
+RUNNING = "running"
+DONE = "done"
+FAILED = "failed"
+
+FINISHED_STATUSES = (DONE, FAILED)
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS jobs (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    dedup_key TEXT NOT NULL,
+    user_path TEXT NOT NULL,
+    clothing_path TEXT NOT NULL,
+    options TEXT NOT NULL,
+    priority INTEGER NOT NULL DEFAULT 0,
+    status TEXT NOT NULL,
+    worker TEXT,
+    attempts INTEGER NOT NULL DEFAULT 0,
+    result_path TEXT,
+    error TEXT,
+    fallback INTEGER NOT NULL DEFAULT 0,
+    timings TEXT,
+    enqueued_at REAL NOT NULL,
+    started_at REAL,
+    finished_at REAL
+);
+CREATE INDEX IF NOT EXISTS jobs_claim ON jobs (status, priority DESC, id);
+CREATE INDEX IF NOT EXISTS jobs_dedup ON jobs (dedup_key, status);
+"""
+
+
+def file_digest(path: str) -> str:
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1024 * 1024), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def make_job_key(user_path: str, clothing_path: str, options: Optional[dict] = None) -> str:
+    """Identity of a job: the content of both images plus its options, not their paths"""
+    digest = hashlib.sha256()
+    digest.update(file_digest(user_path).encode())
+    digest.update(file_digest(clothing_path).encode())
+    digest.update(json.dumps(options or {}, sort_keys=True).encode())
+    return digest.hexdigest()
+
+
+def spool_upload(data: bytes, suffix: str = "", directory: Optional[str] = None) -> str:
+    """Write uploaded bytes to a content-addressed file so a worker process can read them"""
+    directory = directory or QUEUE_CONFIG["upload_dir"]
+    os.makedirs(directory, exist_ok=True)
+    path = os.path.join(directory, hashlib.sha256(data).hexdigest() + suffix)
+    if not os.path.exists(path):
+        tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with open(tmp_path, "wb") as f:
+            f.write(data)
+        os.replace(tmp_path, path)
+    return path
+
+
+class JobQueue:
+    """
+    SQLite-backed try-on job queue shared between the Streamlit app and
+    worker processes. Jobs are claimed highest priority first, then oldest
+    first. Enqueueing a job whose images and options match a queued, running
+    or finished job returns the existing job instead of adding a new one.
+    """
+
+    def __init__(self, path: Optional[str] = None):
+        self.path = path or QUEUE_CONFIG["path"]
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._local = threading.local()
+        with self._connect() as conn:
+            conn.executescript(_SCHEMA)
+
+    def _connect(self) -> sqlite3.Connection:
+        # sqlite3 connections must not be shared across threads
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+            conn.row_factory = sqlite3.Row
+            conn.execute("PRAGMA journal_mode=WAL")
+            self._local.conn = conn
+        return conn
+
+    def enqueue(
+        self,
+        user_path: str,
+        clothing_path: str,
+        options: Optional[dict] = None,
+        priority: int = 0
+    ) -> int:
+        """Add a job, or return the id of an identical job that has not failed"""
+        options = options or {}
+        dedup_key = make_job_key(user_path, clothing_path, options)
+        conn = self._connect()
+
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            row = conn.execute(
+                "SELECT id, status, priority, result_path FROM jobs WHERE dedup_key = ? AND status != ? "
+                "ORDER BY id DESC LIMIT 1",
+                (dedup_key, FAILED)
+            ).fetchone()
+            # A finished duplicate only counts while its result file is still on disk
+            if row is not None and row["status"] == DONE and not os.path.exists(row["result_path"]):
+                row = None
+            if row is not None:
+                # A more urgent duplicate bumps the queued job rather than waiting behind it
+                if row["status"] == QUEUED and priority > row["priority"]:
+                    conn.execute("UPDATE jobs SET priority = ? WHERE id = ?", (priority, row["id"]))
+                conn.execute("COMMIT")
+                return row["id"]
+
+            cursor = conn.execute(
+                "INSERT INTO jobs (dedup_key, user_path, clothing_path, options, priority, status, enqueued_at) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (dedup_key, user_path, clothing_path, json.dumps(options), priority, QUEUED, time.time())
+            )
+            conn.execute("COMMIT")
+            return cursor.lastrowid
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+
+    def claim(self, worker: str = "") -> Optional[dict]:
+        """Atomically take the next queued job and mark it running"""
+        conn = self._connect()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            row = conn.execute(
+                "SELECT id FROM jobs WHERE status = ? ORDER BY priority DESC, id LIMIT 1",
+                (QUEUED,)
+            ).fetchone()
+            if row is None:
+                conn.execute("COMMIT")
+                return None
+
+            conn.execute(
+                "UPDATE jobs SET status = ?, worker = ?, attempts = attempts + 1, started_at = ? "
+                "WHERE id = ?",
+                (RUNNING, worker, time.time(), row["id"])
+            )
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+        return self.get(row["id"])
+
+    def complete(
+        self,
+        job_id: int,
+        result_path: str,
+        timings: Optional[dict] = None,
+        fallback: bool = False
+    ) -> None:
+        self._finish(job_id, DONE, result_path=result_path, timings=timings, fallback=int(fallback))
+
+    def fail(self, job_id: int, error: str, timings: Optional[dict] = None) -> None:
+        self._finish(job_id, FAILED, error=error, timings=timings)
+
+    def _finish(self, job_id: int, status: str, timings: Optional[dict] = None, **fields) -> None:
+        fields.update({
+            "status": status,
+            "timings": json.dumps(timings or {}),
+            "finished_at": time.time(),
+        })
+        assignments = ", ".join(f"{name} = ?" for name in fields)
+        self._connect().execute(
+            f"UPDATE jobs SET {assignments} WHERE id = ?",
+            (*fields.values(), job_id)
+        )
+
+    def requeue_stale(self, stale_after_seconds: Optional[float] = None) -> int:
+        """Return jobs left running by a crashed worker to the queue"""
+        if stale_after_seconds is None:
+            stale_after_seconds = QUEUE_CONFIG["stale_after_seconds"]
+        cursor = self._connect().execute(
+            "UPDATE jobs SET status = ?, worker = NULL WHERE status = ? AND started_at < ?",
+            (QUEUED, RUNNING, time.time() - stale_after_seconds)
+        )
+        return cursor.rowcount
+
+    def get(self, job_id: int) -> Optional[dict]:
+        row = self._connect().execute("SELECT * FROM jobs WHERE id = ?", (job_id,)).fetchone()
+        if row is None:
+            return None
+        job = dict(row)
+        job["options"] = json.loads(job["options"])
+        job["timings"] = json.loads(job["timings"]) if job["timings"] else {}
+        job["fallback"] = bool(job["fallback"])
+        return job
+
+    def wait(
+        self,
+        job_id: int,
+        timeout: Optional[float] = None,
+        poll_interval: Optional[float] = None
+    ) -> Optional[dict]:
+        """Poll until the job is done or failed; returns None if timeout expires first"""
+        if poll_interval is None:
+            poll_interval = QUEUE_CONFIG["poll_interval_seconds"]
+        deadline = None if timeout is None else time.monotonic() + timeout
+
+        while True:
+            job = self.get(job_id)
+            if job is None or job["status"] in FINISHED_STATUSES:
+                return job
+            if deadline is not None and time.monotonic() >= deadline:
+                return None
+            time.sleep(poll_interval)
+
+    def stats(self) -> dict:
+        rows = self._connect().execute("SELECT status, COUNT(*) FROM jobs GROUP BY status").fetchall()
+        counts = {QUEUED: 0, RUNNING: 0, DONE: 0, FAILED: 0}
+        counts.update({status: count for status, count in rows})
+        return counts
+
+    def close(self) -> None:
+        conn = getattr(self._local, "conn", None)
+        if conn is not None:
+            conn.close()
+            self._local.conn = None
@@ -0,0 +1,193 @@
+import json
+import os
+import threading
+import time
+from bisect import bisect_left
+from contextlib import contextmanager, nullcontext
+from typing import Dict, Optional, Sequence, Tuple
+from config import METRICS_CONFIG
+
+LabelKey = Tuple[Tuple[str, str], ...]
+
+_NULL_CONTEXT = nullcontext()
+
+
+def _label_key(labels: Optional[Dict[str, str]]) -> LabelKey:
+    if not labels:
+        return ()
+    return tuple(sorted((name, str(value)) for name, value in labels.items()))
+
+
+def _format_labels(label_key: LabelKey, extra: Optional[Tuple[str, str]] = None) -> str:
+    pairs = list(label_key)
+    if extra is not None:
+        pairs.append(extra)
+    if not pairs:
+        return ""
+    return "{" + ",".join(f'{name}="{value}"' for name, value in pairs) + "}"
+
+
+class Histogram:
+    def __init__(self, buckets: Sequence[float]):
+        self.buckets = tuple(sorted(buckets))
+        self.counts = [0] * (len(self.buckets) + 1)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value: float) -> None:
+        self.counts[bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+
+    def cumulative_counts(self) -> list:
+        total = 0
+        cumulative = []
+        for count in self.counts:
+            total += count
+            cumulative.append(total)
+        return cumulative
+
+
+class MetricsRegistry:
+    """
+    In-process counters and histograms with Prometheus-text and JSON export.
+    When disabled every recording call returns immediately.
+    """
+
+    def __init__(self, enabled: bool = True, latency_buckets=None, bytes_buckets=None):
+        self.enabled = enabled
+        self.latency_buckets = latency_buckets or METRICS_CONFIG["latency_buckets"]
+        self.bytes_buckets = bytes_buckets or METRICS_CONFIG["bytes_buckets"]
+        self._counters = {}
+        self._histograms = {}
+        self._help = {}
+        self._lock = threading.Lock()
+
+    def describe(self, name: str, help_text: str) -> None:
+        self._help[name] = help_text
+
+    def inc(self, name: str, value: float = 1, labels: Optional[Dict[str, str]] = None) -> None:
+        if not self.enabled:
+            return
+        key = (name, _label_key(labels))
+        with self._lock:
+            self._counters[key] = self._counters.get(key, 0) + value
+
+    def observe(
+        self,
+        name: str,
+        value: float,
+        labels: Optional[Dict[str, str]] = None,
+        buckets: Optional[Sequence[float]] = None
+    ) -> None:
+        if not self.enabled:
+            return
+        key = (name, _label_key(labels))
+        with self._lock:
+            histogram = self._histograms.get(key)
+            if histogram is None:
+                histogram = Histogram(buckets or self.latency_buckets)
+                self._histograms[key] = histogram
+            histogram.observe(value)
+
+    def observe_bytes(self, name: str, value: int, labels: Optional[Dict[str, str]] = None) -> None:
+        self.observe(name, value, labels, self.bytes_buckets)
+
+    def timer(self, name: str, labels: Optional[Dict[str, str]] = None):
+        """Context manager recording the block's wall time in seconds"""
+        if not self.enabled:
+            return _NULL_CONTEXT
+        return self._timer(name, labels)
+
+    @contextmanager
+    def _timer(self, name: str, labels: Optional[Dict[str, str]]):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(name, time.perf_counter() - start, labels)
+
+    def reset(self) -> None:
+        with self._lock:
+            self._counters.clear()
+            self._histograms.clear()
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            counters = [
+                {"name": name, "labels": dict(label_key), "value": value}
+                for (name, label_key), value in sorted(self._counters.items())
+            ]
+            histograms = [
+                {
+                    "name": name,
+                    "labels": dict(label_key),
+                    "buckets": list(histogram.buckets),
+                    "counts": list(histogram.counts),
+                    "sum": histogram.sum,
+                    "count": histogram.count,
+                }
+                for (name, label_key), histogram in sorted(self._histograms.items())
+            ]
+        return {"counters": counters, "histograms": histograms}
+
+    def export_json(self, indent: Optional[int] = None) -> str:
+        return json.dumps(self.snapshot(), indent=indent)
+
+    def export_prometheus(self) -> str:
+        lines = []
+        seen = set()
+
+        def header(name: str, kind: str) -> None:
+            if name in seen:
+                return
+            seen.add(name)
+            if name in self._help:
+                lines.append(f"# HELP {name} {self._help[name]}")
+            lines.append(f"# TYPE {name} {kind}")
+
+        with self._lock:
+            for (name, label_key), value in sorted(self._counters.items()):
+                header(name, "counter")
+                lines.append(f"{name}{_format_labels(label_key)} {value}")
+
+            for (name, label_key), histogram in sorted(self._histograms.items()):
+                header(name, "histogram")
+                cumulative = histogram.cumulative_counts()
+                for bound, count in zip(histogram.buckets, cumulative):
+                    lines.append(f"{name}_bucket{_format_labels(label_key, ('le', repr(float(bound))))} {count}")
+                lines.append(f"{name}_bucket{_format_labels(label_key, ('le', '+Inf'))} {histogram.count}")
+                lines.append(f"{name}_sum{_format_labels(label_key)} {histogram.sum}")
+                lines.append(f"{name}_count{_format_labels(label_key)} {histogram.count}")
+
+        return "\n".join(lines) + "\n"
+
+    def write(self, path: str, format: str = "prometheus") -> None:
+        """Dump the registry to a file, e.g. for a node-exporter textfile collector"""
+        if format == "json":
+            content = self.export_json(indent=2)
+        elif format == "prometheus":
+            content = self.export_prometheus()
+        else:
+            raise ValueError(f"Unknown metrics format: {format}")
+
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, "w") as f:
+            f.write(content)
+        os.replace(tmp_path, path)
+
+
+registry = MetricsRegistry(enabled=METRICS_CONFIG["enabled"])
+
+registry.describe("tryon_stage_seconds", "Wall time of each try-on pipeline stage")
+registry.describe("tryon_requests_total", "Try-on requests handled by the pipeline")
+registry.describe("tryon_fallbacks_total", "Requests served from the local fallback render")
+registry.describe("tryon_rejections_total", "Requests turned away by admission control or the circuit breaker")
+registry.describe("tryon_cache_lookups_total", "Result cache lookups by outcome")
+registry.describe("compatibility_cache_lookups_total", "Compatibility analysis cache lookups by outcome")
+registry.describe("gemini_retries_total", "Gemini request attempts retried after a transient error")
+registry.describe("gemini_errors_total", "Gemini requests that failed, by error type")
+registry.describe("gemini_hedges_total", "Duplicate Gemini requests sent by the hedging policy")
+registry.describe("gemini_hedge_wins_total", "Hedged requests whose duplicate answered first")
+registry.describe("gemini_upload_bytes", "Encoded image bytes sent to Gemini per image")
+registry.describe("gemini_response_bytes", "Image payload bytes received from Gemini")
@@ -1,105 +1,741 @@
 from PIL import Image
-import io
-import base64
-from typing import Union
-from .gemini_client import GeminiClient
+import asyncio
+import threading
+import time
+from contextlib import asynccontextmanager, contextmanager
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from typing import Callable, Iterator, List, Optional, Tuple, Union
+from .admission import (
+    AdmissionController, AdmissionRejected, CircuitBreaker,
+    create_admission_controller, create_circuit_breaker
+)
+from .cache import ResultCache, create_cache, make_cache_key
+from .catalog import GarmentCatalog
+from .compatibility import (
+    COMPATIBILITY_SCHEMA, CompatibilityCache, compatibility_error, parse_compatibility
+)
+from .cpu_pool import CPUPool, get_cpu_pool
+from .gemini_client import (
+    AsyncGeminiClient,
+    GeminiClient,
+    GeminiQuotaError,
+    GeminiRetryableError,
+    get_shared_model,
+)
+from .image_codec import EncodedImage, ImageEncoder
 from .image_utils import ImageProcessor
-from config import PROMPTS
+from .metrics import registry as metrics
+from .preview import PreviewEntry, PreviewStore
+from .progress import ProgressCallback, ProgressRelay, ProgressTracker, track_stage
+from .rate_limit import SingleFlight
+from config import ADMISSION_CONFIG, ANALYSIS_CONFIG, BATCH_CONFIG, PREVIEW_CONFIG, PROMPTS
+
+_DEFAULT = object()
 
 class VirtualTryOnPipeline:
-    def __init__(self):
-        self.gemini_client = GeminiClient()
+    def __init__(
+        self,
+        cache: Optional[ResultCache] = _DEFAULT,
+        gemini_client: Optional[GeminiClient] = None,
+        cpu_pool: Optional[CPUPool] = _DEFAULT,
+        catalog: Optional[GarmentCatalog] = None,
+        admission: Optional[AdmissionController] = _DEFAULT,
+        breaker: Optional[CircuitBreaker] = _DEFAULT,
+        analysis_client: Optional[GeminiClient] = None
+    ):
+        self.gemini_client = gemini_client or GeminiClient()
+        self.async_gemini_client = None
         self.image_processor = ImageProcessor()
+        # CPU-bound stages run here: the process pool when enabled, else the caller's thread
+        self.cpu_pool = get_cpu_pool() if cpu_pool is _DEFAULT else cpu_pool
+        # Pass cache=None to disable result caching entirely
+        self.cache = create_cache() if cache is _DEFAULT else cache
+        self._catalog = catalog
+        # Pass admission=None / breaker=None to let every request through to the model
+        self.admission = create_admission_controller() if admission is _DEFAULT else admission
+        self.breaker = create_circuit_breaker() if breaker is _DEFAULT else breaker
+        self.overload_policy = ADMISSION_CONFIG.get("overload_policy", "fallback")
+        self.request_deadline = ADMISSION_CONFIG.get("request_deadline_seconds")
+        self._analysis_client = analysis_client
+        self.analysis_cache = CompatibilityCache()
+        self._analysis_flight = SingleFlight()
+        self._upgrade_flight = SingleFlight()
+        self._analysis_executor = None
+        self._analysis_executor_lock = threading.Lock()
+        self.previews = PreviewStore()
+        self.preview_encoder = ImageEncoder(
+            quality=PREVIEW_CONFIG["wire_quality"],
+            max_bytes=PREVIEW_CONFIG["wire_max_bytes"]
+        )
+
+    @property
+    def catalog(self) -> GarmentCatalog:
+        if self._catalog is None:
+            self._catalog = GarmentCatalog()
+        return self._catalog
+
+    @property
+    def analysis_client(self) -> GeminiClient:
+        # A text model answers the compatibility questions; uploads share the try-on encoder
+        if self._analysis_client is None:
+            self._analysis_client = GeminiClient(
+                model=get_shared_model(ANALYSIS_CONFIG["model_name"]),
+                encoder=self.gemini_client.encoder,
+                hedging=None
+            )
+        return self._analysis_client
 
     def generate_tryon(
         self,
         user_image: Union[Image.Image, str],
-        clothing_image: Union[Image.Image, str]
+        clothing_image: Optional[Union[Image.Image, str]] = None,
+        progress_callback: Optional[ProgressCallback] = None,
+        garment_id: Optional[str] = None
     ) -> Image.Image:
-        if isinstance(user_image, str):
-            user_image = Image.open(user_image)
-        if isinstance(clothing_image, str):
-            clothing_image = Image.open(clothing_image)
+        """
+        progress_callback, if given, receives an event dict as each stage
+        (decode, preprocess, cache, encode, model, decode_result, fallback)
+        starts and finishes; see ProgressTracker for the event fields.
 
-        user_processed, clothing_processed = self.image_processor.prepare_for_tryon(
-            user_image, clothing_image
+        Pass garment_id instead of clothing_image to use a garment ingested
+        into the catalog: its preprocessed pixels, hash and encoded upload
+        are read from the store, so only the user image is processed.
+
+        When the model is over capacity or its circuit breaker is open, the
+        fallback render is returned, or AdmissionRejected (with a
+        retry_after hint) is raised if ADMISSION_CONFIG["overload_policy"]
+        is "reject".
+        """
+        tracker = ProgressTracker(progress_callback)
+        user_processed, clothing_processed, clothing_hash, clothing_upload = self._prepare_inputs(
+            user_image, clothing_image, garment_id, tracker
         )
 
+        result_image, _ = self._generate_from_prepared(
+            user_processed,
+            clothing_processed,
+            clothing_hash=clothing_hash,
+            clothing_upload=clothing_upload,
+            tracker=tracker
+        )
+        return result_image
+
+    def generate_tryon_with_analysis(
+        self,
+        user_image: Union[Image.Image, str],
+        clothing_image: Optional[Union[Image.Image, str]] = None,
+        progress_callback: Optional[ProgressCallback] = None,
+        garment_id: Optional[str] = None
+    ) -> dict:
+        """
+        generate_tryon and analyze_compatibility for the same inputs. The
+        images are preprocessed, hashed and encoded once, and both model
+        calls run concurrently, so the analysis adds no latency beyond the
+        slower of the two. Returns {"image", "error", "fallback", "analysis"}.
+        """
+        tracker = ProgressTracker(progress_callback)
+        user_processed, clothing_processed, clothing_hash, clothing_upload = self._prepare_inputs(
+            user_image, clothing_image, garment_id, tracker
+        )
+
+        with tracker.stage("encode"):
+            user_hash = self.image_processor.compute_image_hash(user_processed)
+            if clothing_hash is None:
+                clothing_hash = self.image_processor.compute_image_hash(clothing_processed)
+            user_upload = self.gemini_client.encoder.encode(user_processed, user_hash)
+            if clothing_upload is None:
+                clothing_upload = self.gemini_client.encoder.encode(clothing_processed, clothing_hash)
+
+        analysis = None
+
+        # The analysis starts only once the try-on is admitted, so a shed request spends no quota on it
+        def start_analysis(deadline_at: Optional[float]) -> None:
+            nonlocal analysis
+            analysis = self._get_analysis_executor().submit(
+                self._analyze_prepared, user_upload, clothing_upload, user_hash, clothing_hash, deadline_at
+            )
+
         try:
-            prompt = self._build_tryon_prompt()
+            result_image, error = self._generate_from_prepared(
+                user_processed,
+                clothing_processed,
+                user_hash=user_hash,
+                clothing_hash=clothing_hash,
+                tracker=tracker,
+                user_upload=user_upload,
+                clothing_upload=clothing_upload,
+                on_admitted=start_analysis
+            )
+        except BaseException:
+            if analysis is not None:
+                analysis.cancel()
+            raise
+
+        if analysis is not None:
+            analysis_result = analysis.result()
+        elif error is None:
+            # Served from the result cache without reaching admission
+            analysis_result = self._analyze_prepared(
+                user_upload, clothing_upload, user_hash, clothing_hash, self._request_deadline_at()
+            )
+        else:
+            # Shed before the model: only a cached analysis is returned
+            analysis_result = self._analyze_prepared(
+                user_upload, clothing_upload, user_hash, clothing_hash, shed_error=error
+            )
+        return {
+            "image": result_image,
+            "error": error,
+            "fallback": error is not None,
+            "analysis": analysis_result
+        }
+
+    def generate_tryon_prepared(
+        self,
+        user_processed: Image.Image,
+        clothing_processed: Image.Image,
+        user_hash: Optional[str] = None,
+        clothing_hash: Optional[str] = None,
+        progress_callback: Optional[ProgressCallback] = None
+    ) -> Image.Image:
+        """
+        generate_tryon for inputs already run through prepare_user_image and
+        prepare_clothing_image; pass their pixel hashes to skip rehashing.
+        """
+        result_image, _ = self._generate_from_prepared(
+            user_processed,
+            clothing_processed,
+            user_hash=user_hash,
+            clothing_hash=clothing_hash,
+            tracker=ProgressTracker(progress_callback)
+        )
+        return result_image
+
+    def generate_preview(
+        self,
+        user_image: Union[Image.Image, str],
+        clothing_image: Optional[Union[Image.Image, str]] = None,
+        progress_callback: Optional[ProgressCallback] = None,
+        garment_id: Optional[str] = None
+    ) -> dict:
+        """
+        Fast, low-resolution try-on for browsing: inputs are scaled to
+        PREVIEW_CONFIG["max_image_size"] without the enhance pass and encoded
+        more lightly. Returns {"preview_id", "image", "error", "fallback"};
+        pass preview_id to upgrade() to render the chosen one at full size.
+        """
+        if (clothing_image is None) == (garment_id is None):
+            raise ValueError("Pass exactly one of clothing_image or garment_id")
+
+        tracker = ProgressTracker(progress_callback)
+        garment = self.catalog.get(garment_id) if garment_id is not None else None
 
-            result_image = self.gemini_client.process_virtual_tryon(
+        if isinstance(user_image, str) or isinstance(clothing_image, str):
+            with tracker.stage("decode"):
+                user_image = self._open_image(user_image)
+                if clothing_image is not None:
+                    clothing_image = self._open_image(clothing_image)
+
+        with tracker.stage("preprocess"):
+            # Only full-resolution inputs are kept for upgrade(), never the decoded sources
+            user_fitted = self._cpu.fit_user_image(user_image)
+            clothing_processed = None
+            if garment is None:
+                clothing_processed = self._cpu.prepare_clothing_image(clothing_image)
+            user_preview = self.image_processor.prepare_preview_image(user_fitted)
+            clothing_preview = self.image_processor.prepare_preview_image(
+                garment.image if garment is not None else clothing_processed
+            )
+            user_hash = self.image_processor.compute_image_hash(user_preview)
+            clothing_hash = self.image_processor.compute_image_hash(clothing_preview)
+            user_upload = self.preview_encoder.encode(user_preview, user_hash)
+            clothing_upload = self.preview_encoder.encode(clothing_preview, clothing_hash)
+
+        preview_id = make_cache_key(user_hash, clothing_hash, self._build_tryon_prompt())
+        self.previews.add(preview_id, PreviewEntry(user_fitted, clothing_processed, garment_id))
+
+        result_image, error = self._generate_from_prepared(
+            user_preview,
+            clothing_preview,
+            user_hash=user_hash,
+            clothing_hash=clothing_hash,
+            tracker=tracker,
+            user_upload=user_upload,
+            clothing_upload=clothing_upload
+        )
+        return {
+            "preview_id": preview_id,
+            "image": result_image,
+            "error": error,
+            "fallback": error is not None
+        }
+
+    def upgrade(
+        self,
+        preview_id: str,
+        progress_callback: Optional[ProgressCallback] = None
+    ) -> Image.Image:
+        """
+        Full-resolution try-on for a preview from generate_preview(). The
+        fitted inputs kept with the preview are reused, so nothing is decoded
+        or resized again, and a catalog garment's stored inputs are used as-is.
+        Concurrent upgrades of one preview share a single render.
+        Raises KeyError once the preview has been evicted.
+        """
+        entry = self.previews.get(preview_id)
+        tracker = ProgressTracker(progress_callback)
+        relay = ProgressRelay(tracker)
+
+        # Only the leader reads and updates the entry
+        result_image, shared = self._upgrade_flight.do(
+            preview_id,
+            lambda: self._upgrade_entry(entry, relay),
+            state=relay,
+            join=lambda leader: leader.follow(tracker)
+        )
+        return result_image.copy() if shared else result_image
+
+    def _upgrade_entry(self, entry: PreviewEntry, tracker: ProgressRelay) -> Image.Image:
+        clothing_upload = None
+        if entry.garment_id is not None:
+            garment = self.catalog.get(entry.garment_id)
+            entry.clothing_processed, entry.clothing_hash = garment.image, garment.image_hash
+            clothing_upload = garment.encoded
+
+        if entry.user_processed is None or entry.clothing_hash is None:
+            with tracker.stage("preprocess"):
+                if entry.user_processed is None:
+                    entry.user_processed = self._cpu.prepare_user_image(entry.user_image)
+                    entry.user_hash = self.image_processor.compute_image_hash(entry.user_processed)
+                    entry.user_image = None
+                if entry.clothing_hash is None:
+                    entry.clothing_hash = self.image_processor.compute_image_hash(entry.clothing_processed)
+
+        result_image, _ = self._generate_from_prepared(
+            entry.user_processed,
+            entry.clothing_processed,
+            user_hash=entry.user_hash,
+            clothing_hash=entry.clothing_hash,
+            tracker=tracker,
+            clothing_upload=clothing_upload
+        )
+        return result_image
+
+    def generate_tryon_batch(
+        self,
+        user_images: Union[Image.Image, str, List[Union[Image.Image, str]]],
+        clothing_images: Union[Image.Image, str, List[Union[Image.Image, str]]],
+        max_workers: Optional[int] = None
+    ) -> Iterator[dict]:
+        """
+        Try on many garments against one person (or one garment on many people).
+
+        A single image on either side is preprocessed once and shared by every
+        item; two lists of equal length are paired up. Results are yielded as
+        they complete, each carrying its own error instead of aborting the batch.
+        """
+        user_list = user_images if isinstance(user_images, (list, tuple)) else [user_images]
+        clothing_list = clothing_images if isinstance(clothing_images, (list, tuple)) else [clothing_images]
+
+        if len(user_list) == 1:
+            pairs = [(0, i) for i in range(len(clothing_list))]
+        elif len(clothing_list) == 1:
+            pairs = [(i, 0) for i in range(len(user_list))]
+        elif len(user_list) == len(clothing_list):
+            pairs = [(i, i) for i in range(len(user_list))]
+        else:
+            raise ValueError("Batch needs a single image on one side or two lists of equal length")
+
+        if max_workers is None:
+            max_workers = BATCH_CONFIG["max_workers"]
+
+        # Shared images are preprocessed once up front; per-item images are
+        # preprocessed inside the worker so CPU work overlaps model calls
+        shared_user = shared_user_hash = None
+        shared_clothing = shared_clothing_hash = None
+        if len(user_list) == 1:
+            shared_user = self._cpu.prepare_user_image(self._open_image(user_list[0]))
+            shared_user_hash = self.image_processor.compute_image_hash(shared_user)
+        if len(clothing_list) == 1:
+            shared_clothing = self._cpu.prepare_clothing_image(
+                self._open_image(clothing_list[0])
+            )
+            shared_clothing_hash = self.image_processor.compute_image_hash(shared_clothing)
+
+        def run_item(user_index: int, clothing_index: int) -> Tuple[Image.Image, Optional[str]]:
+            user_processed = shared_user
+            if user_processed is None:
+                user_processed = self._cpu.prepare_user_image(
+                    self._open_image(user_list[user_index])
+                )
+
+            clothing_processed = shared_clothing
+            if clothing_processed is None:
+                clothing_processed = self._cpu.prepare_clothing_image(
+                    self._open_image(clothing_list[clothing_index])
+                )
+
+            return self._generate_from_prepared(
                 user_processed,
                 clothing_processed,
-                prompt
+                user_hash=shared_user_hash,
+                clothing_hash=shared_clothing_hash
             )
 
-            return result_image
+        executor = ThreadPoolExecutor(max_workers=max(1, max_workers))
+        try:
+            futures = {
+                executor.submit(run_item, user_index, clothing_index): (index, user_index, clothing_index)
+                for index, (user_index, clothing_index) in enumerate(pairs)
+            }
+
+            for future in as_completed(futures):
+                index, user_index, clothing_index = futures[future]
+                item = {
+                    "index": index,
+                    "user_index": user_index,
+                    "clothing_index": clothing_index,
+                    "image": None,
+                    "error": None,
+                    "fallback": False
+                }
+
+                try:
+                    item["image"], item["error"] = future.result()
+                    item["fallback"] = item["error"] is not None
+                except Exception as e:
+                    item["error"] = str(e)
+
+                yield item
+        finally:
+            executor.shutdown(wait=False, cancel_futures=True)
+
+    @property
+    def _cpu(self) -> Union[CPUPool, ImageProcessor]:
+        return self.cpu_pool or self.image_processor
+
+    def _prepare_inputs(
+        self,
+        user_image: Union[Image.Image, str],
+        clothing_image: Optional[Union[Image.Image, str]],
+        garment_id: Optional[str],
+        tracker: ProgressTracker
+    ) -> Tuple[Image.Image, Image.Image, Optional[str], Optional[EncodedImage]]:
+        """Decode and preprocess; returns (user, clothing, clothing_hash, clothing_upload)"""
+        if (clothing_image is None) == (garment_id is None):
+            raise ValueError("Pass exactly one of clothing_image or garment_id")
+
+        if garment_id is not None:
+            garment = self.catalog.get(garment_id)
+            if isinstance(user_image, str):
+                with tracker.stage("decode"):
+                    user_image = self._open_image(user_image)
+            with tracker.stage("preprocess"):
+                user_processed = self._cpu.prepare_user_image(user_image)
+            return user_processed, garment.image, garment.image_hash, garment.encoded
+
+        if isinstance(user_image, str) or isinstance(clothing_image, str):
+            with tracker.stage("decode"):
+                user_image = self._open_image(user_image)
+                clothing_image = self._open_image(clothing_image)
+
+        with tracker.stage("preprocess"):
+            user_processed, clothing_processed = self._cpu.prepare_for_tryon(
+                user_image, clothing_image
+            )
+        return user_processed, clothing_processed, None, None
+
+    def _open_image(self, image: Union[Image.Image, str]) -> Image.Image:
+        if isinstance(image, str):
+            image = self.image_processor.load_image(image)
+        return image
+
+    def _generate_from_prepared(
+        self,
+        user_processed: Image.Image,
+        clothing_processed: Image.Image,
+        user_hash: Optional[str] = None,
+        clothing_hash: Optional[str] = None,
+        tracker: Optional[ProgressTracker] = None,
+        clothing_upload: Optional[EncodedImage] = None,
+        user_upload: Optional[EncodedImage] = None,
+        on_admitted: Optional[Callable[[Optional[float]], None]] = None
+    ) -> Tuple[Image.Image, Optional[str]]:
+        """
+        Run the model on prepared images; returns (image, error) where error
+        is set on fallback. user_upload and clothing_upload, when given, are
+        sent in place of the prepared images, which are then only used for
+        the fallback render. on_admitted, if given, is called with the
+        request deadline once the request holds a model slot.
+        """
+        if tracker is None:
+            tracker = ProgressTracker()
+        metrics.inc("tryon_requests_total")
 
+        prompt = self._build_tryon_prompt()
+
+        cache_key, cached = self._lookup_cache(
+            user_processed, clothing_processed, prompt, user_hash, clothing_hash, tracker
+        )
+        if cached is not None:
+            return cached, None
+
+        deadline_at = self._request_deadline_at()
+        try:
+            with self._admit(deadline_at):
+                if on_admitted is not None:
+                    on_admitted(deadline_at)
+                try:
+                    result_image = self.gemini_client.process_virtual_tryon(
+                        user_processed if user_upload is None else user_upload,
+                        clothing_processed if clothing_upload is None else clothing_upload,
+                        prompt,
+                        progress=tracker,
+                        deadline_at=deadline_at
+                    )
+                except Exception as e:
+                    self._record_outcome(e)
+                    raise
+                self._record_outcome(None)
         except Exception as e:
-            print(f"Error in virtual try-on pipeline: {str(e)}")
-            return self._create_fallback_image(user_processed, clothing_processed)
+            return self._handle_model_error(e, user_processed, clothing_processed, tracker, user_hash)
 
-    def _build_tryon_prompt(self) -> str:
-        return PROMPTS['virtual_tryon']
+        if cache_key is not None and isinstance(result_image, Image.Image):
+            self.cache.set(cache_key, result_image)
 
-    def _create_fallback_image(
+        return result_image, None
+
+    async def generate_tryon_async(
         self,
-        user_image: Image.Image,
-        clothing_image: Image.Image
+        user_image: Union[Image.Image, str],
+        clothing_image: Union[Image.Image, str]
     ) -> Image.Image:
+        """asyncio counterpart of generate_tryon backed by AsyncGeminiClient"""
+        tracker = ProgressTracker()
+        user_image = self._open_image(user_image)
+        clothing_image = self._open_image(clothing_image)
+
+        with tracker.stage("preprocess"):
+            user_processed, clothing_processed = await asyncio.to_thread(
+                self._cpu.prepare_for_tryon, user_image, clothing_image
+            )
+
+        metrics.inc("tryon_requests_total")
+        prompt = self._build_tryon_prompt()
+
+        cache_key, cached = self._lookup_cache(
+            user_processed, clothing_processed, prompt, tracker=tracker
+        )
+        if cached is not None:
+            return cached
+
+        deadline_at = self._request_deadline_at()
         try:
-            bounds = self.image_processor.detect_person_bounds(user_image)
+            async with self._admit_async(deadline_at):
+                try:
+                    result_image = await self._get_async_client().process_virtual_tryon(
+                        user_processed,
+                        clothing_processed,
+                        prompt,
+                        progress=tracker,
+                        deadline_at=deadline_at
+                    )
+                except Exception as e:
+                    self._record_outcome(e)
+                    raise
+                self._record_outcome(None)
+        except Exception as e:
+            result_image, _ = self._handle_model_error(e, user_processed, clothing_processed, tracker)
+            return result_image
+
+        if cache_key is not None and isinstance(result_image, Image.Image):
+            self.cache.set(cache_key, result_image)
+
+        return result_image
 
-            clothing_resized = clothing_image.resize(
-                (bounds[2] - bounds[0], bounds[3] - bounds[1]),
-                Image.Resampling.LANCZOS
+    def _get_async_client(self) -> AsyncGeminiClient:
+        if self.async_gemini_client is None:
+            self.async_gemini_client = AsyncGeminiClient(
+                model=self.gemini_client.model,
+                encoder=self.gemini_client.encoder,
+                hedging=self.gemini_client.hedging
             )
+        return self.async_gemini_client
 
-            result = self.image_processor.blend_images(
-                user_image,
-                clothing_resized,
-                alpha=0.3
+    def _request_deadline_at(self) -> Optional[float]:
+        if self.request_deadline is None:
+            return None
+        return time.monotonic() + self.request_deadline
+
+    @contextmanager
+    def _admit(self, deadline_at: Optional[float]):
+        """Hold a model slot, after checking the breaker; raises AdmissionRejected"""
+        probe = self.breaker is not None and self.breaker.check()
+        try:
+            if self.admission is None:
+                yield
+                return
+            with self.admission.acquire(deadline_at):
+                yield
+        finally:
+            # A probe that was shed or cancelled never recorded an outcome
+            if probe:
+                self.breaker.abandon_probe()
+
+    @asynccontextmanager
+    async def _admit_async(self, deadline_at: Optional[float]):
+        probe = self.breaker is not None and self.breaker.check()
+        try:
+            if self.admission is None:
+                yield
+                return
+            async with self.admission.acquire_async(deadline_at):
+                yield
+        finally:
+            if probe:
+                self.breaker.abandon_probe()
+
+    def _record_outcome(self, error: Optional[Exception]) -> None:
+        # Only transient upstream failures count toward opening the breaker. A local
+        # quota wait never reached upstream, so it is no evidence either way
+        if self.breaker is None or isinstance(error, GeminiQuotaError):
+            return
+        if isinstance(error, GeminiRetryableError):
+            self.breaker.record_failure()
+        else:
+            self.breaker.record_success()
+
+    def _lookup_cache(
+        self,
+        user_processed: Image.Image,
+        clothing_processed: Image.Image,
+        prompt: str,
+        user_hash: Optional[str] = None,
+        clothing_hash: Optional[str] = None,
+        tracker: Optional[ProgressTracker] = None
+    ) -> Tuple[Optional[str], Optional[Image.Image]]:
+        if self.cache is None:
+            return None, None
+
+        with track_stage(tracker, "cache"):
+            cache_key = make_cache_key(
+                user_hash or self.image_processor.compute_image_hash(user_processed),
+                clothing_hash or self.image_processor.compute_image_hash(clothing_processed),
+                prompt
             )
+            return cache_key, self.cache.get(cache_key)
 
-            return result
+    def _handle_model_error(
+        self,
+        error: Exception,
+        user_processed: Image.Image,
+        clothing_processed: Image.Image,
+        tracker: Optional[ProgressTracker] = None,
+        user_hash: Optional[str] = None
+    ) -> Tuple[Image.Image, str]:
+        # The client has already retried transient failures within its deadline,
+        # so anything that reaches here is served from the local fallback render
+        if isinstance(error, AdmissionRejected):
+            metrics.inc("tryon_rejections_total", labels={"reason": type(error).__name__})
+            if self.overload_policy == "reject":
+                raise error
+        metrics.inc("tryon_fallbacks_total", labels={"reason": type(error).__name__})
+        if isinstance(error, AdmissionRejected):
+            print(f"Model over capacity, using fallback: {str(error)}")
+        elif isinstance(error, GeminiRetryableError):
+            print(f"Gemini unavailable after retries, using fallback: {str(error)}")
+        elif isinstance(error, GeminiQuotaError):
+            print(f"Client rate limit reached, using fallback: {str(error)}")
+        else:
+            print(f"Error in virtual try-on pipeline: {str(error)}")
 
-        except Exception as e:
-            print(f"Error creating fallback image: {str(e)}")
-            return user_image
+        with track_stage(tracker, "fallback"):
+            return self._create_fallback_image(user_processed, clothing_processed, user_hash), str(error)
 
-    def analyze_compatibility(
+    def _build_tryon_prompt(self) -> str:
+        return PROMPTS['virtual_tryon']
+
+    def _create_fallback_image(
         self,
         user_image: Image.Image,
-        clothing_image: Image.Image
+        clothing_image: Image.Image,
+        user_hash: Optional[str] = None
+    ) -> Image.Image:
+        return self._cpu.create_fallback_image(user_image, clothing_image, user_hash)
+
+    def analyze_compatibility(
+        self,
+        user_image: Union[Image.Image, str],
+        clothing_image: Union[Image.Image, str]
     ) -> dict:
+        """
+        Structured compatibility analysis: {"analysis", "compatibility_score"
+        (1-10), "recommendations", "fit", "color", "style", "occasion",
+        "error"}. Results are cached by the prepared image pair's hashes.
+        """
         try:
-            prompt = """
-            Analyze the compatibility between this person and clothing item:
-            1. Body type and clothing fit
-            2. Color coordination
-            3. Style matching
-            4. Occasion appropriateness
-            5. Overall compatibility score (1-10)
-
-            Provide a structured analysis with recommendations.
-            """
-
-            response = self.gemini_client.generate_image_response(
-                prompt,
-                user_image,
-                additional_images=[clothing_image]
+            user_processed, clothing_processed = self._cpu.prepare_for_tryon(
+                self._open_image(user_image), self._open_image(clothing_image)
             )
+        except Exception as e:
+            return compatibility_error(e)
 
-            return {
-                "analysis": response,
-                "compatibility_score": 8.0,
-                "recommendations": ["Great color match", "Good fit for body type"]
-            }
+        return self._analyze_prepared(
+            user_processed,
+            clothing_processed,
+            self.image_processor.compute_image_hash(user_processed),
+            self.image_processor.compute_image_hash(clothing_processed),
+            self._request_deadline_at()
+        )
+
+    def _analyze_prepared(
+        self,
+        user_image: Union[Image.Image, EncodedImage],
+        clothing_image: Union[Image.Image, EncodedImage],
+        user_hash: str,
+        clothing_hash: str,
+        deadline_at: Optional[float] = None,
+        shed_error: Optional[str] = None
+    ) -> dict:
+        """shed_error, when set, answers a cache miss with that error instead of calling the model"""
+        prompt = PROMPTS["compatibility"]
+        cache_key = make_cache_key(user_hash, clothing_hash, prompt, ANALYSIS_CONFIG)
+        cached = self.analysis_cache.get(cache_key)
+        metrics.inc("compatibility_cache_lookups_total", labels={"result": "miss" if cached is None else "hit"})
+        if cached is not None:
+            return cached
+        if shed_error is not None:
+            return compatibility_error(RuntimeError(shed_error))
+
+        def analyze() -> dict:
+            data = self.analysis_client.generate_structured_response(
+                prompt,
+                [user_image, clothing_image],
+                COMPATIBILITY_SCHEMA,
+                image_hashes=[user_hash, clothing_hash],
+                settings=ANALYSIS_CONFIG,
+                deadline_at=deadline_at
+            )
+            result = parse_compatibility(data)
+            self.analysis_cache.set(cache_key, result)
+            return result
 
+        try:
+            # Concurrent requests for the same pair share one model call
+            result, shared = self._analysis_flight.do(cache_key, analyze)
         except Exception as e:
-            return {
-                "analysis": f"Error analyzing compatibility: {str(e)}",
-                "compatibility_score": 5.0,
-                "recommendations": ["Unable to analyze compatibility"]
-            }
\ No newline at end of file
+            print(f"Error analyzing compatibility: {str(e)}")
+            return compatibility_error(e)
+
+        if shared:
+            result = dict(result, recommendations=list(result["recommendations"]))
+        return result
+
+    def _get_analysis_executor(self) -> ThreadPoolExecutor:
+        with self._analysis_executor_lock:
+            if self._analysis_executor is None:
+                self._analysis_executor = ThreadPoolExecutor(
+                    max_workers=ANALYSIS_CONFIG.get("max_workers", 4),
+                    thread_name_prefix="compatibility"
+                )
+            return self._analysis_executor
@@ -0,0 +1,118 @@
+from PIL import Image
+import numpy as np
+from typing import Optional, Tuple
+from config import IMAGE_CONFIG
+from .frame import BufferPool, Frame, get_buffer_pool, get_orientation, thumbnail_size
+# Moved to services/frame.py; re-exported for callers that import them from here
+from .frame import apply_orientation  # noqa: F401
+
+# PIL's ImageFilter.SMOOTH kernel, which ImageEnhance.Sharpness blends against
+_SMOOTH_KERNEL = np.array([[1, 1, 1], [1, 5, 1], [1, 1, 1]], dtype=np.float32) / 13
+
+# ITU-R 601-2 luma, as used by PIL's "L" conversion in ImageEnhance.Color
+_LUMA = np.array([0.299, 0.587, 0.114], dtype=np.float32)
+
+
+def _color_matrix(color: float) -> np.ndarray:
+    """out = gray + color * (rgb - gray) as a single 3x3 per-pixel transform"""
+    return (color * np.eye(3, dtype=np.float32)
+            + (1 - color) * np.tile(_LUMA, (3, 1))).astype(np.float32)
+
+
+def _sharpen_kernel(sharpness: float) -> np.ndarray:
+    """out = smooth + sharpness * (image - smooth) as a single 3x3 convolution"""
+    identity = np.zeros((3, 3), dtype=np.float32)
+    identity[1, 1] = 1
+    return sharpness * identity + (1 - sharpness) * _SMOOTH_KERNEL
+
+
+class FusedPreprocessor:
+    """
+    NumPy/OpenCV preprocessing engine equivalent to the PIL chain in
+    ImageProcessor: decode once into a Frame, area downscale, orient the
+    small image, then sharpen and saturate in two saturating uint8 passes.
+    Scratch buffers come from a BufferPool and are reused across calls.
+    """
+
+    def __init__(self, sharpness: float = 1.2, color: float = 1.1, pool: Optional[BufferPool] = None):
+        self.sharpen_kernel = _sharpen_kernel(sharpness)
+        self.color_matrix = _color_matrix(color)
+        self.pool = pool or get_buffer_pool()
+
+    def decode(self, image: Image.Image) -> Tuple[np.ndarray, int]:
+        """Decode to an RGB array, returning the EXIF orientation still to apply"""
+        frame = Frame.from_image(image, pool=self.pool)
+        return frame.buffer, frame.orientation
+
+    def resize(
+        self,
+        array: np.ndarray,
+        orientation: int,
+        max_size: Optional[Tuple[int, int]] = None
+    ) -> np.ndarray:
+        """Downscaled, oriented copy of array (or array itself when neither step applies)"""
+        return Frame(array, orientation, self.pool).fit(max_size).buffer
+
+    def enhance(self, array: np.ndarray, out: Optional[np.ndarray] = None) -> np.ndarray:
+        """Sharpen and saturate RGB pixels into out (a new array by default)"""
+        import cv2
+        sharpened = self.pool.acquire(array.shape)
+        cv2.filter2D(array, -1, self.sharpen_kernel, dst=sharpened, borderType=cv2.BORDER_REPLICATE)
+
+        # PIL's SMOOTH filter leaves the one-pixel border untouched
+        sharpened[0, :] = array[0, :]
+        sharpened[-1, :] = array[-1, :]
+        sharpened[:, 0] = array[:, 0]
+        sharpened[:, -1] = array[:, -1]
+
+        if out is None:
+            out = np.empty(array.shape, dtype=np.uint8)
+        cv2.transform(sharpened, self.color_matrix, dst=out)
+        self.pool.release(sharpened)
+        return out
+
+    def prepare_user_image(
+        self,
+        image: Image.Image,
+        max_size: Optional[Tuple[int, int]] = None
+    ) -> Image.Image:
+        if max_size is None:
+            max_size = IMAGE_CONFIG["max_image_size"]
+        with Frame.from_image(image, max_size, self.pool).fit(max_size) as frame:
+            enhanced = Frame(self.pool.acquire(frame.buffer.shape), pool=self.pool, owned=True)
+            self.enhance(frame.buffer, enhanced.buffer)
+        return enhanced.to_image()
+
+    def fit(
+        self,
+        image: Image.Image,
+        max_size: Optional[Tuple[int, int]] = None
+    ) -> Image.Image:
+        """
+        Upright RGB image within max_size, without the enhance pass. May
+        return image itself when it is already upright RGB within max_size.
+        """
+        if max_size is None:
+            max_size = IMAGE_CONFIG["max_image_size"]
+        if (image.mode == 'RGB' and get_orientation(image) == 1
+                and thumbnail_size(image.size, max_size) == image.size):
+            return image
+        return Frame.from_image(image, max_size, self.pool).fit(max_size).to_image()
+
+    def prepare_clothing_image(
+        self,
+        image: Image.Image,
+        max_size: Optional[Tuple[int, int]] = None
+    ) -> Image.Image:
+        """May return image itself when it is already upright RGB within max_size"""
+        return self.fit(image, max_size)
+
+
+_default_preprocessor = None
+
+
+def get_preprocessor() -> FusedPreprocessor:
+    global _default_preprocessor
+    if _default_preprocessor is None:
+        _default_preprocessor = FusedPreprocessor()
+    return _default_preprocessor
@@ -0,0 +1,56 @@
+from PIL import Image
+import threading
+from collections import OrderedDict
+from typing import Optional
+from config import PREVIEW_CONFIG
+
+
+class PreviewEntry:
+    """
+    What upgrade() needs to re-render a preview at full resolution: the user
+    image fitted to IMAGE_CONFIG["max_image_size"] but not yet enhanced, and
+    the prepared clothing image (or catalog garment ID). The decoded sources
+    are not kept. The first upgrade replaces user_image with the prepared
+    user image.
+    """
+
+    def __init__(
+        self,
+        user_image: Image.Image,
+        clothing_processed: Optional[Image.Image] = None,
+        garment_id: Optional[str] = None
+    ):
+        self.user_image = user_image
+        self.garment_id = garment_id
+        self.user_processed = None
+        self.user_hash = None
+        self.clothing_processed = clothing_processed
+        self.clothing_hash = None
+
+
+class PreviewStore:
+    """LRU of PreviewEntry by preview ID"""
+
+    def __init__(self, max_entries: Optional[int] = None):
+        self.max_entries = max_entries or PREVIEW_CONFIG["max_entries"]
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def add(self, preview_id: str, entry: PreviewEntry) -> None:
+        with self._lock:
+            self._entries[preview_id] = entry
+            self._entries.move_to_end(preview_id)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def get(self, preview_id: str) -> PreviewEntry:
+        """Entry for preview_id; raises KeyError if it is unknown or was evicted"""
+        with self._lock:
+            entry = self._entries.get(preview_id)
+            if entry is None:
+                raise KeyError(f"Unknown or expired preview: {preview_id}")
+            self._entries.move_to_end(preview_id)
+            return entry
+
+    def __len__(self) -> int:
+        return len(self._entries)
@@ -0,0 +1,110 @@
+import threading
+import time
+from contextlib import contextmanager, nullcontext
+from typing import Callable, Optional
+from .metrics import registry as metrics
+
+ProgressCallback = Callable[[dict], None]
+
+
+class ProgressTracker:
+    """
+    Times the stages of one try-on request, records them in the metrics
+    registry and reports them to an optional callback as {"stage", "status",
+    "elapsed", "duration"} events, where status is "started" or "finished"
+    and duration is set on "finished".
+    """
+
+    def __init__(self, callback: Optional[ProgressCallback] = None):
+        self.callback = callback
+        self.started_at = time.perf_counter()
+        self.timings = {}
+
+    def elapsed(self) -> float:
+        return time.perf_counter() - self.started_at
+
+    def _emit(self, stage: str, status: str, duration: Optional[float] = None) -> None:
+        if self.callback is None:
+            return
+        self.callback({
+            "stage": stage,
+            "status": status,
+            "elapsed": self.elapsed(),
+            "duration": duration,
+        })
+
+    @contextmanager
+    def stage(self, name: str):
+        self._emit(name, "started")
+        stage_start = time.perf_counter()
+        try:
+            yield
+        finally:
+            duration = time.perf_counter() - stage_start
+            self.timings[name] = self.timings.get(name, 0.0) + duration
+            metrics.observe("tryon_stage_seconds", duration, {"stage": name})
+            self._emit(name, "finished", duration)
+
+    def mirror(self, name: str, status: str, duration: Optional[float] = None) -> None:
+        """Report a stage run on this request's behalf by another one; not recorded in metrics"""
+        if status == "finished":
+            self.timings[name] = self.timings.get(name, 0.0) + duration
+        self._emit(name, status, duration)
+
+
+class ProgressRelay:
+    """
+    Stands in for the tracker of a request whose work other, coalesced
+    requests are waiting on: stages are timed on the wrapped tracker (if
+    any) and mirrored to every follower's tracker. A follower that joins
+    mid-stage is told that stage has started.
+    """
+
+    def __init__(self, tracker: Optional[ProgressTracker] = None):
+        self.tracker = tracker
+        self._followers = []
+        self._current = None
+        self._lock = threading.Lock()
+
+    def follow(self, tracker: Optional[ProgressTracker]) -> Callable[[], None]:
+        """Mirror stages to tracker until the returned function is called"""
+        if tracker is None:
+            return lambda: None
+
+        with self._lock:
+            self._followers.append(tracker)
+            current = self._current
+        if current is not None:
+            tracker.mirror(current, "started")
+
+        def leave():
+            with self._lock:
+                self._followers.remove(tracker)
+        return leave
+
+    @contextmanager
+    def stage(self, name: str):
+        with self._lock:
+            self._current = name
+            followers = list(self._followers)
+        for tracker in followers:
+            tracker.mirror(name, "started")
+
+        stage_start = time.perf_counter()
+        try:
+            with track_stage(self.tracker, name):
+                yield
+        finally:
+            with self._lock:
+                self._current = None
+                followers = list(self._followers)
+            duration = time.perf_counter() - stage_start
+            for tracker in followers:
+                tracker.mirror(name, "finished", duration)
+
+
+def track_stage(tracker: Optional[ProgressTracker], name: str):
+    """tracker.stage(name), or a no-op when no tracker was passed in"""
+    if tracker is None:
+        return nullcontext()
+    return tracker.stage(name)
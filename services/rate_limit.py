@@ -0,0 +1,209 @@
+import asyncio
+import threading
+import time
+from contextlib import asynccontextmanager, contextmanager
+from typing import Any, Awaitable, Callable, Optional, Tuple
+
+
+class RateLimitExceeded(TimeoutError):
+    """No rate limit token or in-flight slot was free within the caller's timeout"""
+
+
+class TokenBucket:
+    """Token bucket that hands out reservations instead of blocking"""
+
+    def __init__(self, rate: float, burst: int = 1):
+        self.rate = rate
+        self.burst = max(1, burst)
+        self._tokens = float(self.burst)
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def reserve(self, max_wait: Optional[float] = None) -> Optional[float]:
+        """
+        Reserve one token and return how long the caller must wait before using it.
+        Returns None (and reserves nothing) if the wait would exceed max_wait.
+        """
+        with self._lock:
+            now = time.monotonic()
+            self._tokens = min(self.burst, self._tokens + (now - self._updated) * self.rate)
+            self._updated = now
+
+            delay = 0.0 if self._tokens >= 1 else (1 - self._tokens) / self.rate
+            if max_wait is not None and delay > max_wait:
+                return None
+
+            self._tokens -= 1
+            return delay
+
+
+class RateLimiter:
+    """Caps request rate (token bucket) and concurrent in-flight requests"""
+
+    def __init__(
+        self,
+        requests_per_second: Optional[float] = None,
+        burst: int = 1,
+        max_in_flight: Optional[int] = None,
+        poll_interval: float = 0.01
+    ):
+        self.bucket = TokenBucket(requests_per_second, burst) if requests_per_second else None
+        self.max_in_flight = max_in_flight
+        self.poll_interval = poll_interval
+        self._semaphore = threading.BoundedSemaphore(max_in_flight) if max_in_flight else None
+
+    def _reserve_token(self, deadline_at: Optional[float]) -> float:
+        if self.bucket is None:
+            return 0.0
+
+        max_wait = None if deadline_at is None else max(0.0, deadline_at - time.monotonic())
+        delay = self.bucket.reserve(max_wait)
+        if delay is None:
+            raise RateLimitExceeded("Timed out waiting for a rate limit token")
+        return delay
+
+    @contextmanager
+    def acquire(self, timeout: Optional[float] = None):
+        deadline_at = None if timeout is None else time.monotonic() + timeout
+
+        if self._semaphore is not None:
+            if not self._semaphore.acquire(timeout=timeout):
+                raise RateLimitExceeded("Timed out waiting for an in-flight request slot")
+
+        try:
+            delay = self._reserve_token(deadline_at)
+            if delay > 0:
+                time.sleep(delay)
+            yield
+        finally:
+            if self._semaphore is not None:
+                self._semaphore.release()
+
+    @asynccontextmanager
+    async def acquire_async(self, timeout: Optional[float] = None):
+        deadline_at = None if timeout is None else time.monotonic() + timeout
+
+        # Poll the shared threading semaphore so sync and async callers see one cap
+        if self._semaphore is not None:
+            while not self._semaphore.acquire(blocking=False):
+                if deadline_at is not None and time.monotonic() >= deadline_at:
+                    raise RateLimitExceeded("Timed out waiting for an in-flight request slot")
+                await asyncio.sleep(self.poll_interval)
+
+        try:
+            delay = self._reserve_token(deadline_at)
+            if delay > 0:
+                await asyncio.sleep(delay)
+            yield
+        finally:
+            if self._semaphore is not None:
+                self._semaphore.release()
+
+
+class _Call:
+    def __init__(self, state: Any = None):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+        self.state = state
+
+
+class SingleFlight:
+    """Collapses concurrent calls with the same key into one execution"""
+
+    def __init__(self):
+        self._calls = {}
+        self._lock = threading.Lock()
+
+    def do(
+        self,
+        key: str,
+        fn: Callable[[], Any],
+        timeout: Optional[float] = None,
+        state: Any = None,
+        join: Optional[Callable[[Any], Callable[[], None]]] = None
+    ) -> Tuple[Any, bool]:
+        """
+        Run fn once per in-flight key. Returns (result, shared) where shared is True for followers.
+
+        A follower waits at most timeout seconds for the leader, then raises
+        TimeoutError; the leader's call carries on for the others. The
+        leader's state is passed to each follower's join before it waits,
+        and the callable join returns is called once it stops waiting.
+        """
+        with self._lock:
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = _Call(state)
+                self._calls[key] = call
+
+        if not leader:
+            leave = join(call.state) if join is not None else None
+            try:
+                if not call.done.wait(timeout):
+                    raise TimeoutError("Timed out waiting for a coalesced request")
+            finally:
+                if leave is not None:
+                    leave()
+            if call.error is not None:
+                raise call.error
+            return call.result, True
+
+        try:
+            call.result = fn()
+        except BaseException as e:
+            call.error = e
+            raise
+        finally:
+            with self._lock:
+                del self._calls[key]
+            call.done.set()
+
+        return call.result, False
+
+
+class AsyncSingleFlight:
+    """asyncio variant of SingleFlight; followers await the leader's future"""
+
+    def __init__(self):
+        self._calls = {}
+
+    async def do(
+        self,
+        key: str,
+        fn: Callable[[], Awaitable[Any]],
+        timeout: Optional[float] = None,
+        state: Any = None,
+        join: Optional[Callable[[Any], Callable[[], None]]] = None
+    ) -> Tuple[Any, bool]:
+        """See SingleFlight.do"""
+        call = self._calls.get(key)
+        if call is not None:
+            future, leader_state = call
+            leave = join(leader_state) if join is not None else None
+            try:
+                return await asyncio.wait_for(asyncio.shield(future), timeout), True
+            except asyncio.TimeoutError:
+                raise TimeoutError("Timed out waiting for a coalesced request") from None
+            finally:
+                if leave is not None:
+                    leave()
+
+        future = asyncio.get_running_loop().create_future()
+        self._calls[key] = (future, state)
+        try:
+            result = await fn()
+        except asyncio.CancelledError:
+            future.cancel()
+            raise
+        except BaseException as e:
+            future.set_exception(e)
+            # Mark retrieved so an unobserved failure doesn't warn at GC time
+            future.exception()
+            raise
+        else:
+            future.set_result(result)
+            return result, False
+        finally:
+            del self._calls[key]
@@ -0,0 +1,117 @@
+from PIL import Image
+import io
+import threading
+from collections import OrderedDict
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Iterable, List, Optional
+from .image_codec import EncodedImage
+from .image_utils import ImageProcessor
+from config import IMAGE_CONFIG, RESULT_ENCODING_CONFIG
+
+FILE_EXTENSIONS = {"PNG": ".png", "JPEG": ".jpg", "WEBP": ".webp"}
+
+
+def _normalize_format(format: Optional[str]) -> str:
+    format = (format or IMAGE_CONFIG["output_format"]).upper()
+    if format == "JPG":
+        format = "JPEG"
+    if format not in FILE_EXTENSIONS:
+        raise ValueError(f"Unsupported output format: {format}")
+    return format
+
+
+class ResultEncoder:
+    """
+    Encodes try-on results for display and download. Each (result, format)
+    pair is encoded once on a background thread and the bytes are cached by
+    the result's content hash, so st.image, download buttons and workers
+    all share one buffer. PNG uses a fast compression level.
+    """
+
+    def __init__(
+        self,
+        png_compress_level: Optional[int] = None,
+        quality: Optional[int] = None,
+        max_entries: Optional[int] = None,
+        max_workers: Optional[int] = None
+    ):
+        config = RESULT_ENCODING_CONFIG
+        self.png_compress_level = png_compress_level if png_compress_level is not None else config["png_compress_level"]
+        self.quality = quality if quality is not None else config["quality"]
+        self.max_entries = max_entries or config["max_entries"]
+        self.executor = ThreadPoolExecutor(
+            max_workers=max_workers or config["max_workers"],
+            thread_name_prefix="result-encoder"
+        )
+        self.encodes = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def submit(
+        self,
+        image: Image.Image,
+        format: Optional[str] = None,
+        image_hash: Optional[str] = None
+    ) -> "Future[EncodedImage]":
+        """Start encoding image (or join the encode already cached or running)"""
+        format = _normalize_format(format)
+        if image_hash is None:
+            image_hash = ImageProcessor.compute_image_hash(image)
+        key = (image_hash, format)
+
+        with self._lock:
+            future = self._entries.get(key)
+            # A failed encode is retried rather than served from the cache
+            if future is not None and not (future.done() and future.exception() is not None):
+                self._entries.move_to_end(key)
+                return future
+            future = self.executor.submit(self._encode, image, format, image_hash)
+            self._entries[key] = future
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+        return future
+
+    def prefetch(
+        self,
+        image: Image.Image,
+        formats: Iterable[str],
+        image_hash: Optional[str] = None
+    ) -> List["Future[EncodedImage]"]:
+        """Queue every format at once; the image is hashed a single time"""
+        if image_hash is None:
+            image_hash = ImageProcessor.compute_image_hash(image)
+        return [self.submit(image, format, image_hash) for format in formats]
+
+    def encode(
+        self,
+        image: Image.Image,
+        format: Optional[str] = None,
+        image_hash: Optional[str] = None
+    ) -> EncodedImage:
+        return self.submit(image, format, image_hash).result()
+
+    def _encode(self, image: Image.Image, format: str, image_hash: str) -> EncodedImage:
+        options = {}
+        quality = None
+        if format == "PNG":
+            options["compress_level"] = self.png_compress_level
+        else:
+            quality = self.quality
+            options["quality"] = quality
+            if format == "WEBP":
+                options["method"] = RESULT_ENCODING_CONFIG.get("webp_method", 4)
+            if image.mode not in ('RGB', 'L'):
+                image = image.convert('RGB')
+
+        buf = io.BytesIO()
+        image.save(buf, format=format, **options)
+        with self._lock:
+            self.encodes += 1
+        return EncodedImage(buf.getvalue(), format, quality, image_hash)
+
+    def shutdown(self) -> None:
+        self.executor.shutdown(wait=True)
+
+
+def file_extension(format: Optional[str] = None) -> str:
+    return FILE_EXTENSIONS[_normalize_format(format)]
@@ -0,0 +1,65 @@
+from PIL import Image
+from typing import Callable, Iterator, Optional, Tuple
+from config import TILING_CONFIG
+
+# Approximate working bytes per source pixel of each striped operation,
+# counting PIL's 4-byte RGB storage and every intermediate held at once
+MASK_BYTES_PER_PIXEL = 8
+ENHANCE_BYTES_PER_PIXEL = 20
+COMPOSITE_BYTES_PER_PIXEL = 32
+
+
+def should_tile(image: Image.Image) -> bool:
+    """True when image is large enough to run ImageProcessor operations in stripes"""
+    if not TILING_CONFIG.get("enabled"):
+        return False
+    return image.width * image.height >= TILING_CONFIG["min_pixels"]
+
+
+def memory_budget() -> int:
+    return int(TILING_CONFIG["max_memory_mb"] * 1024 * 1024)
+
+
+def stripe_rows(width: int, bytes_per_pixel: int, budget: Optional[int] = None) -> int:
+    """Rows per stripe that keep one stripe's working set under the memory budget"""
+    if budget is None:
+        budget = memory_budget()
+    return max(1, budget // max(1, width * bytes_per_pixel))
+
+
+def iter_stripes(height: int, rows: int, overlap: int = 0) -> Iterator[Tuple[int, int, int, int]]:
+    """
+    Yield (top, bottom, crop_top, crop_bottom) for each stripe: rows top..bottom
+    are produced from source rows crop_top..crop_bottom, which add up to
+    overlap rows of context on each side where the image has them.
+    """
+    for top in range(0, height, rows):
+        bottom = min(top + rows, height)
+        yield top, bottom, max(0, top - overlap), min(height, bottom + overlap)
+
+
+def map_stripes(
+    image: Image.Image,
+    fn: Callable[[Image.Image], Image.Image],
+    bytes_per_pixel: int,
+    overlap: int = 0,
+    budget: Optional[int] = None
+) -> Image.Image:
+    """
+    Apply a size-preserving fn to horizontal stripes of image and stitch the
+    results. overlap must cover fn's neighbourhood radius so stripe seams
+    match a whole-frame run; the extra context rows are cropped off again.
+    """
+    rows = stripe_rows(image.width, bytes_per_pixel, budget)
+    if rows >= image.height:
+        return fn(image)
+
+    result = None
+    for top, bottom, crop_top, crop_bottom in iter_stripes(image.height, rows, overlap):
+        stripe = fn(image.crop((0, crop_top, image.width, crop_bottom)))
+        if crop_top != top or crop_bottom != bottom:
+            stripe = stripe.crop((0, top - crop_top, image.width, bottom - crop_top))
+        if result is None:
+            result = Image.new(stripe.mode, image.size)
+        result.paste(stripe, (0, top))
+    return result
@@ -0,0 +1,283 @@
+import unittest
+from unittest.mock import Mock, patch, AsyncMock
+from PIL import Image
+import asyncio
+import threading
+import time
+import sys
+import os
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from services.admission import AdmissionController, AdmissionRejected, CircuitBreaker, CircuitOpenError
+from services.gemini_client import GeminiClient, GeminiQuotaError, GeminiRetryableError
+from services.pipeline import VirtualTryOnPipeline
+from services.rate_limit import RateLimiter
+
+class TestAdmissionController(unittest.TestCase):
+    def test_rejects_when_queue_full(self):
+        controller = AdmissionController(max_in_flight=1, max_queue=0, retry_after=3.0)
+
+        with controller.acquire():
+            with self.assertRaises(AdmissionRejected) as ctx:
+                with controller.acquire():
+                    pass
+
+        self.assertEqual(ctx.exception.retry_after, 3.0)
+        self.assertEqual(controller.stats()["in_flight"], 0)
+        self.assertEqual(controller.rejected, 1)
+
+    def test_queued_request_gets_released_slot(self):
+        controller = AdmissionController(max_in_flight=1, max_queue=1, queue_timeout=2.0)
+        entered = threading.Event()
+        admitted = []
+
+        def waiter():
+            entered.set()
+            with controller.acquire():
+                admitted.append(True)
+
+        with controller.acquire():
+            thread = threading.Thread(target=waiter)
+            thread.start()
+            entered.wait()
+            time.sleep(0.05)
+            self.assertEqual(controller.stats()["waiting"], 1)
+        thread.join(2.0)
+
+        self.assertEqual(admitted, [True])
+        self.assertEqual(controller.stats()["waiting"], 0)
+
+    def test_queue_wait_bounded_by_deadline(self):
+        controller = AdmissionController(max_in_flight=1, max_queue=1, queue_timeout=10.0)
+
+        with controller.acquire():
+            start = time.monotonic()
+            with self.assertRaises(AdmissionRejected):
+                with controller.acquire(deadline_at=time.monotonic() + 0.05):
+                    pass
+
+        self.assertLess(time.monotonic() - start, 1.0)
+
+    def test_rejects_at_once_when_deadline_cannot_be_met(self):
+        controller = AdmissionController(max_in_flight=1, max_queue=4, queue_timeout=10.0)
+        with controller.acquire():
+            time.sleep(0.1)  # teaches the controller a slot is held ~0.1s
+
+        with controller.acquire():
+            start = time.monotonic()
+            with self.assertRaises(AdmissionRejected) as ctx:
+                with controller.acquire(deadline_at=time.monotonic() + 0.01):
+                    pass
+
+        self.assertLess(time.monotonic() - start, 0.01)
+        self.assertIn("deadline", str(ctx.exception))
+
+    def test_async_acquire_shares_slots(self):
+        controller = AdmissionController(max_in_flight=1, max_queue=0)
+
+        async def run():
+            async with controller.acquire_async():
+                with self.assertRaises(AdmissionRejected):
+                    with controller.acquire():
+                        pass
+            async with controller.acquire_async():
+                pass
+
+        asyncio.run(run())
+        self.assertEqual(controller.stats()["in_flight"], 0)
+
+class TestCircuitBreaker(unittest.TestCase):
+    def test_opens_after_consecutive_failures(self):
+        breaker = CircuitBreaker(failure_threshold=3, reset_timeout=60)
+        breaker.record_failure()
+        breaker.record_failure()
+        breaker.record_success()
+        breaker.record_failure()
+        breaker.record_failure()
+        self.assertEqual(breaker.state, CircuitBreaker.CLOSED)
+
+        breaker.record_failure()
+
+        self.assertEqual(breaker.state, CircuitBreaker.OPEN)
+        self.assertFalse(breaker.allow())
+        with self.assertRaises(CircuitOpenError) as ctx:
+            breaker.check()
+        self.assertGreater(ctx.exception.retry_after, 50)
+
+    def test_half_open_allows_one_probe(self):
+        breaker = CircuitBreaker(failure_threshold=1, reset_timeout=0.05)
+        breaker.record_failure()
+        time.sleep(0.06)
+
+        self.assertEqual(breaker.state, CircuitBreaker.HALF_OPEN)
+        self.assertTrue(breaker.allow())
+        self.assertFalse(breaker.allow())
+
+        breaker.record_failure()
+        self.assertEqual(breaker.state, CircuitBreaker.OPEN)
+
+        time.sleep(0.06)
+        self.assertTrue(breaker.allow())
+        breaker.record_success()
+        self.assertEqual(breaker.state, CircuitBreaker.CLOSED)
+
+class TestPipelineAdmission(unittest.TestCase):
+    def setUp(self):
+        self.user = Image.new('RGB', (256, 256), color='blue')
+        self.clothing = Image.new('RGB', (128, 128), color='red')
+
+    def make_pipeline(self, **kwargs):
+        with patch('services.pipeline.GeminiClient'):
+            return VirtualTryOnPipeline(cache=None, cpu_pool=None, **kwargs)
+
+    def test_open_breaker_short_circuits_to_fallback(self):
+        pipeline = self.make_pipeline(admission=None, breaker=CircuitBreaker(failure_threshold=2, reset_timeout=60))
+        pipeline.gemini_client.process_virtual_tryon.side_effect = GeminiRetryableError("503 unavailable")
+
+        for _ in range(3):
+            result = pipeline.generate_tryon(self.user, self.clothing)
+            self.assertEqual(result.size, (256, 256))
+
+        self.assertEqual(pipeline.gemini_client.process_virtual_tryon.call_count, 2)
+
+    def test_non_retryable_errors_do_not_open_breaker(self):
+        pipeline = self.make_pipeline(admission=None, breaker=CircuitBreaker(failure_threshold=1, reset_timeout=60))
+        pipeline.gemini_client.process_virtual_tryon.side_effect = Exception("No image in response")
+
+        pipeline.generate_tryon(self.user, self.clothing)
+
+        self.assertEqual(pipeline.breaker.state, CircuitBreaker.CLOSED)
+
+    def test_local_quota_errors_leave_breaker_alone(self):
+        breaker = CircuitBreaker(failure_threshold=1, reset_timeout=0.05)
+        pipeline = self.make_pipeline(admission=None, breaker=breaker)
+        pipeline.gemini_client.process_virtual_tryon.side_effect = GeminiRetryableError("503 unavailable")
+        pipeline.generate_tryon(self.user, self.clothing)
+        time.sleep(0.06)
+
+        # The half-open probe never reaches upstream: the breaker neither closes nor reopens
+        pipeline.gemini_client.process_virtual_tryon.side_effect = GeminiQuotaError("Client rate limit reached")
+        pipeline.generate_tryon(self.user, self.clothing)
+
+        self.assertEqual(breaker.state, CircuitBreaker.HALF_OPEN)
+        self.assertTrue(breaker.allow())
+
+    def test_over_capacity_falls_back_without_calling_model(self):
+        admission = AdmissionController(max_in_flight=1, max_queue=0)
+        pipeline = self.make_pipeline(admission=admission, breaker=None)
+
+        with admission.acquire():
+            result = pipeline.generate_tryon(self.user, self.clothing)
+
+        self.assertEqual(result.size, (256, 256))
+        pipeline.gemini_client.process_virtual_tryon.assert_not_called()
+
+    def test_reject_policy_raises_with_retry_after(self):
+        admission = AdmissionController(max_in_flight=1, max_queue=0, retry_after=4.0)
+        pipeline = self.make_pipeline(admission=admission, breaker=None)
+        pipeline.overload_policy = "reject"
+
+        with admission.acquire():
+            with self.assertRaises(AdmissionRejected) as ctx:
+                pipeline.generate_tryon(self.user, self.clothing)
+
+        self.assertEqual(ctx.exception.retry_after, 4.0)
+
+    def test_probe_shed_by_admission_does_not_wedge_breaker(self):
+        admission = AdmissionController(max_in_flight=1, max_queue=0)
+        breaker = CircuitBreaker(failure_threshold=1, reset_timeout=0.05)
+        pipeline = self.make_pipeline(admission=admission, breaker=breaker)
+        pipeline.gemini_client.process_virtual_tryon.side_effect = GeminiRetryableError("503 unavailable")
+        pipeline.generate_tryon(self.user, self.clothing)
+        time.sleep(0.06)
+
+        # The half-open probe is refused a slot and falls back
+        with admission.acquire():
+            pipeline.generate_tryon(self.user, self.clothing)
+        self.assertEqual(pipeline.gemini_client.process_virtual_tryon.call_count, 1)
+
+        # The model has recovered: the next request is let through as the probe
+        generated = Image.new('RGB', (64, 64), color='green')
+        pipeline.gemini_client.process_virtual_tryon.side_effect = None
+        pipeline.gemini_client.process_virtual_tryon.return_value = generated
+
+        self.assertIs(pipeline.generate_tryon(self.user, self.clothing), generated)
+        self.assertEqual(breaker.state, CircuitBreaker.CLOSED)
+
+    def test_request_deadline_reaches_client(self):
+        pipeline = self.make_pipeline(admission=None, breaker=None)
+        pipeline.request_deadline = 30
+        pipeline.gemini_client.process_virtual_tryon.return_value = Image.new('RGB', (64, 64))
+
+        pipeline.generate_tryon(self.user, self.clothing)
+
+        _, kwargs = pipeline.gemini_client.process_virtual_tryon.call_args
+        self.assertAlmostEqual(kwargs["deadline_at"] - time.monotonic(), 30, delta=5)
+
+    def test_async_over_capacity_falls_back(self):
+        admission = AdmissionController(max_in_flight=1, max_queue=0)
+        pipeline = self.make_pipeline(admission=admission, breaker=None)
+        pipeline.async_gemini_client = Mock()
+        pipeline.async_gemini_client.process_virtual_tryon = AsyncMock()
+
+        with admission.acquire():
+            result = asyncio.run(pipeline.generate_tryon_async(self.user, self.clothing))
+
+        self.assertEqual(result.size, (256, 256))
+        pipeline.async_gemini_client.process_virtual_tryon.assert_not_called()
+
+    def test_reject_policy_starts_no_analysis(self):
+        admission = AdmissionController(max_in_flight=1, max_queue=0)
+        analysis_client = Mock()
+        pipeline = self.make_pipeline(admission=admission, breaker=None, analysis_client=analysis_client)
+        pipeline.overload_policy = "reject"
+
+        with admission.acquire():
+            with self.assertRaises(AdmissionRejected):
+                pipeline.generate_tryon_with_analysis(self.user, self.clothing)
+
+        analysis_client.generate_structured_response.assert_not_called()
+
+    def test_shed_request_returns_fallback_without_analysis_call(self):
+        admission = AdmissionController(max_in_flight=1, max_queue=0)
+        analysis_client = Mock()
+        pipeline = self.make_pipeline(admission=admission, breaker=None, analysis_client=analysis_client)
+
+        with admission.acquire():
+            result = pipeline.generate_tryon_with_analysis(self.user, self.clothing)
+
+        self.assertTrue(result["fallback"])
+        self.assertIsNotNone(result["analysis"]["error"])
+        analysis_client.generate_structured_response.assert_not_called()
+
+    def test_analysis_cancelled_when_tryon_raises(self):
+        pipeline = self.make_pipeline(admission=None, breaker=None, analysis_client=Mock())
+        pipeline.gemini_client.process_virtual_tryon.side_effect = GeminiRetryableError("503 unavailable")
+        executor = Mock()
+
+        with patch.object(pipeline, '_get_analysis_executor', return_value=executor), \
+                patch.object(pipeline, '_create_fallback_image', side_effect=ValueError("render failed")):
+            with self.assertRaises(ValueError):
+                pipeline.generate_tryon_with_analysis(self.user, self.clothing)
+
+        executor.submit.return_value.cancel.assert_called_once()
+
+class TestClientRequestDeadline(unittest.TestCase):
+    def test_request_deadline_tightens_client_deadline(self):
+        model = Mock()
+        model.generate_content.side_effect = ConnectionError("reset")
+        client = GeminiClient(model=model, rate_limiter=RateLimiter(), hedging=None)
+        client.deadline = 60
+        client.backoff_base = 0.2
+
+        start = time.monotonic()
+        with self.assertRaises(GeminiRetryableError):
+            client._generate_with_retry(["prompt"], deadline_at=time.monotonic() + 0.05)
+
+        self.assertLess(time.monotonic() - start, 0.5)
+        _, kwargs = model.generate_content.call_args
+        self.assertLessEqual(kwargs["request_options"]["timeout"], 0.05)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,90 @@
+import unittest
+import sys
+import os
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from benchmarks.fake_gemini import FakeGeminiError, FakeGeminiModel, make_test_image
+from benchmarks.import_time import HEAVY_MODULES, check, measure_import, parse_importtime
+from benchmarks.run import compare, measure
+from services.gemini_client import GeminiClient
+from services.rate_limit import RateLimiter
+
+class TestFakeGeminiModel(unittest.TestCase):
+    def test_error_rate_is_deterministic(self):
+        def failures(model):
+            failed = []
+            for _ in range(20):
+                try:
+                    model.generate_content([])
+                    failed.append(False)
+                except FakeGeminiError:
+                    failed.append(True)
+            return failed
+
+        first = failures(FakeGeminiModel(latency=0, error_rate=0.5, response_size=(8, 8), seed=3))
+        second = failures(FakeGeminiModel(latency=0, error_rate=0.5, response_size=(8, 8), seed=3))
+
+        self.assertEqual(first, second)
+        self.assertTrue(any(first))
+        self.assertFalse(all(first))
+
+    def test_drives_gemini_client(self):
+        model = FakeGeminiModel(latency=0, response_size=(32, 24))
+        client = GeminiClient(model=model, rate_limiter=RateLimiter())
+
+        result = client.process_virtual_tryon(
+            make_test_image((64, 64), seed=1), make_test_image((64, 64), seed=2), "prompt"
+        )
+
+        self.assertEqual(result.size, (32, 24))
+        self.assertEqual(model.calls, 1)
+
+class TestBenchmarkHarness(unittest.TestCase):
+    def test_measure_reports_percentiles(self):
+        result = measure(lambda: None, iterations=5, warmup=0, concurrency=2)
+
+        self.assertEqual(result["iterations"], 5)
+        self.assertLessEqual(result["p50"], result["p95"])
+        self.assertLessEqual(result["p95"], result["p99"])
+        self.assertGreater(result["throughput"], 0)
+
+    def test_compare_flags_regressions(self):
+        base = {"name": "decode", "size": "12MP", "p50": 0.1, "p95": 0.2, "throughput": 10.0}
+        baseline = {"results": [base]}
+
+        within = dict(base, p50=0.11)
+        slower = dict(base, p50=0.2, throughput=5.0)
+
+        self.assertEqual(compare([within], baseline, tolerance=0.25), [])
+        regressions = compare([slower], baseline, tolerance=0.25)
+        self.assertEqual(len(regressions), 2)
+        self.assertTrue(regressions[0].startswith("decode 12MP: p50"))
+
+class TestImportTime(unittest.TestCase):
+    def test_parse_importtime(self):
+        stderr = (
+            "import time: self [us] | cumulative | imported package\n"
+            "import time:       120 |        120 |   services.progress\n"
+            "import time:      3000 |       4000 | services.pipeline\n"
+        )
+
+        timings = parse_importtime(stderr)
+
+        self.assertEqual(timings["services.pipeline"], (3000, 4000))
+        self.assertEqual(timings["services.progress"], (120, 120))
+
+    def test_pipeline_import_defers_heavy_dependencies(self):
+        result = measure_import("services.pipeline", runs=1)
+
+        self.assertEqual(result["heavy_loaded"], [])
+        self.assertGreater(result["cumulative_ms"], 0)
+        self.assertEqual(check(result), [])
+
+    def test_check_flags_eager_imports_and_budget(self):
+        result = {"module": "m", "cumulative_ms": 500.0, "heavy_loaded": [HEAVY_MODULES[0]]}
+
+        self.assertEqual(len(check(result, max_ms=100)), 2)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,97 @@
+import unittest
+from unittest.mock import patch
+from PIL import Image
+import numpy as np
+import cv2
+import uuid
+import sys
+import os
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from services.bounds import BoundsCache, bounds_from_reduced, reduce_image
+from services.image_utils import ImageProcessor
+from services.pipeline import VirtualTryOnPipeline
+
+def make_person_image(width: int, height: int) -> Image.Image:
+    """Dark silhouette in the middle third of a light background with small clutter"""
+    rng = np.random.default_rng(0)
+    pixels = np.full((height, width, 3), 200, dtype=np.uint8)
+    side = max(2, width // 120)
+    for _ in range(300):
+        x, y = rng.integers(0, width - side), rng.integers(0, height - side)
+        pixels[y:y + side, x:x + side] = rng.integers(0, 255, 3)
+    box = (int(width * 0.35), int(height * 0.15), int(width * 0.65), int(height * 0.95))
+    center = ((box[0] + box[2]) // 2, (box[1] + box[3]) // 2)
+    axes = ((box[2] - box[0]) // 2, (box[3] - box[1]) // 2)
+    cv2.ellipse(pixels, center, axes, 0, 0, 360, (40, 60, 90), -1)
+    return Image.fromarray(pixels), box
+
+class TestProjectionBounds(unittest.TestCase):
+    def assertBoxClose(self, bounds, expected, tolerance):
+        for actual, target in zip(bounds, expected):
+            self.assertLessEqual(abs(actual - target), tolerance)
+
+    def test_finds_person_on_busy_background(self):
+        for width, height in ((256, 256), (1024, 768), (4000, 3000)):
+            image, box = make_person_image(width, height)
+
+            bounds = ImageProcessor.detect_person_bounds(image, engine="projection")
+
+            self.assertBoxClose(bounds, box, tolerance=0.05 * max(width, height))
+
+    def test_reduce_fits_max_side(self):
+        image = Image.new('P', (4000, 3000))
+
+        reduced = reduce_image(image, 256)
+
+        self.assertLessEqual(max(reduced.shape[:2]), 256)
+        self.assertEqual(reduced.shape[2], 3)
+
+    def test_plain_image_returns_full_frame(self):
+        image = Image.new('RGB', (800, 600), color='red')
+
+        reduced = reduce_image(image, 256)
+
+        self.assertEqual(bounds_from_reduced(reduced, image.size, 0.01), (0, 0, 800, 600))
+
+    def test_results_are_cached_per_image(self):
+        cache = BoundsCache()
+        image, _ = make_person_image(640, 480)
+
+        first = cache.bounds(image)
+        second = cache.bounds(image)
+        cache.bounds(image, image_hash="abc")
+        cache.bounds(image, image_hash="abc")
+
+        self.assertEqual(first, second)
+        self.assertEqual(cache.hits, 2)
+        self.assertEqual(cache.misses, 2)
+
+    def test_fallback_reuses_bounds_for_known_user_hash(self):
+        with patch('services.pipeline.GeminiClient'):
+            pipeline = VirtualTryOnPipeline(cache=None, cpu_pool=None, admission=None, breaker=None)
+        pipeline.gemini_client.process_virtual_tryon.side_effect = Exception("model unavailable")
+        user, _ = make_person_image(320, 480)
+        clothing = Image.new('RGB', (100, 100), color='red')
+        user_hash = uuid.uuid4().hex
+
+        with patch('services.bounds.reduce_image', wraps=reduce_image) as reduce:
+            for _ in range(2):
+                pipeline.generate_tryon_prepared(user, clothing, user_hash=user_hash, clothing_hash="clothing")
+
+        reduce.assert_called_once()
+
+    def test_unknown_engine_rejected(self):
+        with self.assertRaises(ValueError):
+            ImageProcessor.detect_person_bounds(Image.new('RGB', (10, 10)), engine="magic")
+
+    def test_contour_engine_still_available(self):
+        image, box = make_person_image(256, 256)
+
+        bounds = ImageProcessor.detect_person_bounds(image, engine="contour")
+
+        self.assertBoxClose(bounds, box, tolerance=5)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,79 @@
+import unittest
+from unittest.mock import patch
+from PIL import Image
+import tempfile
+import sys
+import os
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from services.cache import MemoryResultCache, DiskResultCache, create_cache, make_cache_key
+
+class TestMemoryResultCache(unittest.TestCase):
+    def setUp(self):
+        self.image = Image.new('RGB', (10, 10), color='red')
+
+    def test_hit_and_miss_counters(self):
+        cache = MemoryResultCache()
+
+        self.assertIsNone(cache.get("key"))
+        cache.set("key", self.image)
+        result = cache.get("key")
+
+        self.assertEqual(result.tobytes(), self.image.tobytes())
+        self.assertEqual(cache.stats()["hits"], 1)
+        self.assertEqual(cache.stats()["misses"], 1)
+
+    def test_lru_eviction_by_entries(self):
+        cache = MemoryResultCache(max_entries=2)
+
+        cache.set("a", self.image)
+        cache.set("b", self.image)
+        cache.get("a")
+        cache.set("c", self.image)
+
+        self.assertIsNotNone(cache.get("a"))
+        self.assertIsNone(cache.get("b"))
+        self.assertEqual(cache.evictions, 1)
+
+    def test_eviction_by_bytes(self):
+        cache = MemoryResultCache(max_bytes=10 * 10 * 3 * 2)
+
+        for key in ("a", "b", "c"):
+            cache.set(key, self.image)
+
+        self.assertEqual(len(cache), 2)
+        self.assertLessEqual(cache.current_bytes, cache.max_bytes)
+
+    def test_ttl_expiry(self):
+        cache = MemoryResultCache(ttl_seconds=10)
+
+        with patch('services.cache.time.monotonic', return_value=100.0):
+            cache.set("key", self.image)
+        with patch('services.cache.time.monotonic', return_value=111.0):
+            self.assertIsNone(cache.get("key"))
+
+class TestDiskResultCache(unittest.TestCase):
+    def test_survives_new_instance(self):
+        image = Image.new('RGB', (10, 10), color='blue')
+
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            DiskResultCache(tmp_dir).set("key", image)
+            result = DiskResultCache(tmp_dir).get("key")
+
+            self.assertIsNotNone(result)
+            self.assertEqual(result.tobytes(), image.tobytes())
+
+class TestCacheHelpers(unittest.TestCase):
+    def test_cache_key_depends_on_prompt(self):
+        key_a = make_cache_key("user", "cloth", "prompt a")
+        key_b = make_cache_key("user", "cloth", "prompt b")
+
+        self.assertNotEqual(key_a, key_b)
+        self.assertEqual(key_a, make_cache_key("user", "cloth", "prompt a"))
+
+    def test_create_cache_disabled(self):
+        self.assertIsNone(create_cache({"backend": None}))
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,128 @@
+import unittest
+from unittest.mock import patch
+from PIL import Image
+import numpy as np
+import tempfile
+import sys
+import os
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from services.catalog import GarmentCatalog
+from services.image_codec import EncodedImage
+from services.image_utils import ImageProcessor
+from services.pipeline import VirtualTryOnPipeline
+
+class TestGarmentCatalog(unittest.TestCase):
+    def setUp(self):
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.catalog = GarmentCatalog(self.tmpdir.name)
+        self.clothing = Image.new('RGB', (1600, 1200), color='white')
+        self.clothing.paste((200, 30, 30), (400, 300, 1200, 900))
+
+    def tearDown(self):
+        self.tmpdir.cleanup()
+
+    def test_ingest_stores_prepared_variants(self):
+        garment = self.catalog.ingest("SHIRT-1", self.clothing)
+        prepared = ImageProcessor.prepare_clothing_image(self.clothing)
+
+        self.assertEqual(garment.size, prepared.size)
+        self.assertEqual(garment.image_hash, ImageProcessor.compute_image_hash(prepared))
+        np.testing.assert_array_equal(garment.array, np.asarray(prepared))
+        self.assertIsInstance(garment.array, np.memmap)
+        self.assertIsInstance(garment.mask, np.memmap)
+        self.assertEqual(garment.mask.shape, prepared.size[::-1])
+        self.assertTrue(garment.mask.any())
+
+        encoded = garment.encoded
+        self.assertIsInstance(encoded, EncodedImage)
+        self.assertEqual(encoded.content_hash, garment.image_hash)
+        self.assertGreater(len(encoded), 0)
+
+    def test_ingest_file_above_upload_limit(self):
+        path = os.path.join(self.tmpdir.name, "studio.png")
+        Image.effect_noise((800, 600), 64).convert('RGB').save(path)
+        upload_limit_mb = os.path.getsize(path) / (2 * 1024 * 1024)
+
+        with patch.dict('services.image_utils.APP_CONFIG', max_file_size_mb=upload_limit_mb):
+            with self.assertRaises(ValueError):
+                ImageProcessor.load_image(path)
+            garment = self.catalog.ingest("STUDIO-1", path)
+
+        self.assertEqual(garment.size, (800, 600))
+
+    def test_get_reads_from_disk_in_a_new_catalog(self):
+        self.catalog.ingest("SHIRT-1", self.clothing)
+
+        garment = GarmentCatalog(self.tmpdir.name).get("SHIRT-1")
+
+        self.assertEqual(garment.image.size, garment.size)
+        self.assertEqual(ImageProcessor.compute_image_hash(garment.image), garment.image_hash)
+
+    def test_reingest_replaces_garment(self):
+        self.catalog.ingest("SHIRT-1", self.clothing)
+        garment = self.catalog.ingest("SHIRT-1", Image.new('RGB', (300, 300), color='blue'))
+
+        self.assertEqual(garment.size, (300, 300))
+        self.assertEqual(self.catalog.skus(), ["SHIRT-1"])
+
+    def test_unknown_and_invalid_skus(self):
+        with self.assertRaises(KeyError):
+            self.catalog.get("MISSING")
+        with self.assertRaises(ValueError):
+            self.catalog.ingest("../escape", self.clothing)
+        self.assertNotIn("MISSING", self.catalog)
+
+    def test_remove(self):
+        self.catalog.ingest("SHIRT-1", self.clothing)
+        self.assertIn("SHIRT-1", self.catalog)
+
+        self.catalog.remove("SHIRT-1")
+
+        self.assertNotIn("SHIRT-1", self.catalog)
+        self.assertEqual(self.catalog.skus(), [])
+
+class TestPipelineGarmentId(unittest.TestCase):
+    def setUp(self):
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.catalog = GarmentCatalog(self.tmpdir.name)
+        self.garment = self.catalog.ingest("SHIRT-1", Image.new('RGB', (400, 400), color='blue'))
+        with patch('services.pipeline.GeminiClient'):
+            self.pipeline = VirtualTryOnPipeline(cache=None, cpu_pool=None, catalog=self.catalog)
+        self.user = Image.new('RGB', (400, 600), color='red')
+
+    def tearDown(self):
+        self.tmpdir.cleanup()
+
+    def test_garment_id_skips_clothing_preprocessing(self):
+        result = Image.new('RGB', (100, 100), color='green')
+        self.pipeline.gemini_client.process_virtual_tryon.return_value = result
+
+        with patch.object(ImageProcessor, 'prepare_clothing_image') as prepare_clothing:
+            output = self.pipeline.generate_tryon(self.user, garment_id="SHIRT-1")
+
+        self.assertIs(output, result)
+        prepare_clothing.assert_not_called()
+        args = self.pipeline.gemini_client.process_virtual_tryon.call_args[0]
+        self.assertIs(args[1], self.garment.encoded)
+
+    def test_garment_fallback_uses_catalog_pixels(self):
+        self.pipeline.gemini_client.process_virtual_tryon.side_effect = Exception("API Error")
+
+        output = self.pipeline.generate_tryon(self.user, garment_id="SHIRT-1")
+
+        self.assertIsInstance(output, Image.Image)
+
+    def test_requires_exactly_one_garment_source(self):
+        with self.assertRaises(ValueError):
+            self.pipeline.generate_tryon(self.user)
+        with self.assertRaises(ValueError):
+            self.pipeline.generate_tryon(self.user, self.user, garment_id="SHIRT-1")
+
+    def test_unknown_garment_id(self):
+        with self.assertRaises(KeyError):
+            self.pipeline.generate_tryon(self.user, garment_id="MISSING")
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,182 @@
+import unittest
+from unittest.mock import Mock, patch
+from PIL import Image
+import json
+import threading
+import time
+import sys
+import os
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from services.compatibility import COMPATIBILITY_SCHEMA, CompatibilityCache, parse_compatibility
+from services.gemini_client import GeminiClient, GeminiResponseError
+from services.image_codec import EncodedImage
+from services.pipeline import VirtualTryOnPipeline
+from services.rate_limit import RateLimiter
+
+ANSWER = {
+    "analysis": "A relaxed cotton shirt that suits a casual look.",
+    "fit": "Slightly loose through the shoulders.",
+    "color": "Red contrasts well with the blue background.",
+    "style": "Casual.",
+    "occasion": "Weekend outings.",
+    "compatibility_score": 7.5,
+    "recommendations": ["Roll the sleeves", "Pair with dark denim"],
+}
+
+def json_response(data):
+    response = Mock()
+    response.text = json.dumps(data)
+    return response
+
+class TestParseCompatibility(unittest.TestCase):
+    def test_parses_model_answer(self):
+        result = parse_compatibility(ANSWER)
+
+        self.assertEqual(result["compatibility_score"], 7.5)
+        self.assertEqual(result["recommendations"], ANSWER["recommendations"])
+        self.assertEqual(result["fit"], ANSWER["fit"])
+        self.assertIsNone(result["error"])
+
+    def test_clamps_score_and_fills_missing_aspects(self):
+        result = parse_compatibility({"analysis": "ok", "compatibility_score": 14, "recommendations": []})
+
+        self.assertEqual(result["compatibility_score"], 10.0)
+        self.assertEqual(result["occasion"], "")
+
+    def test_rejects_missing_fields(self):
+        with self.assertRaises(ValueError):
+            parse_compatibility({"analysis": "ok", "recommendations": []})
+        with self.assertRaises(ValueError):
+            parse_compatibility({"compatibility_score": "high", "recommendations": []})
+        with self.assertRaises(ValueError):
+            parse_compatibility(["not", "an", "object"])
+
+class TestCompatibilityCache(unittest.TestCase):
+    def test_lru_returns_copies(self):
+        cache = CompatibilityCache(max_entries=1)
+        cache.set("a", parse_compatibility(ANSWER))
+
+        cache.get("a")["recommendations"].append("mutated")
+        self.assertEqual(cache.get("a")["recommendations"], ANSWER["recommendations"])
+
+        cache.set("b", parse_compatibility(ANSWER))
+        self.assertIsNone(cache.get("a"))
+        self.assertEqual(len(cache), 1)
+
+class TestStructuredResponse(unittest.TestCase):
+    def test_requests_json_with_schema(self):
+        model = Mock()
+        model.generate_content.return_value = json_response(ANSWER)
+        client = GeminiClient(model=model, rate_limiter=RateLimiter(), hedging=None)
+
+        data = client.generate_structured_response(
+            "prompt", [Image.new('RGB', (32, 32))], COMPATIBILITY_SCHEMA
+        )
+
+        self.assertEqual(data, ANSWER)
+        config = model.generate_content.call_args[1]["generation_config"]
+        self.assertEqual(config.response_mime_type, "application/json")
+        self.assertEqual(config.response_schema, COMPATIBILITY_SCHEMA)
+
+    def test_invalid_json_is_a_response_error(self):
+        model = Mock()
+        model.generate_content.return_value = Mock(text="Great match!")
+        client = GeminiClient(model=model, rate_limiter=RateLimiter(), hedging=None)
+
+        with self.assertRaises(GeminiResponseError):
+            client.generate_structured_response("prompt", [Image.new('RGB', (32, 32))], COMPATIBILITY_SCHEMA)
+
+class TestPipelineCompatibility(unittest.TestCase):
+    def setUp(self):
+        self.tryon_model = Mock()
+        self.analysis_model = Mock()
+        self.analysis_model.generate_content.return_value = json_response(ANSWER)
+        client = GeminiClient(model=self.tryon_model, rate_limiter=RateLimiter(), hedging=None)
+        analysis_client = GeminiClient(
+            model=self.analysis_model, rate_limiter=RateLimiter(), encoder=client.encoder, hedging=None
+        )
+        self.pipeline = VirtualTryOnPipeline(
+            cache=None, gemini_client=client, cpu_pool=None, analysis_client=analysis_client,
+            admission=None, breaker=None
+        )
+        self.user = Image.new('RGB', (400, 600), color='blue')
+        self.clothing = Image.new('RGB', (300, 300), color='red')
+
+    def test_returns_model_answer(self):
+        result = self.pipeline.analyze_compatibility(self.user, self.clothing)
+
+        self.assertEqual(result["compatibility_score"], 7.5)
+        self.assertEqual(result["recommendations"], ANSWER["recommendations"])
+        self.assertIn("analysis", result)
+
+    def test_cached_by_image_pair(self):
+        self.pipeline.analyze_compatibility(self.user, self.clothing)
+        self.pipeline.analyze_compatibility(self.user.copy(), self.clothing.copy())
+
+        self.assertEqual(self.analysis_model.generate_content.call_count, 1)
+
+        self.pipeline.analyze_compatibility(self.user, Image.new('RGB', (300, 300), color='green'))
+        self.assertEqual(self.analysis_model.generate_content.call_count, 2)
+
+    def test_errors_are_reported_and_not_cached(self):
+        self.analysis_model.generate_content.return_value = Mock(text="not json")
+
+        result = self.pipeline.analyze_compatibility(self.user, self.clothing)
+
+        self.assertEqual(result["compatibility_score"], 5.0)
+        self.assertIsNotNone(result["error"])
+        self.assertEqual(len(self.pipeline.analysis_cache), 0)
+
+    def test_runs_concurrently_with_tryon_sharing_uploads(self):
+        generated = Image.new('RGB', (64, 64), color='green')
+        both_started = threading.Barrier(2, timeout=2)
+
+        def analysis_call(content, **kwargs):
+            both_started.wait()
+            return json_response(ANSWER)
+
+        def tryon_call(user, clothing, prompt, **kwargs):
+            both_started.wait()
+            self.tryon_inputs = (user, clothing)
+            return generated
+
+        self.analysis_model.generate_content.side_effect = analysis_call
+        encoder = self.pipeline.gemini_client.encoder
+
+        with patch.object(self.pipeline.gemini_client, 'process_virtual_tryon', side_effect=tryon_call):
+            result = self.pipeline.generate_tryon_with_analysis(self.user, self.clothing)
+
+        self.assertIs(result["image"], generated)
+        self.assertFalse(result["fallback"])
+        self.assertEqual(result["analysis"]["compatibility_score"], 7.5)
+        # Each image was encoded once and the same bytes went to both calls
+        self.assertEqual(encoder.encodes, 2)
+        self.assertTrue(all(isinstance(image, EncodedImage) for image in self.tryon_inputs))
+        content = self.analysis_model.generate_content.call_args[0][0]
+        self.assertEqual(content[1], self.tryon_inputs[0].to_part())
+
+    def test_concurrent_requests_share_one_analysis(self):
+        def slow_call(content, **kwargs):
+            time.sleep(0.1)
+            return json_response(ANSWER)
+
+        self.analysis_model.generate_content.side_effect = slow_call
+        results = []
+        threads = [
+            threading.Thread(target=lambda: results.append(
+                self.pipeline.analyze_compatibility(self.user, self.clothing)
+            ))
+            for _ in range(3)
+        ]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual(self.analysis_model.generate_content.call_count, 1)
+        self.assertEqual([r["compatibility_score"] for r in results], [7.5] * 3)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,92 @@
+import unittest
+from PIL import Image
+import numpy as np
+import cv2
+import sys
+import os
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from services.compositing import STRIPE_ROWS, blend_into, color_key_mask, composite_roi
+from services.image_utils import ImageProcessor
+
+def random_pixels(height: int, width: int, seed: int = 0) -> np.ndarray:
+    return np.random.default_rng(seed).integers(0, 256, (height, width, 3), dtype=np.uint8)
+
+class TestColorKeyMask(unittest.TestCase):
+    def test_matches_inrange_then_invert(self):
+        pixels = random_pixels(50, 60)
+        pixels[10:20, 10:20] = (250, 240, 255)
+
+        expected = cv2.bitwise_not(cv2.inRange(pixels, np.array([235] * 3), np.array([275] * 3)))
+
+        np.testing.assert_array_equal(color_key_mask(pixels), expected)
+        self.assertTrue((color_key_mask(pixels)[10:20, 10:20] == 0).all())
+
+    def test_bounds_are_clipped(self):
+        pixels = np.zeros((4, 4, 3), dtype=np.uint8)
+
+        self.assertTrue((color_key_mask(pixels, (0, 0, 0)) == 0).all())
+
+class TestBlendInto(unittest.TestCase):
+    def test_alpha_blend_matches_float(self):
+        base = random_pixels(STRIPE_ROWS + 37, 40, seed=1)
+        overlay = random_pixels(STRIPE_ROWS + 37, 40, seed=2)
+        expected = base * 0.7 + overlay * 0.3
+
+        result = blend_into(base.copy(), overlay, 0.3)
+
+        self.assertLessEqual(np.abs(result - expected).max(), 1.0)
+
+    def test_mask_weights_alpha(self):
+        base = np.full((2, 2, 3), 100, dtype=np.uint8)
+        overlay = np.full((2, 2, 3), 200, dtype=np.uint8)
+        mask = np.array([[0, 255], [128, 255]], dtype=np.uint8)
+
+        result = blend_into(base, overlay, 1.0, mask)
+
+        self.assertEqual(result[0, 0, 0], 100)
+        self.assertEqual(result[0, 1, 0], 200)
+        self.assertIn(result[1, 0, 0], (150, 151))
+
+class TestCompositeRoi(unittest.TestCase):
+    def test_only_box_is_blended(self):
+        base = Image.fromarray(random_pixels(120, 100, seed=3))
+        overlay = Image.new('RGB', (30, 30), color='blue')
+        box = (20, 30, 60, 90)
+
+        result = np.asarray(composite_roi(base, overlay, box, alpha=1.0))
+        original = np.asarray(base)
+
+        self.assertTrue((result[box[1]:box[3], box[0]:box[2]] == [0, 0, 255]).all())
+        outside = np.ones(original.shape[:2], dtype=bool)
+        outside[box[1]:box[3], box[0]:box[2]] = False
+        np.testing.assert_array_equal(result[outside], original[outside])
+
+    def test_base_is_not_modified(self):
+        base = Image.new('RGB', (20, 20), color='red')
+
+        composite_roi(base, Image.new('RGB', (5, 5), color='blue'), alpha=0.5)
+
+        self.assertEqual(base.getpixel((10, 10)), (255, 0, 0))
+
+    def test_empty_box_returns_copy(self):
+        base = Image.new('RGB', (20, 20), color='red')
+
+        result = composite_roi(base, Image.new('RGB', (5, 5)), (30, 30, 40, 40))
+
+        self.assertEqual(result.tobytes(), base.tobytes())
+
+    def test_fallback_blends_inside_person_box(self):
+        user = Image.new('RGB', (200, 200), color=(200, 200, 200))
+        user.paste((40, 60, 90), (60, 20, 140, 190))
+        clothing = Image.new('RGB', (50, 50), color='blue')
+
+        result = ImageProcessor.create_fallback_image(user, clothing)
+
+        self.assertEqual(result.size, user.size)
+        self.assertEqual(result.getpixel((5, 5)), (200, 200, 200))
+        self.assertNotEqual(result.getpixel((100, 100)), (40, 60, 90))
+
+if __name__ == '__main__':
+    unittest.main()
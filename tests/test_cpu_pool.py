@@ -0,0 +1,85 @@
+import unittest
+from unittest.mock import patch
+from PIL import Image
+import numpy as np
+import io
+import sys
+import os
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from services.cpu_pool import CPUPool
+from services.image_utils import ImageProcessor
+from services.pipeline import VirtualTryOnPipeline
+from tests.test_preprocess import make_test_image
+
+class TestCPUPool(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.pool = CPUPool(max_workers=2)
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.pool.shutdown()
+
+    def test_prepare_matches_in_process(self):
+        user = make_test_image(1600, 1200)
+        clothing = make_test_image(300, 500)
+
+        for engine in ("numpy", "pil"):
+            pooled = self.pool.prepare_for_tryon(user, clothing, engine)
+            local = ImageProcessor.prepare_for_tryon(user, clothing, engine)
+            for result, expected in zip(pooled, local):
+                self.assertEqual(result.size, expected.size)
+                np.testing.assert_array_equal(np.asarray(result), np.asarray(expected))
+
+    def test_fit_user_image_matches_in_process(self):
+        user = make_test_image(1600, 1200)
+
+        for engine in ("numpy", "pil"):
+            pooled = self.pool.fit_user_image(user, engine)
+            local = ImageProcessor.fit_user_image(user, engine)
+            np.testing.assert_array_equal(np.asarray(pooled), np.asarray(local))
+
+    def test_exif_orientation_applied(self):
+        exif = Image.Exif()
+        exif[0x0112] = 6
+        buf = io.BytesIO()
+        make_test_image(400, 200).save(buf, format='JPEG', exif=exif)
+        buf.seek(0)
+
+        result = self.pool.prepare_user_image(Image.open(buf))
+
+        self.assertEqual(result.size, (200, 400))
+
+    def test_fallback_matches_in_process(self):
+        user = make_test_image(200, 300)
+        clothing = make_test_image(100, 100).convert('RGBA')
+
+        result = self.pool.create_fallback_image(user, clothing)
+        expected = ImageProcessor.create_fallback_image(user, clothing.convert('RGB'))
+
+        np.testing.assert_array_equal(np.asarray(result), np.asarray(expected))
+
+    def test_shared_memory_is_unlinked(self):
+        if not os.path.isdir("/dev/shm"):
+            self.skipTest("no /dev/shm")
+        before = set(os.listdir("/dev/shm"))
+
+        self.pool.prepare_for_tryon(make_test_image(64, 64), make_test_image(64, 64))
+        self.pool.create_fallback_image(make_test_image(64, 64), make_test_image(32, 32))
+
+        self.assertEqual(set(os.listdir("/dev/shm")) - before, set())
+
+    def test_pipeline_routes_cpu_stages_to_pool(self):
+        with patch('services.pipeline.GeminiClient'):
+            pipeline = VirtualTryOnPipeline(cache=None, cpu_pool=self.pool)
+
+        with patch.object(self.pool, 'create_fallback_image', return_value="pooled") as fallback:
+            result = pipeline._create_fallback_image(make_test_image(10, 10), make_test_image(10, 10))
+
+        self.assertEqual(result, "pooled")
+        fallback.assert_called_once()
+
+if __name__ == '__main__':
+    unittest.main()
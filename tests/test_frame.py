@@ -0,0 +1,121 @@
+import unittest
+from unittest.mock import patch
+from PIL import Image, ImageOps
+import numpy as np
+import tracemalloc
+import sys
+import os
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from services.frame import EXIF_ORIENTATION_TAG, BufferPool, Frame, get_buffer_pool, read_pixels
+from services.image_utils import ImageProcessor
+from services.pipeline import VirtualTryOnPipeline
+from services.preprocess import FusedPreprocessor
+
+def make_test_image(width: int, height: int, seed: int = 0) -> Image.Image:
+    rng = np.random.default_rng(seed)
+    return Image.fromarray(rng.integers(0, 255, (height, width, 3), dtype=np.uint8))
+
+def with_orientation(image: Image.Image, orientation: int) -> Image.Image:
+    image.getexif()[EXIF_ORIENTATION_TAG] = orientation
+    return image
+
+class TestBufferPool(unittest.TestCase):
+    def test_released_buffers_are_reused_by_shape(self):
+        pool = BufferPool(max_bytes=1024 * 1024)
+        buffer = pool.acquire((8, 8, 3))
+        pool.release(buffer)
+
+        self.assertIs(pool.acquire((8, 8, 3)), buffer)
+        self.assertIsNot(pool.acquire((8, 8, 3)), buffer)
+        self.assertEqual(pool.stats()["reuses"], 1)
+        self.assertEqual(pool.stats()["allocations"], 2)
+
+    def test_oldest_buffers_dropped_over_budget(self):
+        pool = BufferPool(max_bytes=2 * 300)
+        first, second, third = (pool.acquire((10, 10, 3)) for _ in range(3))
+        for buffer in (first, second, third):
+            pool.release(buffer)
+
+        self.assertEqual(pool.stats()["free_buffers"], 2)
+        self.assertIsNot(pool.acquire((10, 10, 3)), first)
+
+class TestFrame(unittest.TestCase):
+    def setUp(self):
+        self.pool = BufferPool()
+
+    def test_read_pixels_converts_per_stripe(self):
+        image = make_test_image(40, 30).convert('RGBA')
+        out = np.empty((30, 40, 3), dtype=np.uint8)
+
+        read_pixels(image, out, rows=7)
+
+        np.testing.assert_array_equal(out, np.asarray(image.convert('RGB')))
+
+    def test_orientation_applied_once_after_resize(self):
+        image = with_orientation(make_test_image(300, 200), 6)
+
+        with Frame.from_image(image, (100, 100), self.pool).fit((100, 100)) as frame:
+            self.assertEqual(frame.orientation, 1)
+            self.assertEqual(frame.size, ImageProcessor.fit_image(ImageOps.exif_transpose(image), (100, 100)).size)
+
+    def test_hash_matches_compute_image_hash(self):
+        image = with_orientation(make_test_image(90, 600), 8)
+
+        with Frame.from_image(image, pool=self.pool) as frame:
+            digest = frame.hash()
+
+        self.assertEqual(digest, ImageProcessor.compute_image_hash(ImageOps.exif_transpose(image)))
+
+    def test_buffers_return_to_pool(self):
+        image = make_test_image(400, 300)
+
+        Frame.from_image(image, (100, 100), self.pool).fit((100, 100)).to_image()
+        Frame.from_image(image, (100, 100), self.pool).fit((100, 100)).to_image()
+
+        self.assertGreater(self.pool.stats()["reuses"], 0)
+
+    def test_upright_inputs_are_not_copied(self):
+        image = make_test_image(200, 100)
+
+        self.assertIs(ImageProcessor.normalize_image(image), image)
+        self.assertIs(FusedPreprocessor(pool=self.pool).prepare_clothing_image(image, (256, 256)), image)
+        self.assertIs(ImageProcessor.prepare_preview_image(image, (256, 256), "pil"), image)
+
+class TestRequestMemory(unittest.TestCase):
+    # Peak bytes allocated through Python and NumPy by one fused-engine try-on
+    # request (preprocess, hash and the fallback render) on a 12MP photo and a 4MP
+    # garment, above what was held before it. The first request fills the
+    # buffer pool; later ones reuse it. tracemalloc does not see PIL's own
+    # pixel storage, so this bounds the NumPy buffers and bytes copies only.
+    COLD_BUDGET_BYTES = 48 * 1024 * 1024
+    WARM_BUDGET_BYTES = 16 * 1024 * 1024
+
+    @patch.dict('services.image_utils.IMAGE_CONFIG', {"preprocess_engine": "numpy"})
+    def test_peak_bytes_per_request_within_budget(self):
+        with patch('services.pipeline.GeminiClient'):
+            pipeline = VirtualTryOnPipeline(cache=None, cpu_pool=None, admission=None, breaker=None)
+        pipeline.gemini_client.process_virtual_tryon.side_effect = Exception("model unavailable")
+        user = make_test_image(3000, 4000, seed=1)
+        clothing = make_test_image(2000, 2000, seed=2)
+        get_buffer_pool().clear()
+
+        tracemalloc.start()
+        try:
+            peaks = []
+            for _ in range(3):
+                held, _ = tracemalloc.get_traced_memory()
+                tracemalloc.reset_peak()
+                result = pipeline.generate_tryon(user, clothing)
+                peaks.append(tracemalloc.get_traced_memory()[1] - held)
+        finally:
+            tracemalloc.stop()
+
+        self.assertEqual(result.size, (768, 1024))
+        self.assertLess(peaks[0], self.COLD_BUDGET_BYTES)
+        for peak in peaks[1:]:
+            self.assertLess(peak, self.WARM_BUDGET_BYTES)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,258 @@
+import unittest
+from unittest.mock import Mock, AsyncMock, patch
+from PIL import Image
+import asyncio
+import threading
+import time
+import io
+import sys
+import os
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from services.gemini_client import (
+    AsyncGeminiClient,
+    GeminiClient,
+    GeminiError,
+    GeminiQuotaError,
+    GeminiResponseError,
+    GeminiRetryableError,
+    GeminiTimeoutError,
+    classify_error
+)
+from services.image_codec import MIME_TYPES, EncodedImage
+from services.progress import ProgressTracker
+from services.rate_limit import RateLimiter, RateLimitExceeded
+
+def make_image_response(image: Image.Image):
+    buf = io.BytesIO()
+    image.save(buf, format='PNG')
+    part = Mock()
+    part.inline_data.data = buf.getvalue()
+    response = Mock()
+    response.candidates = [Mock()]
+    response.candidates[0].content.parts = [part]
+    return response
+
+class UpstreamError(Exception):
+    def __init__(self, code):
+        super().__init__(f"upstream error {code}")
+        self.code = code
+
+class TestGeminiClient(unittest.TestCase):
+    def setUp(self):
+        self.model = Mock()
+        self.client = GeminiClient(model=self.model, rate_limiter=RateLimiter())
+        self.user_image = Image.new('RGB', (64, 64), color='blue')
+        self.clothing_image = Image.new('RGB', (32, 32), color='red')
+
+    def test_classify_error(self):
+        self.assertIsInstance(classify_error(UpstreamError(429)), GeminiRetryableError)
+        self.assertIsInstance(classify_error(UpstreamError(504)), GeminiTimeoutError)
+        self.assertNotIsInstance(classify_error(UpstreamError(400)), GeminiRetryableError)
+        self.assertIsInstance(classify_error(TimeoutError()), GeminiTimeoutError)
+        self.assertIsInstance(classify_error(RateLimitExceeded()), GeminiQuotaError)
+        self.assertFalse(classify_error(RateLimitExceeded()).retryable)
+
+    @patch('services.gemini_client.time.sleep')
+    def test_retries_transient_errors(self, mock_sleep):
+        self.model.generate_content.side_effect = [
+            UpstreamError(429),
+            UpstreamError(503),
+            make_image_response(Image.new('RGB', (16, 16), color='green'))
+        ]
+
+        result = self.client.process_virtual_tryon(self.user_image, self.clothing_image, "prompt")
+
+        self.assertEqual(result.size, (16, 16))
+        self.assertEqual(self.model.generate_content.call_count, 3)
+        self.assertEqual(mock_sleep.call_count, 2)
+
+    @patch('services.gemini_client.time.sleep')
+    def test_gives_up_after_max_retries(self, mock_sleep):
+        self.client.max_retries = 2
+        self.model.generate_content.side_effect = UpstreamError(503)
+
+        with self.assertRaises(GeminiRetryableError):
+            self.client.process_virtual_tryon(self.user_image, self.clothing_image, "prompt")
+
+        self.assertEqual(self.model.generate_content.call_count, 3)
+
+    def test_does_not_retry_permanent_errors(self):
+        self.model.generate_content.side_effect = UpstreamError(400)
+
+        with self.assertRaises(GeminiError) as ctx:
+            self.client.process_virtual_tryon(self.user_image, self.clothing_image, "prompt")
+
+        self.assertFalse(ctx.exception.retryable)
+        self.model.generate_content.assert_called_once()
+
+    def test_local_quota_wait_is_not_retried(self):
+        limiter = RateLimiter(max_in_flight=1)
+        client = GeminiClient(model=self.model, rate_limiter=limiter, hedging=None)
+
+        with limiter.acquire():
+            with self.assertRaises(GeminiQuotaError):
+                client._generate_with_retry(["prompt"], deadline_at=time.monotonic() + 0.05)
+
+        self.model.generate_content.assert_not_called()
+
+    def test_response_without_image(self):
+        response = make_image_response(self.user_image)
+        response.candidates[0].content.parts[0].inline_data = None
+        self.model.generate_content.return_value = response
+
+        with self.assertRaises(GeminiResponseError):
+            self.client.process_virtual_tryon(self.user_image, self.clothing_image, "prompt")
+
+    def test_passes_request_timeout(self):
+        self.model.generate_content.return_value = make_image_response(self.user_image)
+
+        self.client.process_virtual_tryon(self.user_image, self.clothing_image, "prompt")
+
+        _, kwargs = self.model.generate_content.call_args
+        self.assertIsNotNone(kwargs["request_options"]["timeout"])
+
+    def test_identical_concurrent_requests_are_coalesced(self):
+        self.client.coalesce_requests = True
+        release = threading.Event()
+
+        def slow_generate(*args, **kwargs):
+            release.wait(timeout=5)
+            return make_image_response(Image.new('RGB', (16, 16), color='green'))
+
+        self.model.generate_content.side_effect = slow_generate
+        results = []
+
+        def run():
+            results.append(self.client.process_virtual_tryon(
+                self.user_image, self.clothing_image, "prompt"
+            ))
+
+        threads = [threading.Thread(target=run) for _ in range(3)]
+        for thread in threads:
+            thread.start()
+        # Give followers time to join the leader's in-flight call
+        threading.Event().wait(0.2)
+        release.set()
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual(len(results), 3)
+        self.model.generate_content.assert_called_once()
+
+    def test_coalesced_follower_gives_up_at_its_own_deadline(self):
+        self.client.coalesce_requests = True
+        release = threading.Event()
+        model_started = threading.Event()
+
+        def slow_generate(*args, **kwargs):
+            model_started.set()
+            release.wait(timeout=5)
+            return make_image_response(Image.new('RGB', (16, 16), color='green'))
+
+        self.model.generate_content.side_effect = slow_generate
+        results = []
+        leader = threading.Thread(target=lambda: results.append(self.client.process_virtual_tryon(
+            self.user_image, self.clothing_image, "prompt", deadline_at=time.monotonic() + 10
+        )))
+        leader.start()
+        model_started.wait(timeout=5)
+
+        events = []
+        started_at = time.monotonic()
+        with self.assertRaises(GeminiTimeoutError):
+            self.client.process_virtual_tryon(
+                self.user_image, self.clothing_image, "prompt",
+                progress=ProgressTracker(events.append),
+                deadline_at=time.monotonic() + 0.1
+            )
+        waited = time.monotonic() - started_at
+        release.set()
+        leader.join()
+
+        self.assertLess(waited, 2)
+        self.assertEqual(len(results), 1)
+        self.model.generate_content.assert_called_once()
+        # The follower was shown the leader's model stage while it waited
+        self.assertEqual([(e["stage"], e["status"]) for e in events], [("model", "started")])
+
+    def test_coalesced_follower_sees_leader_stages(self):
+        self.client.coalesce_requests = True
+        release = threading.Event()
+        model_started = threading.Event()
+
+        def slow_generate(*args, **kwargs):
+            model_started.set()
+            release.wait(timeout=5)
+            return make_image_response(Image.new('RGB', (16, 16), color='green'))
+
+        self.model.generate_content.side_effect = slow_generate
+        leader = threading.Thread(target=lambda: self.client.process_virtual_tryon(
+            self.user_image, self.clothing_image, "prompt"
+        ))
+        leader.start()
+        model_started.wait(timeout=5)
+
+        tracker = ProgressTracker()
+        follower = threading.Thread(target=lambda: self.client.process_virtual_tryon(
+            self.user_image, self.clothing_image, "prompt", progress=tracker
+        ))
+        follower.start()
+        threading.Event().wait(0.1)
+        release.set()
+        leader.join()
+        follower.join()
+
+        self.model.generate_content.assert_called_once()
+        self.assertEqual(set(tracker.timings), {"model", "decode_result"})
+
+    def test_images_uploaded_as_encoded_blobs(self):
+        self.model.generate_content.return_value = make_image_response(self.user_image)
+
+        self.client.process_virtual_tryon(self.user_image, self.clothing_image, "prompt")
+
+        content = self.model.generate_content.call_args[0][0]
+        self.assertEqual(content[0], "prompt")
+        for part in content[1:]:
+            self.assertEqual(part["mime_type"], MIME_TYPES[self.client.encoder.format])
+            self.assertIsInstance(part["data"], bytes)
+
+    def test_reports_client_stages(self):
+        self.model.generate_content.return_value = make_image_response(self.user_image)
+        tracker = ProgressTracker()
+
+        self.client.process_virtual_tryon(
+            self.user_image, self.clothing_image, "prompt", progress=tracker
+        )
+
+        self.assertEqual(set(tracker.timings), {"encode", "model", "decode_result"})
+
+    def test_pre_encoded_image_passes_through(self):
+        self.model.generate_content.return_value = make_image_response(self.user_image)
+        encoded = EncodedImage(b"jpeg-bytes", "JPEG")
+
+        self.client.process_virtual_tryon(self.user_image, encoded, "prompt")
+
+        content = self.model.generate_content.call_args[0][0]
+        self.assertEqual(content[2], {"mime_type": "image/jpeg", "data": b"jpeg-bytes"})
+
+class TestAsyncGeminiClient(unittest.TestCase):
+    def test_async_retry_then_success(self):
+        model = Mock()
+        model.generate_content_async = AsyncMock(side_effect=[
+            UpstreamError(429),
+            make_image_response(Image.new('RGB', (16, 16), color='green'))
+        ])
+        client = AsyncGeminiClient(model=model, rate_limiter=RateLimiter())
+        client.backoff_base = 0
+
+        result = asyncio.run(client.process_virtual_tryon(
+            Image.new('RGB', (64, 64)), Image.new('RGB', (32, 32)), "prompt"
+        ))
+
+        self.assertEqual(result.size, (16, 16))
+        self.assertEqual(model.generate_content_async.await_count, 2)
+
+if __name__ == '__main__':
+    unittest.main()
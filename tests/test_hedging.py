@@ -0,0 +1,174 @@
+import unittest
+from unittest.mock import Mock
+import asyncio
+import threading
+import time
+import sys
+import os
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from services.gemini_client import AsyncGeminiClient, GeminiClient, GeminiRetryableError
+from services.hedging import HedgingPolicy, RollingHistogram
+from services.rate_limit import RateLimiter
+
+def warmed_policy(budget=1.0, latency=0.02):
+    policy = HedgingPolicy(percentile=95, budget=budget, min_samples=5, min_delay=0.01, window=50)
+    for _ in range(10):
+        policy.record(latency)
+    return policy
+
+class TestRollingHistogram(unittest.TestCase):
+    def test_percentile_within_bucket_resolution(self):
+        histogram = RollingHistogram(window=100)
+        for i in range(1, 101):
+            histogram.observe(i / 100)
+
+        self.assertAlmostEqual(histogram.percentile(50), 0.5, delta=0.05)
+        self.assertAlmostEqual(histogram.percentile(95), 0.95, delta=0.1)
+        self.assertIsNone(RollingHistogram().percentile(50))
+
+    def test_old_samples_roll_out(self):
+        histogram = RollingHistogram(window=10)
+        for _ in range(10):
+            histogram.observe(5.0)
+        for _ in range(10):
+            histogram.observe(0.1)
+
+        self.assertEqual(len(histogram), 10)
+        self.assertLess(histogram.percentile(99), 0.2)
+
+class TestHedgingPolicy(unittest.TestCase):
+    def test_no_hedging_until_enough_samples(self):
+        policy = HedgingPolicy(percentile=95, budget=1.0, min_samples=3, min_delay=0.0, window=10)
+        policy.record(0.5)
+
+        self.assertIsNone(policy.start_request())
+
+        policy.record(0.5)
+        policy.record(0.5)
+        self.assertAlmostEqual(policy.start_request(), 0.5, delta=0.05)
+
+    def test_min_delay_floor(self):
+        policy = HedgingPolicy(percentile=95, budget=1.0, min_samples=1, min_delay=2.0, window=10)
+        policy.record(0.1)
+
+        self.assertEqual(policy.start_request(), 2.0)
+
+    def test_budget_caps_hedge_fraction(self):
+        policy = warmed_policy(budget=0.1)
+
+        hedged = 0
+        for _ in range(100):
+            policy.start_request()
+            hedged += policy.try_hedge()
+
+        self.assertEqual(hedged, 10)
+        self.assertEqual(policy.stats()["hedges"], 10)
+
+class TestHedgedClient(unittest.TestCase):
+    def test_hedge_answers_when_primary_is_slow(self):
+        release = threading.Event()
+        fast, slow = Mock(name="fast"), Mock(name="slow")
+        calls = []
+
+        def generate_content(content, **kwargs):
+            calls.append(time.monotonic())
+            if len(calls) == 1:
+                release.wait(2)
+                return slow
+            return fast
+
+        model = Mock()
+        model.generate_content.side_effect = generate_content
+        policy = warmed_policy()
+        client = GeminiClient(model=model, rate_limiter=RateLimiter(), hedging=policy)
+
+        start = time.monotonic()
+        response = client._generate_with_retry(["prompt"])
+        release.set()
+
+        self.assertIs(response, fast)
+        self.assertLess(time.monotonic() - start, 1.0)
+        self.assertEqual(policy.hedges, 1)
+
+    def test_exhausted_budget_waits_for_primary(self):
+        response = Mock()
+
+        def generate_content(content, **kwargs):
+            time.sleep(0.1)
+            return response
+
+        model = Mock()
+        model.generate_content.side_effect = generate_content
+        policy = warmed_policy(budget=0.0)
+        client = GeminiClient(model=model, rate_limiter=RateLimiter(), hedging=policy)
+
+        self.assertIs(client._generate_with_retry(["prompt"]), response)
+        self.assertEqual(model.generate_content.call_count, 1)
+        self.assertEqual(policy.hedges, 0)
+
+    def test_failed_primary_falls_through_to_hedge(self):
+        response = Mock()
+        calls = []
+
+        def generate_content(content, **kwargs):
+            calls.append(1)
+            if len(calls) == 1:
+                time.sleep(0.2)
+                raise ValueError("bad request")
+            return response
+
+        model = Mock()
+        model.generate_content.side_effect = generate_content
+        client = GeminiClient(model=model, rate_limiter=RateLimiter(), hedging=warmed_policy())
+
+        self.assertIs(client._generate_with_retry(["prompt"]), response)
+
+    def test_hedging_disabled(self):
+        model = Mock()
+        client = GeminiClient(model=model, rate_limiter=RateLimiter(), hedging=None)
+
+        client._generate_with_retry(["prompt"])
+
+        self.assertEqual(model.generate_content.call_count, 1)
+
+    def test_async_hedge_cancels_slow_primary(self):
+        fast = Mock(name="fast")
+        cancelled = []
+
+        async def generate_content_async(content, **kwargs):
+            if not cancelled:
+                cancelled.append(False)
+                try:
+                    await asyncio.sleep(2)
+                except asyncio.CancelledError:
+                    cancelled[0] = True
+                    raise
+            return fast
+
+        model = Mock()
+        model.generate_content_async = generate_content_async
+        policy = warmed_policy()
+        client = AsyncGeminiClient(model=model, rate_limiter=RateLimiter(), hedging=policy)
+
+        response = asyncio.run(client._generate_with_retry(["prompt"]))
+
+        self.assertIs(response, fast)
+        self.assertEqual(cancelled, [True])
+        self.assertEqual(policy.hedges, 1)
+
+    def test_async_all_attempts_failing_raises(self):
+        async def generate_content_async(content, **kwargs):
+            raise ValueError("bad request")
+
+        model = Mock()
+        model.generate_content_async = generate_content_async
+        client = AsyncGeminiClient(model=model, rate_limiter=RateLimiter(), hedging=warmed_policy())
+
+        with self.assertRaises(Exception) as context:
+            asyncio.run(client._generate_with_retry(["prompt"]))
+        self.assertNotIsInstance(context.exception, GeminiRetryableError)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,134 @@
+import unittest
+from unittest.mock import patch
+from PIL import Image
+import numpy as np
+import io
+import base64
+import sys
+import os
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from services.image_codec import ImageEncoder, decode_image_payload, sniff_image_format
+
+def make_noisy_image(width: int, height: int) -> Image.Image:
+    pixels = np.random.default_rng(0).integers(0, 255, (height, width, 3), dtype=np.uint8)
+    return Image.fromarray(pixels)
+
+class TestImageEncoder(unittest.TestCase):
+    def test_jpeg_part(self):
+        encoder = ImageEncoder(format="JPEG", quality=90, max_bytes=None)
+
+        encoded = encoder.encode(Image.new('RGB', (64, 64), color='red'))
+        part = encoded.to_part()
+
+        self.assertEqual(part["mime_type"], "image/jpeg")
+        self.assertEqual(Image.open(io.BytesIO(part["data"])).format, "JPEG")
+
+    def test_rgba_converted_for_jpeg(self):
+        encoder = ImageEncoder(format="JPEG", max_bytes=None)
+
+        encoded = encoder.encode(Image.new('RGBA', (32, 32), color='blue'))
+
+        self.assertEqual(Image.open(io.BytesIO(encoded.data)).mode, 'RGB')
+
+    def test_adaptive_quality_fits_budget(self):
+        image = make_noisy_image(256, 256)
+        unconstrained = ImageEncoder(format="JPEG", quality=95, max_bytes=None).encode(image)
+        budget = len(unconstrained) // 2
+
+        encoded = ImageEncoder(format="JPEG", quality=95, max_bytes=budget).encode(image)
+
+        self.assertLessEqual(len(encoded), budget)
+        self.assertLess(encoded.quality, 95)
+
+    def test_shared_image_encoded_once(self):
+        encoder = ImageEncoder(format="WEBP", quality=80, max_bytes=None)
+        image = Image.new('RGB', (64, 64), color='green')
+
+        first = encoder.encode(image)
+        second = encoder.encode(image.copy())
+
+        self.assertIs(first, second)
+        self.assertEqual(encoder.stats()["encodes"], 1)
+        self.assertEqual(encoder.stats()["cache_hits"], 1)
+
+    def test_png_is_lossless(self):
+        image = make_noisy_image(32, 32)
+
+        encoded = ImageEncoder(format="PNG").encode(image)
+
+        self.assertIsNone(encoded.quality)
+        self.assertEqual(Image.open(io.BytesIO(encoded.data)).tobytes(), image.tobytes())
+
+    def test_unsupported_format(self):
+        with self.assertRaises(ValueError):
+            ImageEncoder(format="BMP")
+
+class TestDecodeImagePayload(unittest.TestCase):
+    def setUp(self):
+        self.image = make_noisy_image(32, 24)
+        buf = io.BytesIO()
+        self.image.save(buf, format='PNG')
+        self.png_bytes = buf.getvalue()
+
+    def test_raw_bytes(self):
+        self.assertEqual(sniff_image_format(self.png_bytes), "PNG")
+
+        decoded = decode_image_payload(self.png_bytes)
+
+        self.assertEqual(decoded.tobytes(), self.image.tobytes())
+        self.assertIsNone(decoded.fp)
+
+    def test_base64_payload(self):
+        decoded = decode_image_payload(base64.b64encode(self.png_bytes))
+
+        self.assertEqual(decoded.tobytes(), self.image.tobytes())
+
+    def test_base64_string_payload(self):
+        buf = io.BytesIO()
+        self.image.save(buf, format='JPEG')
+
+        decoded = decode_image_payload(base64.b64encode(buf.getvalue()).decode("ascii"))
+
+        self.assertEqual(decoded.format, "JPEG")
+        self.assertEqual(decoded.size, (32, 24))
+
+    def test_as_array(self):
+        decoded = decode_image_payload(memoryview(self.png_bytes), as_array=True)
+
+        self.assertIsInstance(decoded, np.ndarray)
+        self.assertEqual(decoded.shape, (24, 32, 3))
+        np.testing.assert_array_equal(decoded, np.asarray(self.image))
+        decoded[0, 0] = 0
+
+    def test_base64_with_line_breaks(self):
+        payload = base64.encodebytes(self.png_bytes)
+
+        with patch('services.image_codec._BASE64_CHUNK', 64):
+            decoded = decode_image_payload(payload)
+
+        self.assertEqual(decoded.tobytes(), self.image.tobytes())
+
+    def test_base64_decoded_in_chunks(self):
+        with patch('services.image_codec._BASE64_CHUNK', 64):
+            decoded = decode_image_payload(bytearray(base64.b64encode(self.png_bytes)))
+
+        self.assertEqual(decoded.tobytes(), self.image.tobytes())
+
+    def test_multi_frame_image_can_seek(self):
+        frames = [Image.new('RGB', (8, 8), color) for color in ('red', 'green', 'blue')]
+        buf = io.BytesIO()
+        frames[0].save(buf, format='GIF', save_all=True, append_images=frames[1:])
+
+        decoded = decode_image_payload(base64.b64encode(buf.getvalue()))
+        decoded.seek(2)
+
+        self.assertEqual(decoded.convert('RGB').getpixel((0, 0)), (0, 0, 255))
+
+    def test_unrecognized_payload(self):
+        with self.assertRaises(ValueError):
+            decode_image_payload(b"definitely not an image")
+
+if __name__ == '__main__':
+    unittest.main()
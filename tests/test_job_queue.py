@@ -0,0 +1,144 @@
+import unittest
+from unittest.mock import Mock, patch
+from PIL import Image
+import tempfile
+import time
+import sys
+import os
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from services.job_queue import DONE, FAILED, QUEUED, RUNNING, JobQueue, spool_upload
+from worker import TryOnWorker
+from config import QUEUE_CONFIG
+
+class JobQueueTestCase(unittest.TestCase):
+    def setUp(self):
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.queue = JobQueue(os.path.join(self.tmpdir.name, "jobs.db"))
+        self.user_path = self._write_image("user.png", 'red')
+        self.clothing_path = self._write_image("clothing.png", 'blue')
+
+    def tearDown(self):
+        self.queue.close()
+        self.tmpdir.cleanup()
+
+    def _write_image(self, name, color):
+        path = os.path.join(self.tmpdir.name, name)
+        Image.new('RGB', (20, 20), color=color).save(path)
+        return path
+
+class TestJobQueue(JobQueueTestCase):
+    def test_claims_by_priority_then_age(self):
+        other_path = self._write_image("other.png", 'green')
+        low = self.queue.enqueue(self.user_path, self.clothing_path)
+        high = self.queue.enqueue(self.user_path, other_path, priority=5)
+        later = self.queue.enqueue(other_path, self.clothing_path)
+
+        claimed = [self.queue.claim("w")["id"] for _ in range(3)]
+
+        self.assertEqual(claimed, [high, low, later])
+        self.assertIsNone(self.queue.claim("w"))
+
+    def test_identical_jobs_are_deduplicated(self):
+        first = self.queue.enqueue(self.user_path, self.clothing_path)
+        copy_path = os.path.join(self.tmpdir.name, "copy.png")
+        with open(self.user_path, "rb") as src, open(copy_path, "wb") as dst:
+            dst.write(src.read())
+
+        self.assertEqual(self.queue.enqueue(copy_path, self.clothing_path), first)
+        self.assertNotEqual(self.queue.enqueue(self.user_path, self.clothing_path, {"format": "JPEG"}), first)
+
+    def test_duplicate_bumps_priority(self):
+        job_id = self.queue.enqueue(self.user_path, self.clothing_path)
+        self.queue.enqueue(self.user_path, self.clothing_path, priority=3)
+
+        self.assertEqual(self.queue.get(job_id)["priority"], 3)
+
+    def test_failed_job_can_be_resubmitted(self):
+        job_id = self.queue.enqueue(self.user_path, self.clothing_path)
+        self.queue.claim("w")
+        self.queue.fail(job_id, "boom")
+
+        self.assertNotEqual(self.queue.enqueue(self.user_path, self.clothing_path), job_id)
+
+    def test_complete_records_result_and_timings(self):
+        job_id = self.queue.enqueue(self.user_path, self.clothing_path)
+        job = self.queue.claim("w")
+        self.assertEqual(job["status"], RUNNING)
+        self.assertEqual(job["attempts"], 1)
+
+        self.queue.complete(job_id, "result.png", {"model": 1.5}, fallback=True)
+        job = self.queue.wait(job_id, timeout=1)
+
+        self.assertEqual(job["status"], DONE)
+        self.assertEqual(job["timings"], {"model": 1.5})
+        self.assertTrue(job["fallback"])
+
+    def test_requeue_stale(self):
+        job_id = self.queue.enqueue(self.user_path, self.clothing_path)
+        self.queue.claim("w")
+        time.sleep(0.01)
+
+        self.assertEqual(self.queue.requeue_stale(0), 1)
+        self.assertEqual(self.queue.get(job_id)["status"], QUEUED)
+
+    def test_spool_upload_is_content_addressed(self):
+        first = spool_upload(b"data", ".png", self.tmpdir.name)
+        second = spool_upload(b"data", ".png", self.tmpdir.name)
+
+        self.assertEqual(first, second)
+        self.assertTrue(first.endswith(".png"))
+
+class TestTryOnWorker(JobQueueTestCase):
+    def _make_worker(self, pipeline):
+        results_dir = os.path.join(self.tmpdir.name, "results")
+        return TryOnWorker(self.queue, pipeline, results_dir, workers=2, poll_interval=0.01)
+
+    def test_drain_processes_jobs_and_records_timings(self):
+        def generate_tryon(user, clothing, progress_callback=None):
+            progress_callback({"stage": "model", "status": "finished", "elapsed": 0.1, "duration": 0.1})
+            return Image.new('RGB', (20, 20), color='purple')
+
+        pipeline = Mock()
+        pipeline.generate_tryon.side_effect = generate_tryon
+        job_id = self.queue.enqueue(self.user_path, self.clothing_path, {"format": "JPEG"})
+
+        self._make_worker(pipeline).run(drain=True)
+        job = self.queue.get(job_id)
+
+        self.assertEqual(job["status"], DONE)
+        self.assertTrue(job["result_path"].endswith(".jpg"))
+        self.assertEqual(Image.open(job["result_path"]).size, (20, 20))
+        self.assertIn("model", job["timings"])
+        self.assertIn("queue_wait", job["timings"])
+        self.assertFalse(job["fallback"])
+
+    def test_pipeline_error_fails_job(self):
+        pipeline = Mock()
+        pipeline.generate_tryon.side_effect = RuntimeError("boom")
+        job_id = self.queue.enqueue(self.user_path, self.clothing_path)
+
+        self._make_worker(pipeline).run(drain=True)
+        job = self.queue.get(job_id)
+
+        self.assertEqual(job["status"], FAILED)
+        self.assertEqual(job["error"], "boom")
+
+    def test_jobs_of_crashed_worker_requeued_while_running(self):
+        pipeline = Mock()
+        pipeline.generate_tryon.return_value = Image.new('RGB', (20, 20), color='purple')
+        worker = self._make_worker(pipeline)
+        worker.requeue_interval = 0
+        worker.requeue_stale()
+
+        # Another worker claims a job and dies after this one has started
+        job_id = self.queue.enqueue(self.user_path, self.clothing_path)
+        self.queue.claim("crashed")
+        with patch.dict(QUEUE_CONFIG, stale_after_seconds=0):
+            worker._worker_loop(drain=True)
+
+        self.assertEqual(self.queue.get(job_id)["status"], DONE)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,105 @@
+import unittest
+from unittest.mock import patch
+import tempfile
+import json
+import sys
+import os
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from services.metrics import MetricsRegistry
+from services.progress import ProgressTracker
+
+class TestMetricsRegistry(unittest.TestCase):
+    def setUp(self):
+        self.metrics = MetricsRegistry(latency_buckets=[0.1, 1.0], bytes_buckets=[1024])
+
+    def test_counters_are_keyed_by_labels(self):
+        self.metrics.inc("requests_total")
+        self.metrics.inc("requests_total")
+        self.metrics.inc("lookups_total", labels={"result": "hit"})
+        self.metrics.inc("lookups_total", labels={"result": "miss"})
+
+        counters = {
+            (c["name"], tuple(c["labels"].items())): c["value"]
+            for c in self.metrics.snapshot()["counters"]
+        }
+        self.assertEqual(counters[("requests_total", ())], 2)
+        self.assertEqual(counters[("lookups_total", (("result", "hit"),))], 1)
+
+    def test_histogram_buckets(self):
+        for value in (0.05, 0.5, 5.0):
+            self.metrics.observe("stage_seconds", value, {"stage": "model"})
+        self.metrics.observe_bytes("upload_bytes", 2048)
+
+        histograms = {h["name"]: h for h in self.metrics.snapshot()["histograms"]}
+        self.assertEqual(histograms["stage_seconds"]["counts"], [1, 1, 1])
+        self.assertEqual(histograms["stage_seconds"]["count"], 3)
+        self.assertAlmostEqual(histograms["stage_seconds"]["sum"], 5.55)
+        self.assertEqual(histograms["upload_bytes"]["buckets"], [1024])
+        self.assertEqual(histograms["upload_bytes"]["counts"], [0, 1])
+
+    def test_prometheus_export(self):
+        self.metrics.describe("stage_seconds", "Stage wall time")
+        self.metrics.observe("stage_seconds", 0.5, {"stage": "model"})
+        self.metrics.inc("requests_total")
+
+        text = self.metrics.export_prometheus()
+
+        self.assertIn("# HELP stage_seconds Stage wall time", text)
+        self.assertIn("# TYPE stage_seconds histogram", text)
+        self.assertIn('stage_seconds_bucket{stage="model",le="0.1"} 0', text)
+        self.assertIn('stage_seconds_bucket{stage="model",le="1.0"} 1', text)
+        self.assertIn('stage_seconds_bucket{stage="model",le="+Inf"} 1', text)
+        self.assertIn('stage_seconds_count{stage="model"} 1', text)
+        self.assertIn("# TYPE requests_total counter", text)
+        self.assertIn("requests_total 1", text)
+
+    def test_disabled_registry_records_nothing(self):
+        metrics = MetricsRegistry(enabled=False)
+
+        metrics.inc("requests_total")
+        metrics.observe("stage_seconds", 1.0)
+        with metrics.timer("block_seconds"):
+            pass
+
+        self.assertEqual(metrics.snapshot(), {"counters": [], "histograms": []})
+
+    def test_timer_observes_duration(self):
+        with self.metrics.timer("block_seconds"):
+            pass
+
+        histogram = self.metrics.snapshot()["histograms"][0]
+        self.assertEqual(histogram["name"], "block_seconds")
+        self.assertEqual(histogram["count"], 1)
+
+    def test_write_json(self):
+        self.metrics.inc("requests_total")
+
+        with tempfile.TemporaryDirectory() as tmpdir:
+            path = os.path.join(tmpdir, "metrics.json")
+            self.metrics.write(path, format="json")
+            with open(path) as f:
+                data = json.load(f)
+
+        self.assertEqual(data["counters"][0]["name"], "requests_total")
+
+    def test_write_rejects_unknown_format(self):
+        with self.assertRaises(ValueError):
+            self.metrics.write("metrics.txt", format="xml")
+
+class TestStageMetrics(unittest.TestCase):
+    def test_tracker_stages_are_recorded(self):
+        metrics = MetricsRegistry()
+
+        with patch('services.progress.metrics', metrics):
+            tracker = ProgressTracker()
+            with tracker.stage("preprocess"):
+                pass
+
+        histogram = metrics.snapshot()["histograms"][0]
+        self.assertEqual(histogram["name"], "tryon_stage_seconds")
+        self.assertEqual(histogram["labels"], {"stage": "preprocess"})
+
+if __name__ == '__main__':
+    unittest.main()
@@ -1,15 +1,18 @@
 import unittest
-from unittest.mock import Mock, patch, MagicMock
+from unittest.mock import AsyncMock, Mock, patch, MagicMock
 from PIL import Image
 import numpy as np
+import asyncio
+import tempfile
 import sys
 import os
 
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
 from services.pipeline import VirtualTryOnPipeline
-from services.gemini_client import GeminiClient
+from services.gemini_client import GeminiClient, GeminiRetryableError
 from services.image_utils import ImageProcessor
+from services.cache import MemoryResultCache
 
 class TestVirtualTryOnPipeline(unittest.TestCase):
     def setUp(self):
@@ -36,7 +39,7 @@ class TestVirtualTryOnPipeline(unittest.TestCase):
             mock_process.assert_called_once()
 
     def test_generate_tryon_with_file_paths(self):
-        with patch('PIL.Image.open') as mock_open:
+        with patch('PIL.Image.open') as mock_open, patch('os.path.getsize', return_value=1024):
             mock_open.side_effect = [self.test_user_image, self.test_clothing_image]
 
             with patch.object(self.pipeline.gemini_client, 'process_virtual_tryon') as mock_process:
@@ -88,5 +91,176 @@ class TestVirtualTryOnPipeline(unittest.TestCase):
         self.assertIsInstance(result, Image.Image)
         self.assertEqual(result.size, self.test_user_image.size)
 
+class TestPipelineResultCache(unittest.TestCase):
+    def setUp(self):
+        with patch('services.pipeline.GeminiClient'):
+            self.pipeline = VirtualTryOnPipeline(cache=MemoryResultCache())
+
+        self.test_user_image = Image.new('RGB', (512, 512), color='blue')
+        self.test_clothing_image = Image.new('RGB', (256, 256), color='red')
+
+    def test_repeat_tryon_served_from_cache(self):
+        generated = Image.new('RGB', (512, 512), color='green')
+        self.pipeline.gemini_client.process_virtual_tryon.return_value = generated
+
+        first = self.pipeline.generate_tryon(self.test_user_image, self.test_clothing_image)
+        second = self.pipeline.generate_tryon(self.test_user_image, self.test_clothing_image)
+
+        self.pipeline.gemini_client.process_virtual_tryon.assert_called_once()
+        self.assertEqual(first.tobytes(), second.tobytes())
+        self.assertEqual(self.pipeline.cache.stats()["hits"], 1)
+
+    def test_fallback_result_not_cached(self):
+        self.pipeline.gemini_client.process_virtual_tryon.side_effect = Exception("API Error")
+
+        self.pipeline.generate_tryon(self.test_user_image, self.test_clothing_image)
+
+        self.assertEqual(len(self.pipeline.cache), 0)
+
+class TestPipelineFilePaths(unittest.TestCase):
+    def setUp(self):
+        with patch('services.pipeline.GeminiClient'):
+            self.pipeline = VirtualTryOnPipeline(cache=None)
+
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmpdir.cleanup)
+        self.user_path = os.path.join(self.tmpdir.name, 'user.png')
+        self.clothing_path = os.path.join(self.tmpdir.name, 'clothing.png')
+        Image.new('RGB', (512, 512), color='blue').save(self.user_path)
+        Image.new('RGB', (256, 256), color='red').save(self.clothing_path)
+
+    def test_generate_tryon_rejects_oversized_file_path(self):
+        with patch.dict('services.image_utils.APP_CONFIG', {"max_file_size_mb": 0.0001}):
+            with self.assertRaises(ValueError):
+                self.pipeline.generate_tryon(self.user_path, self.clothing_path)
+
+        self.pipeline.gemini_client.process_virtual_tryon.assert_not_called()
+
+    def test_generate_tryon_decodes_paths_via_load_image(self):
+        self.pipeline.gemini_client.process_virtual_tryon.return_value = Image.new('RGB', (64, 64))
+
+        with patch.object(ImageProcessor, 'load_image', wraps=ImageProcessor.load_image) as load:
+            self.pipeline.generate_tryon(self.user_path, self.clothing_path)
+
+        self.assertEqual(load.call_count, 2)
+
+class TestPipelineProgress(unittest.TestCase):
+    def setUp(self):
+        with patch('services.pipeline.GeminiClient'):
+            self.pipeline = VirtualTryOnPipeline(cache=MemoryResultCache())
+
+        self.test_user_image = Image.new('RGB', (512, 512), color='blue')
+        self.test_clothing_image = Image.new('RGB', (256, 256), color='red')
+
+    def test_progress_events_report_stage_timings(self):
+        self.pipeline.gemini_client.process_virtual_tryon.return_value = Image.new('RGB', (64, 64))
+        events = []
+
+        self.pipeline.generate_tryon(
+            self.test_user_image,
+            self.test_clothing_image,
+            progress_callback=events.append
+        )
+
+        finished = [e["stage"] for e in events if e["status"] == "finished"]
+        self.assertEqual(finished, ["preprocess", "cache"])
+        self.assertTrue(all(e["duration"] >= 0 for e in events if e["status"] == "finished"))
+        _, kwargs = self.pipeline.gemini_client.process_virtual_tryon.call_args
+        self.assertIsNotNone(kwargs["progress"])
+
+    def test_progress_reports_fallback(self):
+        self.pipeline.gemini_client.process_virtual_tryon.side_effect = Exception("API Error")
+        events = []
+
+        self.pipeline.generate_tryon(
+            self.test_user_image,
+            self.test_clothing_image,
+            progress_callback=events.append
+        )
+
+        self.assertIn("fallback", [e["stage"] for e in events])
+
+class TestPipelineBatch(unittest.TestCase):
+    def setUp(self):
+        with patch('services.pipeline.GeminiClient'):
+            self.pipeline = VirtualTryOnPipeline(cache=None)
+
+        self.test_user_image = Image.new('RGB', (512, 512), color='blue')
+        self.garments = [
+            Image.new('RGB', (256, 256), color=color)
+            for color in ('red', 'green', 'yellow')
+        ]
+
+    def test_batch_preprocesses_shared_user_once(self):
+        self.pipeline.gemini_client.process_virtual_tryon.return_value = Image.new('RGB', (64, 64))
+
+        with patch.object(
+            self.pipeline.image_processor,
+            'prepare_user_image',
+            wraps=ImageProcessor.prepare_user_image
+        ) as mock_prepare:
+            results = list(self.pipeline.generate_tryon_batch(
+                self.test_user_image, self.garments, max_workers=2
+            ))
+
+        mock_prepare.assert_called_once()
+        self.assertEqual(sorted(r["clothing_index"] for r in results), [0, 1, 2])
+        self.assertTrue(all(r["error"] is None for r in results))
+
+    def test_batch_reports_per_item_errors(self):
+        def process(user, clothing, prompt, **kwargs):
+            if clothing.getpixel((0, 0)) == (0, 128, 0):
+                raise Exception("API Error")
+            return Image.new('RGB', (64, 64))
+
+        self.pipeline.gemini_client.process_virtual_tryon.side_effect = process
+
+        results = {
+            r["clothing_index"]: r
+            for r in self.pipeline.generate_tryon_batch(self.test_user_image, self.garments)
+        }
+
+        self.assertEqual(len(results), 3)
+        self.assertTrue(results[1]["fallback"])
+        self.assertIn("API Error", results[1]["error"])
+        self.assertIsInstance(results[1]["image"], Image.Image)
+        self.assertIsNone(results[0]["error"])
+
+    def test_batch_rejects_mismatched_lists(self):
+        with self.assertRaises(ValueError):
+            list(self.pipeline.generate_tryon_batch(
+                [self.test_user_image, self.test_user_image], self.garments
+            ))
+
+class TestPipelineAsync(unittest.TestCase):
+    def setUp(self):
+        with patch('services.pipeline.GeminiClient'):
+            self.pipeline = VirtualTryOnPipeline(cache=None)
+
+        self.pipeline.async_gemini_client = Mock()
+        self.test_user_image = Image.new('RGB', (512, 512), color='blue')
+        self.test_clothing_image = Image.new('RGB', (256, 256), color='red')
+
+    def test_generate_tryon_async(self):
+        generated = Image.new('RGB', (64, 64), color='green')
+        self.pipeline.async_gemini_client.process_virtual_tryon = AsyncMock(return_value=generated)
+
+        result = asyncio.run(self.pipeline.generate_tryon_async(
+            self.test_user_image, self.test_clothing_image
+        ))
+
+        self.assertIs(result, generated)
+
+    def test_generate_tryon_async_falls_back_on_retryable_error(self):
+        self.pipeline.async_gemini_client.process_virtual_tryon = AsyncMock(
+            side_effect=GeminiRetryableError("503 unavailable")
+        )
+
+        result = asyncio.run(self.pipeline.generate_tryon_async(
+            self.test_user_image, self.test_clothing_image
+        ))
+
+        self.assertEqual(result.size, self.test_user_image.size)
+
 if __name__ == '__main__':
     unittest.main()
\ No newline at end of file
@@ -0,0 +1,137 @@
+import unittest
+from PIL import Image
+import numpy as np
+import io
+import sys
+import os
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from services.image_utils import ImageProcessor
+from services.preprocess import FusedPreprocessor, apply_orientation, thumbnail_size
+
+def make_test_image(width: int, height: int) -> Image.Image:
+    rng = np.random.default_rng(0)
+    y, x = np.mgrid[0:height, 0:width]
+    pixels = np.stack([x / width * 255, y / height * 255, (x + y) / (width + height) * 255], -1)
+    pixels += rng.normal(0, 10, pixels.shape)
+    return Image.fromarray(np.clip(pixels, 0, 255).astype(np.uint8))
+
+class TestFusedPreprocessor(unittest.TestCase):
+    def setUp(self):
+        self.preprocessor = FusedPreprocessor()
+
+    def test_orientation_matches_pil(self):
+        array = np.random.default_rng(1).integers(0, 255, (5, 7, 3), dtype=np.uint8)
+        image = Image.fromarray(array)
+        transposes = {
+            2: Image.Transpose.FLIP_LEFT_RIGHT,
+            3: Image.Transpose.ROTATE_180,
+            4: Image.Transpose.FLIP_TOP_BOTTOM,
+            5: Image.Transpose.TRANSPOSE,
+            6: Image.Transpose.ROTATE_270,
+            7: Image.Transpose.TRANSVERSE,
+            8: Image.Transpose.ROTATE_90,
+        }
+
+        for orientation, method in transposes.items():
+            expected = np.asarray(image.transpose(method))
+            np.testing.assert_array_equal(apply_orientation(array, orientation), expected)
+
+    def test_thumbnail_size_matches_pil(self):
+        for size in [(4000, 3000), (3000, 4000), (1500, 1499), (800, 600), (5000, 10)]:
+            image = Image.new('RGB', size)
+            image.thumbnail((1024, 1024))
+            self.assertEqual(thumbnail_size(size, (1024, 1024)), image.size)
+
+    def test_user_image_close_to_pil_engine(self):
+        image = make_test_image(1600, 1200)
+
+        pil_result = ImageProcessor.prepare_user_image(image.copy(), engine="pil")
+        fused_result = self.preprocessor.prepare_user_image(image)
+
+        self.assertEqual(fused_result.size, pil_result.size)
+        diff = np.abs(np.asarray(pil_result, dtype=np.int16) - np.asarray(fused_result, dtype=np.int16))
+        self.assertLess(diff.mean(), 3.0)
+
+    def test_enhance_matches_pil_without_resize(self):
+        image = make_test_image(300, 200)
+
+        pil_result = ImageProcessor.enhance_image_quality(image)
+        fused_result = self.preprocessor.enhance(np.asarray(image))
+
+        diff = np.abs(np.asarray(pil_result, dtype=np.int16) - fused_result.astype(np.int16))
+        self.assertLessEqual(diff.max(), 2)
+
+    def test_exif_orientation_applied(self):
+        exif = Image.Exif()
+        exif[0x0112] = 6
+        buf = io.BytesIO()
+        make_test_image(400, 200).save(buf, format='JPEG', exif=exif)
+        buf.seek(0)
+
+        result = self.preprocessor.prepare_clothing_image(Image.open(buf))
+
+        self.assertEqual(result.size, (200, 400))
+
+    def test_rgba_input(self):
+        result = self.preprocessor.prepare_user_image(Image.new('RGBA', (100, 80), color='blue'))
+
+        self.assertEqual(result.mode, 'RGB')
+        self.assertEqual(result.size, (100, 80))
+
+    def test_unknown_engine_rejected(self):
+        with self.assertRaises(ValueError):
+            ImageProcessor.prepare_user_image(Image.new('RGB', (10, 10)), engine="gpu")
+
+class TestEngineParity(unittest.TestCase):
+    # Largest mean and max per-channel difference between the "numpy" and
+    # "pil" engines after a downscale. Colour conversion is exact; what is
+    # left is area resampling against LANCZOS, which diverge most on the
+    # dithered pixels of "P" and "1" images.
+    RESIZED_BOUNDS = {
+        "RGB": (2.5, 16),
+        "RGBA": (2.5, 16),
+        "L": (2.0, 12),
+        "LA": (2.0, 12),
+        "CMYK": (2.5, 16),
+        "P": (4.5, 32),
+        "1": (20.0, 96),
+    }
+
+    def test_engines_agree_per_mode_after_downscale(self):
+        source = make_test_image(1600, 1200)
+
+        for mode, (max_mean, max_diff) in self.RESIZED_BOUNDS.items():
+            image = source.convert(mode)
+            for prepare in (ImageProcessor.prepare_user_image, ImageProcessor.prepare_clothing_image):
+                with self.subTest(mode=mode, prepare=prepare.__name__):
+                    pil_result = prepare(image.copy(), engine="pil")
+                    fused_result = prepare(image.copy(), engine="numpy")
+
+                    self.assertEqual(fused_result.size, pil_result.size)
+                    diff = np.abs(np.asarray(pil_result, dtype=np.int16) - np.asarray(fused_result, dtype=np.int16))
+                    self.assertLess(diff.mean(), max_mean)
+                    self.assertLessEqual(diff.max(), max_diff)
+
+    def test_engines_identical_per_mode_without_resize(self):
+        source = make_test_image(600, 400)
+
+        for mode in self.RESIZED_BOUNDS:
+            with self.subTest(mode=mode):
+                image = source.convert(mode)
+                pil_result = ImageProcessor.prepare_clothing_image(image.copy(), engine="pil")
+                fused_result = ImageProcessor.prepare_clothing_image(image.copy(), engine="numpy")
+
+                np.testing.assert_array_equal(np.asarray(fused_result), np.asarray(pil_result))
+
+    def test_default_engine_is_pil(self):
+        image = make_test_image(1600, 1200).convert("1")
+
+        np.testing.assert_array_equal(
+            np.asarray(ImageProcessor.prepare_user_image(image.copy())),
+            np.asarray(ImageProcessor.prepare_user_image(image.copy(), engine="pil"))
+        )
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,190 @@
+import unittest
+from unittest.mock import patch
+from PIL import Image
+import tempfile
+import threading
+import time
+import sys
+import os
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from services.catalog import GarmentCatalog
+from services.image_codec import EncodedImage, decode_image_payload
+from services.image_utils import ImageProcessor
+from services.pipeline import VirtualTryOnPipeline
+from services.preprocess import FusedPreprocessor
+from services.preview import PreviewEntry, PreviewStore
+
+class TestPreviewTier(unittest.TestCase):
+    def setUp(self):
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.catalog = GarmentCatalog(self.tmpdir.name)
+        with patch('services.pipeline.GeminiClient'):
+            self.pipeline = VirtualTryOnPipeline(cache=None, cpu_pool=None, catalog=self.catalog)
+        self.client = self.pipeline.gemini_client
+        self.client.process_virtual_tryon.return_value = Image.new('RGB', (10, 10))
+        self.user = Image.new('RGB', (1600, 2000), color='red')
+        self.clothing = Image.new('RGB', (1200, 1200), color='blue')
+
+    def tearDown(self):
+        self.tmpdir.cleanup()
+
+    def _sent_sizes(self):
+        args = self.client.process_virtual_tryon.call_args[0]
+        sizes = []
+        for image in args[:2]:
+            if isinstance(image, EncodedImage):
+                image = decode_image_payload(image.data)
+            sizes.append(image.size)
+        return sizes
+
+    def test_preview_sends_small_lightly_encoded_inputs(self):
+        with patch.object(FusedPreprocessor, 'enhance') as fused_enhance, \
+                patch.object(ImageProcessor, 'enhance_image_quality') as enhance:
+            preview = self.pipeline.generate_preview(self.user, self.clothing)
+
+        fused_enhance.assert_not_called()
+        enhance.assert_not_called()
+        self.assertFalse(preview["fallback"])
+        self.assertIn(preview["preview_id"], self.pipeline.previews._entries)
+
+        args = self.client.process_virtual_tryon.call_args[0]
+        self.assertIsInstance(args[0], EncodedImage)
+        self.assertEqual(args[0].quality, self.pipeline.preview_encoder.quality)
+        self.assertEqual(self._sent_sizes(), [(307, 384), (384, 384)])
+
+    def test_preview_id_is_content_addressed(self):
+        first = self.pipeline.generate_preview(self.user, self.clothing)
+        second = self.pipeline.generate_preview(self.user.copy(), self.clothing.copy())
+
+        self.assertEqual(first["preview_id"], second["preview_id"])
+
+    def test_upgrade_renders_full_size_and_reuses_inputs(self):
+        preview = self.pipeline.generate_preview(self.user, self.clothing)
+
+        with patch.object(ImageProcessor, 'load_image') as load:
+            self.pipeline.upgrade(preview["preview_id"])
+            self.assertEqual(self._sent_sizes(), [(819, 1024), (1024, 1024)])
+
+            with patch.object(ImageProcessor, 'prepare_user_image') as prepare_user:
+                self.pipeline.upgrade(preview["preview_id"])
+            prepare_user.assert_not_called()
+        load.assert_not_called()
+
+    def test_upgrade_matches_direct_tryon_without_keeping_sources(self):
+        user = Image.effect_mandelbrot((1600, 2000), (-2, -1.5, 1, 1.5), 50).convert('RGB')
+        preview = self.pipeline.generate_preview(user, self.clothing)
+        entry = self.pipeline.previews.get(preview["preview_id"])
+        self.assertEqual(entry.user_image.size, (819, 1024))
+        self.assertEqual(entry.clothing_processed.size, (1024, 1024))
+
+        self.pipeline.upgrade(preview["preview_id"])
+
+        direct = ImageProcessor.prepare_user_image(user)
+        self.assertEqual(entry.user_hash, ImageProcessor.compute_image_hash(direct))
+        self.assertIsNone(entry.user_image)
+
+    def test_fit_user_image_keeps_prepare_user_image(self):
+        source = Image.effect_mandelbrot((1600, 2000), (-2, -1.5, 1, 1.5), 50).convert('RGBA')
+        source.getexif()[0x0112] = 6
+
+        for engine in ("pil", "numpy"):
+            with self.subTest(engine=engine):
+                fitted = ImageProcessor.fit_user_image(source, engine)
+                self.assertEqual(fitted.size, (1024, 819))
+                self.assertEqual(
+                    ImageProcessor.compute_image_hash(ImageProcessor.prepare_user_image(fitted, engine)),
+                    ImageProcessor.compute_image_hash(ImageProcessor.prepare_user_image(source, engine))
+                )
+
+    def test_concurrent_upgrades_share_one_render(self):
+        preview = self.pipeline.generate_preview(self.user, self.clothing)
+        self.client.process_virtual_tryon.reset_mock()
+        rendering = threading.Event()
+        release = threading.Event()
+
+        def slow_render(*args, **kwargs):
+            rendering.set()
+            release.wait(timeout=5)
+            return Image.new('RGB', (10, 10))
+
+        self.client.process_virtual_tryon.side_effect = slow_render
+        results = []
+        threads = [
+            threading.Thread(target=lambda: results.append(self.pipeline.upgrade(preview["preview_id"])))
+            for _ in range(3)
+        ]
+        threads[0].start()
+        rendering.wait(timeout=5)
+        for thread in threads[1:]:
+            thread.start()
+        time.sleep(0.05)
+        release.set()
+        for thread in threads:
+            thread.join()
+
+        self.client.process_virtual_tryon.assert_called_once()
+        self.assertEqual(len(results), 3)
+
+    def test_preview_decodes_paths_once(self):
+        user_path = os.path.join(self.tmpdir.name, "user.png")
+        clothing_path = os.path.join(self.tmpdir.name, "clothing.png")
+        self.user.save(user_path)
+        self.clothing.save(clothing_path)
+
+        with patch.object(ImageProcessor, 'load_image', wraps=ImageProcessor.load_image) as load:
+            preview = self.pipeline.generate_preview(user_path, clothing_path)
+            self.pipeline.upgrade(preview["preview_id"])
+
+        self.assertEqual(load.call_count, 2)
+
+    def test_garment_preview_and_upgrade(self):
+        garment = self.catalog.ingest("SHIRT-1", self.clothing)
+
+        preview = self.pipeline.generate_preview(self.user, garment_id="SHIRT-1")
+        self.assertEqual(self._sent_sizes()[1], (384, 384))
+
+        self.pipeline.upgrade(preview["preview_id"])
+        self.assertIs(self.client.process_virtual_tryon.call_args[0][1], garment.encoded)
+
+    def test_preview_falls_back_at_preview_size(self):
+        self.client.process_virtual_tryon.side_effect = Exception("API Error")
+
+        preview = self.pipeline.generate_preview(self.user, self.clothing)
+
+        self.assertTrue(preview["fallback"])
+        self.assertEqual(preview["image"].size, (307, 384))
+
+    def test_upgrade_unknown_preview(self):
+        with self.assertRaises(KeyError):
+            self.pipeline.upgrade("missing")
+
+class TestPreviewHelpers(unittest.TestCase):
+    def test_prepare_preview_image_leaves_source_untouched(self):
+        image = Image.new('RGB', (800, 600), color='green')
+
+        preview = ImageProcessor.prepare_preview_image(image, (384, 384), engine="pil")
+
+        self.assertEqual(preview.size, (384, 288))
+        self.assertEqual(image.size, (800, 600))
+
+    def test_engines_agree_on_preview_size(self):
+        image = Image.new('RGB', (1000, 700), color='green')
+
+        pil = ImageProcessor.prepare_preview_image(image, engine="pil")
+        fused = ImageProcessor.prepare_preview_image(image, engine="numpy")
+
+        self.assertEqual(pil.size, fused.size)
+
+    def test_store_evicts_oldest(self):
+        store = PreviewStore(max_entries=2)
+        for preview_id in ("a", "b", "c"):
+            store.add(preview_id, PreviewEntry(Image.new('RGB', (1, 1))))
+
+        self.assertEqual(len(store), 2)
+        with self.assertRaises(KeyError):
+            store.get("a")
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,144 @@
+import unittest
+from unittest.mock import patch
+import asyncio
+import threading
+import time
+import sys
+import os
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from services.rate_limit import AsyncSingleFlight, RateLimiter, SingleFlight, TokenBucket
+
+class TestTokenBucket(unittest.TestCase):
+    def test_burst_then_paced(self):
+        with patch('services.rate_limit.time.monotonic', return_value=100.0):
+            bucket = TokenBucket(rate=2.0, burst=2)
+
+            self.assertEqual(bucket.reserve(), 0.0)
+            self.assertEqual(bucket.reserve(), 0.0)
+            self.assertAlmostEqual(bucket.reserve(), 0.5)
+            self.assertAlmostEqual(bucket.reserve(), 1.0)
+
+    def test_reserve_respects_max_wait(self):
+        with patch('services.rate_limit.time.monotonic', return_value=100.0):
+            bucket = TokenBucket(rate=1.0, burst=1)
+            bucket.reserve()
+
+            self.assertIsNone(bucket.reserve(max_wait=0.5))
+            self.assertAlmostEqual(bucket.reserve(), 1.0)
+
+class TestRateLimiter(unittest.TestCase):
+    def test_in_flight_cap(self):
+        limiter = RateLimiter(max_in_flight=1)
+
+        with limiter.acquire():
+            with self.assertRaises(TimeoutError):
+                with limiter.acquire(timeout=0.05):
+                    pass
+
+        with limiter.acquire(timeout=0.05):
+            pass
+
+    def test_async_acquire_shares_cap(self):
+        limiter = RateLimiter(max_in_flight=1)
+
+        async def run():
+            with limiter.acquire():
+                with self.assertRaises(TimeoutError):
+                    async with limiter.acquire_async(timeout=0.05):
+                        pass
+            async with limiter.acquire_async(timeout=0.05):
+                pass
+
+        asyncio.run(run())
+
+class TestSingleFlight(unittest.TestCase):
+    def test_followers_share_leader_result(self):
+        flight = SingleFlight()
+        started = threading.Event()
+        release = threading.Event()
+        calls = []
+
+        def work():
+            calls.append(1)
+            started.set()
+            release.wait(timeout=5)
+            return "result"
+
+        results = []
+        leader = threading.Thread(target=lambda: results.append(flight.do("key", work)))
+        leader.start()
+        started.wait(timeout=5)
+        follower = threading.Thread(target=lambda: results.append(flight.do("key", work)))
+        follower.start()
+        time.sleep(0.05)
+        release.set()
+        leader.join()
+        follower.join()
+
+        self.assertEqual(len(calls), 1)
+        self.assertEqual(sorted(shared for _, shared in results), [False, True])
+
+    def test_follower_stops_waiting_at_its_timeout(self):
+        flight = SingleFlight()
+        started = threading.Event()
+        release = threading.Event()
+        left = []
+
+        def work():
+            started.set()
+            release.wait(timeout=5)
+            return "result"
+
+        results = []
+        leader = threading.Thread(target=lambda: results.append(flight.do("key", work)))
+        leader.start()
+        started.wait(timeout=5)
+
+        with self.assertRaises(TimeoutError):
+            flight.do("key", work, timeout=0.05, join=lambda state: lambda: left.append(state))
+        release.set()
+        leader.join()
+
+        self.assertEqual(left, [None])
+        self.assertEqual(results, [("result", False)])
+
+    def test_async_followers_share_errors(self):
+        flight = AsyncSingleFlight()
+        calls = []
+
+        async def work():
+            calls.append(1)
+            await asyncio.sleep(0.01)
+            raise ValueError("upstream failed")
+
+        async def run():
+            return await asyncio.gather(
+                flight.do("key", work), flight.do("key", work), return_exceptions=True
+            )
+
+        results = asyncio.run(run())
+
+        self.assertEqual(len(calls), 1)
+        self.assertTrue(all(isinstance(r, ValueError) for r in results))
+
+    def test_async_follower_stops_waiting_at_its_timeout(self):
+        flight = AsyncSingleFlight()
+
+        async def work():
+            await asyncio.sleep(0.2)
+            return "result"
+
+        async def run():
+            return await asyncio.gather(
+                flight.do("key", work), flight.do("key", work, timeout=0.01), return_exceptions=True
+            )
+
+        leader, follower = asyncio.run(run())
+
+        self.assertEqual(leader, ("result", False))
+        self.assertIsInstance(follower, TimeoutError)
+
+if __name__ == '__main__':
+    unittest.main()
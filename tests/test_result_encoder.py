@@ -0,0 +1,62 @@
+import unittest
+from unittest.mock import patch
+from PIL import Image
+import io
+import sys
+import os
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from services.result_encoder import ResultEncoder, file_extension
+
+class TestResultEncoder(unittest.TestCase):
+    def setUp(self):
+        self.encoder = ResultEncoder(max_entries=4, max_workers=2)
+        self.image = Image.new('RGB', (120, 80), color='purple')
+
+    def tearDown(self):
+        self.encoder.shutdown()
+
+    def test_encodes_each_format_once(self):
+        first = self.encoder.encode(self.image, "PNG")
+        second = self.encoder.encode(self.image.copy(), "png")
+
+        self.assertIs(first, second)
+        self.assertEqual(self.encoder.encodes, 1)
+
+    def test_round_trips_every_format(self):
+        for format in ("PNG", "JPEG", "WEBP"):
+            encoded = self.encoder.encode(self.image, format)
+            decoded = Image.open(io.BytesIO(encoded.data))
+
+            self.assertEqual(decoded.format, format)
+            self.assertEqual(decoded.size, (120, 80))
+        self.assertEqual(self.encoder.encode(self.image, "PNG").mime_type, "image/png")
+
+    def test_png_is_lossless_with_fast_compression(self):
+        with patch.object(Image.Image, 'save', autospec=True, side_effect=Image.Image.save) as save:
+            encoded = self.encoder.encode(self.image, "PNG")
+
+        self.assertEqual(save.call_args.kwargs["compress_level"], self.encoder.png_compress_level)
+        self.assertEqual(Image.open(io.BytesIO(encoded.data)).convert('RGB').tobytes(), self.image.tobytes())
+
+    def test_prefetch_shares_futures_with_encode(self):
+        futures = self.encoder.prefetch(self.image, ["JPEG", "PNG"])
+
+        self.assertIs(self.encoder.encode(self.image, "PNG"), futures[1].result())
+        self.assertEqual(self.encoder.encodes, 2)
+
+    def test_failed_encode_is_retried(self):
+        with patch.object(ResultEncoder, '_encode', side_effect=OSError("disk full")):
+            with self.assertRaises(OSError):
+                self.encoder.encode(self.image, "PNG")
+
+        self.assertGreater(len(self.encoder.encode(self.image, "PNG")), 0)
+
+    def test_rejects_unknown_format(self):
+        with self.assertRaises(ValueError):
+            self.encoder.encode(self.image, "BMP")
+        self.assertEqual(file_extension("jpg"), ".jpg")
+
+if __name__ == '__main__':
+    unittest.main()
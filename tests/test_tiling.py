@@ -0,0 +1,82 @@
+import unittest
+from unittest.mock import patch
+from PIL import Image
+import numpy as np
+import sys
+import os
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from services.image_utils import ImageProcessor
+from services.tiling import iter_stripes, should_tile, stripe_rows
+from tests.test_preprocess import make_test_image
+
+# Tile anything over 1000 pixels with a budget of a few rows
+SMALL_TILES = {"enabled": True, "min_pixels": 1000, "max_memory_mb": 0.05}
+NO_TILES = {"enabled": False, "min_pixels": 1000, "max_memory_mb": 0.05}
+
+class TestStripes(unittest.TestCase):
+    def test_stripe_rows_respect_budget(self):
+        self.assertEqual(stripe_rows(1000, 10, budget=100_000), 10)
+        self.assertEqual(stripe_rows(1_000_000, 10, budget=100), 1)
+
+    def test_iter_stripes_overlap(self):
+        stripes = list(iter_stripes(10, 4, overlap=1))
+
+        self.assertEqual(stripes, [(0, 4, 0, 5), (4, 8, 3, 9), (8, 10, 7, 10)])
+
+    def test_should_tile_threshold(self):
+        with patch.dict('services.tiling.TILING_CONFIG', SMALL_TILES):
+            self.assertTrue(should_tile(Image.new('RGB', (50, 50))))
+            self.assertFalse(should_tile(Image.new('RGB', (10, 10))))
+        with patch.dict('services.tiling.TILING_CONFIG', NO_TILES):
+            self.assertFalse(should_tile(Image.new('RGB', (50, 50))))
+
+class TestTiledOperations(unittest.TestCase):
+    def setUp(self):
+        self.image = make_test_image(300, 200)
+
+    def run_both(self, fn):
+        with patch.dict('services.tiling.TILING_CONFIG', NO_TILES):
+            whole = fn()
+        with patch.dict('services.tiling.TILING_CONFIG', SMALL_TILES):
+            tiled = fn()
+        return whole, tiled
+
+    def test_enhance_matches_whole_frame(self):
+        whole, tiled = self.run_both(lambda: ImageProcessor.enhance_image_quality(self.image))
+
+        self.assertEqual(tiled.tobytes(), whole.tobytes())
+
+    def test_mask_matches_whole_frame(self):
+        image = self.image.copy()
+        image.paste((255, 255, 255), (50, 50, 150, 120))
+
+        whole, tiled = self.run_both(lambda: ImageProcessor.create_mask(image))
+
+        self.assertEqual(tiled.mode, 'L')
+        self.assertEqual(tiled.tobytes(), whole.tobytes())
+
+    def test_blend_close_to_whole_frame(self):
+        overlay = make_test_image(60, 90)
+        box = (40, 20, 200, 180)
+
+        whole, tiled = self.run_both(
+            lambda: ImageProcessor.blend_images(self.image, overlay, alpha=0.5, box=box)
+        )
+
+        self.assertEqual(tiled.size, whole.size)
+        difference = np.abs(np.asarray(tiled, dtype=int) - np.asarray(whole, dtype=int))
+        self.assertLess(difference.mean(), 2.0)
+        self.assertEqual(difference[:20].max(), 0)
+
+    def test_large_images_use_projection_bounds(self):
+        with patch.dict('services.tiling.TILING_CONFIG', SMALL_TILES):
+            with patch('services.image_utils.bounds_cache') as bounds_cache:
+                bounds_cache.bounds.return_value = (1, 2, 3, 4)
+                bounds = ImageProcessor.detect_person_bounds(self.image, engine="contour")
+
+        self.assertEqual(bounds, (1, 2, 3, 4))
+
+if __name__ == '__main__':
+    unittest.main()
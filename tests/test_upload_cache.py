@@ -0,0 +1,119 @@
+import unittest
+from unittest.mock import Mock, patch
+from PIL import Image
+import io
+import sys
+import os
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from services.image_utils import ImageProcessor
+from services.pipeline import VirtualTryOnPipeline
+from services.upload_cache import UploadCache
+
+class FakeUpload:
+    """Stand-in for Streamlit's UploadedFile"""
+
+    def __init__(self, file_id, image, format='PNG'):
+        self.file_id = file_id
+        self.name = f"{file_id}.png"
+        buffer = io.BytesIO()
+        image.save(buffer, format=format)
+        self._data = buffer.getvalue()
+
+    def getvalue(self):
+        return self._data
+
+class TestUploadCache(unittest.TestCase):
+    def setUp(self):
+        self.cache = UploadCache(max_entries=2, preview_size=(64, 64))
+        self.upload = FakeUpload("a", Image.new('RGB', (400, 300), color='red'))
+
+    def test_reruns_decode_once(self):
+        with patch.object(ImageProcessor, 'load_image', wraps=ImageProcessor.load_image) as load:
+            first = self.cache.get(self.upload)
+            second = self.cache.get(self.upload)
+
+        self.assertIs(first, second)
+        self.assertEqual(load.call_count, 1)
+        self.assertEqual((self.cache.hits, self.cache.misses), (1, 1))
+
+    def test_preview_is_a_thumbnail(self):
+        decoded = self.cache.get(self.upload)
+
+        self.assertEqual(decoded.image.size, (400, 300))
+        self.assertEqual(decoded.preview.size, (64, 48))
+
+    def test_same_file_id_with_new_content_is_a_miss(self):
+        first = self.cache.get(self.upload)
+        second = self.cache.get(FakeUpload("a", Image.new('RGB', (400, 300), color='blue')))
+
+        self.assertIsNot(first, second)
+        self.assertEqual(second.image.getpixel((0, 0)), (0, 0, 255))
+
+    def test_evicts_least_recently_used(self):
+        first = self.cache.get(self.upload)
+        self.cache.get(FakeUpload("b", Image.new('RGB', (10, 10))))
+        self.cache.get(FakeUpload("c", Image.new('RGB', (10, 10))))
+
+        self.assertIsNot(self.cache.get(self.upload), first)
+
+    def test_prepared_input_is_computed_once(self):
+        decoded = self.cache.get(self.upload)
+
+        prepare = Mock(side_effect=lambda image: image.copy())
+        with patch.dict('services.upload_cache.PREPARE', {"user": prepare}):
+            first, first_hash = decoded.prepared("user")
+            second, _ = decoded.prepared("user")
+
+        self.assertIs(first, second)
+        self.assertEqual(prepare.call_count, 1)
+        self.assertEqual(first_hash, ImageProcessor.compute_image_hash(first))
+
+    def test_prepared_matches_pipeline_preprocessing(self):
+        decoded = self.cache.get(self.upload)
+
+        user_processed, _ = decoded.prepared("user")
+        clothing_processed, _ = decoded.prepared("clothing")
+
+        expected_user, expected_clothing = ImageProcessor.prepare_for_tryon(decoded.image, decoded.image)
+        self.assertEqual(ImageProcessor.compute_image_hash(user_processed),
+                         ImageProcessor.compute_image_hash(expected_user))
+        self.assertEqual(ImageProcessor.compute_image_hash(clothing_processed),
+                         ImageProcessor.compute_image_hash(expected_clothing))
+
+    def test_undecodable_upload_is_not_cached(self):
+        upload = FakeUpload("bad", Image.new('RGB', (10, 10)))
+        upload._data = b"not an image"
+
+        with self.assertRaises(ValueError):
+            self.cache.get(upload)
+        self.assertEqual(len(self.cache._entries), 0)
+
+    def test_truncated_upload_raises_value_error(self):
+        upload = FakeUpload("cut", Image.effect_noise((200, 200), 64).convert('RGB'), format='JPEG')
+        upload._data = upload._data[:len(upload._data) // 2]
+
+        with self.assertRaises(ValueError):
+            self.cache.get(upload)
+
+class TestGenerateTryOnPrepared(unittest.TestCase):
+    def test_skips_preprocessing(self):
+        with patch('services.pipeline.GeminiClient'):
+            pipeline = VirtualTryOnPipeline(cache=None, cpu_pool=None)
+        result = Image.new('RGB', (10, 10))
+        pipeline.gemini_client.process_virtual_tryon.return_value = result
+        user = Image.new('RGB', (20, 20), color='red')
+        clothing = Image.new('RGB', (20, 20), color='blue')
+
+        with patch.object(ImageProcessor, 'prepare_user_image') as prepare_user:
+            output = pipeline.generate_tryon_prepared(user, clothing)
+
+        self.assertIs(output, result)
+        prepare_user.assert_not_called()
+        args = pipeline.gemini_client.process_virtual_tryon.call_args[0]
+        self.assertIs(args[0], user)
+        self.assertIs(args[1], clothing)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -1,6 +1,7 @@
 import unittest
 from PIL import Image
 import numpy as np
+import io
 import sys
 import os
 
@@ -88,5 +89,30 @@ class TestImageProcessor(unittest.TestCase):
         self.assertEqual(user_processed.mode, 'RGB')
         self.assertEqual(clothing_processed.mode, 'RGB')
 
+    def test_load_image_downscales_jpeg(self):
+        buf = io.BytesIO()
+        Image.new('RGB', (4000, 3000), color='green').save(buf, format='JPEG')
+
+        loaded = ImageProcessor.load_image(buf.getvalue(), max_size=(1024, 1024))
+
+        self.assertEqual(loaded.size, (1024, 768))
+
+    def test_load_image_applies_exif_orientation(self):
+        exif = Image.Exif()
+        exif[0x0112] = 6
+        buf = io.BytesIO()
+        Image.new('RGB', (400, 200), color='green').save(buf, format='JPEG', exif=exif)
+
+        loaded = ImageProcessor.load_image(buf.getvalue())
+
+        self.assertEqual(loaded.size, (200, 400))
+
+    def test_load_image_rejects_oversized_file(self):
+        buf = io.BytesIO()
+        self.test_image_rgb.save(buf, format='PNG')
+
+        with self.assertRaises(ValueError):
+            ImageProcessor.load_image(buf.getvalue(), max_file_size_mb=0.0001)
+
 if __name__ == '__main__':
     unittest.main()
\ No newline at end of file
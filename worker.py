@@ -0,0 +1,164 @@
+"""
+Headless try-on worker.
+
+    python worker.py                       # serve the queue until interrupted
+    python worker.py --workers 8 --drain   # work through the backlog, then exit
+    python worker.py --enqueue user.jpg shirt.png --priority 5
+
+Jobs come from the SQLite queue in QUEUE_CONFIG["path"]; results are written
+to QUEUE_CONFIG["results_dir"] with per-stage timings recorded on the job.
+"""
+import argparse
+import os
+import signal
+import socket
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Optional
+from services.job_queue import JobQueue
+from services.pipeline import VirtualTryOnPipeline
+from services.result_encoder import FILE_EXTENSIONS, ResultEncoder
+from config import QUEUE_CONFIG
+
+
+class TryOnWorker:
+    """Runs queued try-on jobs on a pool of threads sharing one pipeline"""
+
+    def __init__(
+        self,
+        queue: JobQueue,
+        pipeline: VirtualTryOnPipeline,
+        results_dir: Optional[str] = None,
+        workers: Optional[int] = None,
+        poll_interval: Optional[float] = None,
+        requeue_interval: Optional[float] = None
+    ):
+        self.queue = queue
+        self.pipeline = pipeline
+        self.results_dir = results_dir or QUEUE_CONFIG["results_dir"]
+        self.workers = workers or QUEUE_CONFIG["workers"]
+        self.poll_interval = poll_interval if poll_interval is not None else QUEUE_CONFIG["poll_interval_seconds"]
+        self.requeue_interval = (
+            requeue_interval if requeue_interval is not None else QUEUE_CONFIG["requeue_interval_seconds"]
+        )
+        self._last_requeue = None
+        self._requeue_lock = threading.Lock()
+        self.name = f"{socket.gethostname()}:{os.getpid()}"
+        self.stop_event = threading.Event()
+        # Jobs rarely share a result, so only a few encodes are kept
+        self.result_encoder = ResultEncoder(max_entries=self.workers)
+        os.makedirs(self.results_dir, exist_ok=True)
+
+    def process_job(self, job: dict) -> None:
+        timings = {"queue_wait": job["started_at"] - job["enqueued_at"]}
+
+        def on_progress(event):
+            if event["status"] == "finished":
+                timings[event["stage"]] = timings.get(event["stage"], 0.0) + event["duration"]
+
+        start = time.perf_counter()
+        try:
+            output_format = job["options"].get("format", "PNG").upper()
+            if output_format not in FILE_EXTENSIONS:
+                raise ValueError(f"Unsupported output format: {output_format}")
+
+            result_image = self.pipeline.generate_tryon(
+                job["user_path"],
+                job["clothing_path"],
+                progress_callback=on_progress
+            )
+
+            encode_start = time.perf_counter()
+            encoded = self.result_encoder.encode(result_image, output_format)
+            timings["encode_result"] = time.perf_counter() - encode_start
+
+            result_path = os.path.join(self.results_dir, f"{job['id']}{FILE_EXTENSIONS[output_format]}")
+            tmp_path = f"{result_path}.tmp"
+            with open(tmp_path, "wb") as f:
+                f.write(encoded.data)
+            os.replace(tmp_path, result_path)
+        except Exception as e:
+            print(f"Job {job['id']} failed: {str(e)}")
+            timings["total"] = time.perf_counter() - start
+            self.queue.fail(job["id"], str(e), timings)
+            return
+
+        timings["total"] = time.perf_counter() - start
+        self.queue.complete(job["id"], result_path, timings, fallback="fallback" in timings)
+
+    def requeue_stale(self) -> int:
+        """Requeue jobs left by crashed workers, at most once per requeue_interval across threads"""
+        with self._requeue_lock:
+            now = time.monotonic()
+            if self._last_requeue is not None and now - self._last_requeue < self.requeue_interval:
+                return 0
+            self._last_requeue = now
+
+        requeued = self.queue.requeue_stale()
+        if requeued:
+            print(f"Requeued {requeued} stale job(s)")
+        return requeued
+
+    def _worker_loop(self, drain: bool) -> None:
+        while not self.stop_event.is_set():
+            # Workers that crash while this one runs leave jobs behind too
+            self.requeue_stale()
+            job = self.queue.claim(self.name)
+            if job is None:
+                if drain:
+                    return
+                self.stop_event.wait(self.poll_interval)
+                continue
+            self.process_job(job)
+
+    def run(self, drain: bool = False) -> None:
+        """Serve jobs until stop() is called, or until the queue is empty with drain"""
+        self.requeue_stale()
+
+        with ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="tryon-worker") as executor:
+            for _ in range(self.workers):
+                executor.submit(self._worker_loop, drain)
+
+    def stop(self) -> None:
+        self.stop_event.set()
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Headless virtual try-on worker")
+    parser.add_argument("--queue", default=QUEUE_CONFIG["path"], help="SQLite job queue path")
+    parser.add_argument("--results", default=QUEUE_CONFIG["results_dir"], help="Result image directory")
+    parser.add_argument("--workers", type=int, default=QUEUE_CONFIG["workers"])
+    parser.add_argument("--drain", action="store_true", help="Exit once the queue is empty")
+    parser.add_argument("--enqueue", nargs=2, metavar=("USER_IMAGE", "CLOTHING_IMAGE"),
+                        help="Add a job to the queue and exit")
+    parser.add_argument("--priority", type=int, default=0, help="Priority of an enqueued job")
+    parser.add_argument("--format", default="PNG", choices=list(FILE_EXTENSIONS),
+                        help="Result format of an enqueued job")
+    args = parser.parse_args(argv)
+
+    queue = JobQueue(args.queue)
+
+    if args.enqueue:
+        user_path, clothing_path = (os.path.abspath(path) for path in args.enqueue)
+        job_id = queue.enqueue(user_path, clothing_path, {"format": args.format}, args.priority)
+        print(job_id)
+        return 0
+
+    worker = TryOnWorker(queue, VirtualTryOnPipeline(), args.results, args.workers)
+
+    def handle_signal(signum, frame):
+        print("Stopping after in-flight jobs finish...")
+        worker.stop()
+
+    signal.signal(signal.SIGINT, handle_signal)
+    signal.signal(signal.SIGTERM, handle_signal)
+
+    worker.run(drain=args.drain)
+    print(f"Queue: {queue.stats()}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())